@@ -2,19 +2,166 @@
 This file provides the MoveFinder class, which allows you to find any moves on a Scrabble
 board. This class is an Abstract Base Class and is intended to be a Strategy pattern, as
 there are different move-finding algorithms that can be used.
+
+Every MoveFinder works with the Lexicon it was made with (see lexicon), so
+MoveFinders for different lexicons can be used side by side.
+
+Every MoveFinder can also find all the places a given word can go with
+find_placements. Rather than making a Move for every square and direction
+and scoring it, it reads each row and column once as a string, rules out
+start squares with plain string and set comparisons against the tiles
+already there and the line's cached cross-checks, and only makes and
+scores Moves for the few placements that fit.
 """
 
 from abc import *
+from itertools import combinations
+
+from coordinate import Coordinate, HORIZONTAL, VERTICAL
+from move import Move
+import lexicon as lexicon_module
+
+BLANK = '?'
 
 class MoveFinder(ABC):
     """A class that models any algorithm that finds all the valid moves on a Scrabble board."""
-    def __init__(self):
-        """Nothing to instantiate!"""
-        pass
+    def __init__(self, lexicon=None):
+        """Takes the Lexicon to find words in, or uses the default one."""
+        self.__lexicon = lexicon_module.choose_lexicon(lexicon)
+
+    def get_lexicon(self):
+        """Returns the Lexicon this MoveFinder finds words in."""
+        return self.__lexicon
 
-    @staticmethod
     @abstractmethod
-    def find_all_moves(tiles, board):
+    def find_all_moves(self, tiles, board):
         """Finds every move on the board with the given tiles and returns a list of Moves."""
         raise NotImplementedError
 
+    def find_placements(self, word, board, tiles=None):
+        """
+        Returns a list of (score, Move) for every legal place on the board
+        for the word, highest score first. If tiles is given (a rack string
+        like "AEIQTUX?" or Tiles), only placements that can be made with
+        them are returned, with blanks used for whatever letters the rack
+        is missing wherever they cost the fewest points. Returns an empty
+        list if the word isn't in the lexicon.
+        """
+        word = word.upper()
+        lexicon = self.get_lexicon()
+        size = board.get_size()
+        length = len(word)
+        if length < 2 or length > size or word not in lexicon:
+            return []
+        rack = None
+        if tiles is not None:
+            rack = {}
+            for tile in tiles:
+                letter = (tile.upper() if isinstance(tile, str) else
+                          BLANK if tile.is_blank() else str(tile))
+                rack[letter] = rack.get(letter, 0) + 1
+
+        board_is_empty = board.is_empty()
+        center = board.get_center()
+        placements = []
+        for direction in (HORIZONTAL, VERTICAL):
+            for index in range(size):
+                if direction == HORIZONTAL:
+                    line_tiles = board.get_row_tiles(index)
+                else:
+                    line_tiles = board.get_column_tiles(index)
+                line = ''.join('.' if tile is None else str(tile).upper()
+                               for tile in line_tiles)
+                if board_is_empty:
+                    if index != center:
+                        continue
+                    cross_checks = [None] * size
+                else:
+                    cross_checks = board.get_cross_checks(lexicon, direction,
+                                                          index)
+                for start in range(size - length + 1):
+                    end = start + length
+                    if ((start > 0 and line[start - 1] != '.') or
+                            (end < size and line[end] != '.')):
+                        continue  # the word would run into other tiles
+                    segment = line[start:end]
+                    if segment.count('.') == 0:
+                        continue  # nothing to play
+                    fits = True
+                    touches = board_is_empty and start <= center < end
+                    for offset in range(length):
+                        square = segment[offset]
+                        if square == '.':
+                            check = cross_checks[start + offset]
+                            if check is not None:
+                                if word[offset] not in check[0]:
+                                    fits = False
+                                    break
+                                touches = True
+                        elif square != word[offset]:
+                            fits = False
+                            break
+                        else:
+                            touches = True
+                    if not fits or not touches:
+                        continue
+                    best = None
+                    for move in self.__placement_moves(
+                            word, line_tiles, start, segment, rack,
+                            direction, index):
+                        score = board.score_move(move, False)
+                        if best is None or score > best[0]:
+                            best = (score, move)
+                    if best is not None:
+                        placements.append(best)
+        placements.sort(key=lambda placement: placement[0], reverse=True)
+        return placements
+
+    def __placement_moves(self, word, line_tiles, start, segment, rack,
+                          direction, index):
+        """
+        Yields every Move playing word at start in a line that the rack (a
+        dictionary of letter counts, or None for any tiles) can make: one
+        for each way of choosing which new tiles are blanks, if the rack is
+        short of some letters.
+        """
+        choices = [()]  # every set of offsets of new tiles that are blanks
+        if rack is not None:
+            needed = {}
+            for offset, square in enumerate(segment):
+                if square == '.':
+                    needed.setdefault(word[offset], []).append(offset)
+            blanks_left = rack.get(BLANK, 0)
+            for letter, offsets in needed.items():
+                missing = len(offsets) - rack.get(letter, 0)
+                if missing <= 0:
+                    continue
+                blanks_left -= missing
+                if blanks_left < 0:
+                    return
+                choices = [choice + chosen for choice in choices
+                           for chosen in combinations(offsets, missing)]
+
+        for blanks in choices:
+            string = ""
+            on_board = False
+            for offset, square in enumerate(segment):
+                if square == '.':
+                    if on_board:
+                        string += ')'
+                        on_board = False
+                    letter = word[offset]
+                    string += letter.lower() if offset in blanks else letter
+                else:
+                    if not on_board:
+                        string += '('
+                        on_board = True
+                    string += str(line_tiles[start + offset])
+            if on_board:
+                string += ')'
+            size = len(line_tiles)
+            if direction == HORIZONTAL:
+                coordinate = Coordinate(start, index, HORIZONTAL, size)
+            else:
+                coordinate = Coordinate(index, start, VERTICAL, size)
+            yield Move(string, coordinate)
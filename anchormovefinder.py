@@ -0,0 +1,221 @@
+"""
+This file provides the AnchorMoveFinder class, a MoveFinder that uses the
+algorithm from Appel and Jacobson's "The World's Fastest Scrabble Program".
+
+Every new word has to touch a tile that is already on the board (or cover
+the center square on the first move), so the only squares a word can be
+built around are the empty squares next to existing tiles, called anchors.
+For every anchor, the finder builds every possible left part of a word
+out of the rack in the empty squares before it, and then extends each left
+part to the right through the anchor, walking the lexicon's DAWG at the
+same time so that it never tries a string that can't become a word. The
+letters allowed on each square are limited by its cross-checks (see
+Board.get_cross_checks), so every word formed in the other direction is
+valid too.
+"""
+
+from coordinate import Coordinate, HORIZONTAL, VERTICAL
+from dawg import ROOT
+from MoveFinder import MoveFinder
+from move import Move
+import instrument
+
+
+BLANK = '?'
+
+
+def rack_string(tiles):
+    """
+    Returns the rack as a string of letters with '?' for blanks. tiles can
+    be a string like "AEIRST?" or any iterable of Tiles.
+    """
+    if isinstance(tiles, str):
+        return tiles.upper()
+    return ''.join(BLANK if tile.is_blank() else str(tile) for tile in tiles)
+
+
+class AnchorMoveFinder(MoveFinder):
+    """A MoveFinder that builds words around anchor squares using a DAWG."""
+
+    @instrument.timed("anchormovefinder.find_all_moves")
+    def find_all_moves(self, tiles, board):
+        """
+        Finds every move on the board with the given tiles (see rack_string)
+        and returns a list of Moves. Every move is only found once: a single
+        tile that makes words both ways is only given as a horizontal move.
+        """
+        rack = {}  # letter -> count, with '?' for blanks
+        for letter in rack_string(tiles):
+            rack[letter] = rack.get(letter, 0) + 1
+
+        moves = []
+        board_is_empty = board.is_empty()
+        for direction in (HORIZONTAL, VERTICAL):
+            for index in range(board.get_size()):
+                self.__find_line_moves(board, rack, direction, index,
+                                       board_is_empty, moves)
+        if instrument.enabled:
+            instrument.count("anchormovefinder.moves", len(moves))
+        return moves
+
+    def __find_line_moves(self, board, rack, direction, index, board_is_empty,
+                          moves):
+        """Adds every move along one row or column to moves."""
+        size = board.get_size()
+        center = board.get_center()
+        if direction == HORIZONTAL:
+            board_line = board.get_row_tiles(index)
+        else:
+            board_line = board.get_column_tiles(index)
+        # the letter on each square, or None
+        line = [str(tile).upper() if tile is not None else None
+                for tile in board_line]
+
+        if board_is_empty:
+            if index != center:
+                return
+            anchors = [center]
+            cross_checks = [None] * size
+        else:
+            cross_checks = board.get_cross_checks(self.get_lexicon(),
+                                                  direction, index)
+            anchors = []
+            for position in range(size):
+                if line[position] is not None:
+                    continue
+                if (cross_checks[position] is not None or
+                        (position > 0 and line[position - 1] is not None) or
+                        (position < size - 1 and
+                         line[position + 1] is not None)):
+                    anchors.append(position)
+            if not anchors:
+                return
+
+        dawg = self.get_lexicon().get_dawg()
+        edges = dawg.get_edges()
+        terminal = dawg.get_terminals()
+        is_anchor = [False] * size
+        for position in anchors:
+            is_anchor[position] = True
+
+        # a letter placed on a square is stored as (letter, from_rack, blank)
+        placed = []
+        counting = instrument.enabled
+        nodes = [0]  # how many times a word was extended, if counting
+
+        def record(end):
+            """Adds the word in placed, which ends just before end."""
+            tiles_played = sum(1 for tile in placed if tile[1])
+            start = end - len(placed)
+            if tiles_played == 1 and direction == VERTICAL:
+                # only count it once if it also makes a horizontal word
+                for offset, tile in enumerate(placed):
+                    if tile[1] and cross_checks[start + offset] is not None:
+                        return
+
+            word = ""
+            on_board = False
+            for letter, from_rack, blank in placed:
+                if not from_rack and not on_board:
+                    word += '('
+                    on_board = True
+                elif from_rack and on_board:
+                    word += ')'
+                    on_board = False
+                word += letter.lower() if blank else letter
+            if on_board:
+                word += ')'
+
+            if direction == HORIZONTAL:
+                coordinate = Coordinate(start, index, HORIZONTAL, size)
+            else:
+                coordinate = Coordinate(index, start, VERTICAL, size)
+            moves.append(Move(word, coordinate))
+
+        def extend_right(node, position, anchor):
+            """Extends the word in placed from position onwards."""
+            if counting:
+                nodes[0] += 1
+            if position < size and line[position] is not None:
+                letter = line[position]
+                child = edges[node].get(letter)
+                if child is not None:
+                    placed.append((letter, False,
+                                   board_line[position].is_blank()))
+                    extend_right(child, position + 1, anchor)
+                    placed.pop()
+                return
+
+            if terminal[node] and position > anchor:
+                record(position)
+            if position >= size:
+                return
+
+            check = cross_checks[position]
+            for letter, child in edges[node].items():
+                if check is not None and letter not in check[0]:
+                    continue
+                if rack.get(letter):
+                    rack[letter] -= 1
+                    placed.append((letter, True, False))
+                    extend_right(child, position + 1, anchor)
+                    placed.pop()
+                    rack[letter] += 1
+                if rack.get(BLANK):
+                    rack[BLANK] -= 1
+                    placed.append((letter, True, True))
+                    extend_right(child, position + 1, anchor)
+                    placed.pop()
+                    rack[BLANK] += 1
+
+        def left_part(node, anchor, limit):
+            """Builds every left part of up to limit tiles before anchor."""
+            if counting:
+                nodes[0] += 1
+            extend_right(node, anchor, anchor)
+            if limit <= 0:
+                return
+            for letter, child in edges[node].items():
+                if rack.get(letter):
+                    rack[letter] -= 1
+                    placed.append((letter, True, False))
+                    left_part(child, anchor, limit - 1)
+                    placed.pop()
+                    rack[letter] += 1
+                if rack.get(BLANK):
+                    rack[BLANK] -= 1
+                    placed.append((letter, True, True))
+                    left_part(child, anchor, limit - 1)
+                    placed.pop()
+                    rack[BLANK] += 1
+
+        tile_count = sum(rack.values())
+        for anchor in anchors:
+            if anchor > 0 and line[anchor - 1] is not None:
+                # the left part is the tiles already on the board
+                start = anchor - 1
+                while start > 0 and line[start - 1] is not None:
+                    start -= 1
+                node = ROOT
+                for position in range(start, anchor):
+                    placed.append((line[position], False,
+                                   board_line[position].is_blank()))
+                    node = edges[node].get(line[position])
+                    if node is None:
+                        break
+                if node is not None:
+                    extend_right(node, anchor, anchor)
+                del placed[:]
+            else:
+                # the left part goes in the empty non-anchor squares before it
+                limit = 0
+                position = anchor - 1
+                while (position >= 0 and line[position] is None and
+                        not is_anchor[position] and limit < tile_count - 1):
+                    limit += 1
+                    position -= 1
+                left_part(ROOT, anchor, limit)
+
+        if counting:
+            instrument.count("anchormovefinder.anchors", len(anchors))
+            instrument.count("anchormovefinder.nodes", nodes[0])
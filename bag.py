@@ -0,0 +1,285 @@
+"""
+This file provides the Bag and Rack classes, which keep track of tiles by
+counting them instead of keeping lists of Tiles. Tiles are numbered 0-25 for
+A-Z and 26 for the blank (see TILE_TYPES), and both classes hold a 27-entry
+list of how many of each tile they have.
+
+A Bag also keeps the numbers of all its tiles in one list that never
+changes size, with the tiles still in the bag at the front. Drawing a tile
+picks a random position among those, swaps that tile to the end of the
+front part and shrinks it by one; returning a tile writes it just past the
+end and grows it again. So drawing, returning and exchanging are all O(1)
+and never make new lists, which matters when simulations draw millions of
+racks.
+
+unseen_tiles works out the Bag of tiles a player can't see: the full
+distribution minus everything on the board and on their rack.
+"""
+
+from constants import ALPHABET_WITH_Q_MARK, TILE_COUNTS, TILE_VALUES
+import board as board_module
+
+
+TILE_TYPES = ALPHABET_WITH_Q_MARK  # tile number -> letter, '?' for blanks
+NUMBER_OF_TILE_TYPES = len(TILE_TYPES)
+BLANK_INDEX = TILE_TYPES.index('?')
+TILE_INDEX = {letter: index for index, letter in enumerate(TILE_TYPES)}
+TILE_INDEX_VALUES = [TILE_VALUES[letter] for letter in TILE_TYPES]
+
+# how many of each tile number a full bag has
+FULL_BAG_COUNTS = [TILE_COUNTS[letter] for letter in TILE_TYPES]
+
+
+def counts_from_string(letters):
+    """Returns the 27-entry count list of a string like "AEINST?"."""
+    counts = [0] * NUMBER_OF_TILE_TYPES
+    for letter in letters.upper():
+        counts[TILE_INDEX[letter]] += 1
+    return counts
+
+
+def string_from_counts(counts):
+    """Returns the tiles in a count list as a string in tile order."""
+    return ''.join(TILE_TYPES[index] * count
+                   for index, count in enumerate(counts))
+
+
+def rack_value(rack):
+    """Returns the total value of the tiles in a rack string."""
+    return sum(TILE_VALUES[letter] for letter in rack)
+
+
+def rack_after_move(rack, move):
+    """Returns the rack string left after playing the move from rack."""
+    for tile in move.get_just_played_tiles():
+        if tile is not None:
+            if tile.is_blank():
+                rack = rack.replace('?', '', 1)
+            else:
+                rack = rack.replace(str(tile), '', 1)
+    return rack
+
+
+class Rack:
+    """A class that models a rack as a count of each tile."""
+
+    def __init__(self, letters=""):
+        """Creates a rack holding the tiles in the string letters."""
+        self.__counts = counts_from_string(letters)
+        self.__size = len(letters)
+
+    def add(self, index):
+        """Adds one tile (by tile number) to the rack."""
+        self.__counts[index] += 1
+        self.__size += 1
+
+    def remove(self, index):
+        """
+        Removes one tile (by tile number) from the rack. Raises ValueError
+        if the rack doesn't have one.
+        """
+        if not self.__counts[index]:
+            raise ValueError("{} is not on the rack".format(TILE_TYPES[index]))
+        self.__counts[index] -= 1
+        self.__size -= 1
+
+    def add_letters(self, letters):
+        for letter in letters:
+            self.add(TILE_INDEX[letter])
+
+    def remove_letters(self, letters):
+        for letter in letters:
+            self.remove(TILE_INDEX[letter])
+
+    def set_letters(self, letters):
+        """Makes the rack hold exactly the tiles in letters."""
+        counts = self.__counts
+        for index in range(NUMBER_OF_TILE_TYPES):
+            counts[index] = 0
+        self.__size = 0
+        self.add_letters(letters)
+
+    def get_counts(self):
+        """Returns the 27-entry count list. Do not modify it."""
+        return self.__counts
+
+    def value(self):
+        """Returns the total value of the tiles on the rack."""
+        return sum(count * value for count, value in
+                   zip(self.__counts, TILE_INDEX_VALUES))
+
+    def is_empty(self):
+        return self.__size == 0
+
+    def copy_from(self, other):
+        """Makes this rack hold exactly what other holds, reusing its list."""
+        self.__counts[:] = other.__counts
+        self.__size = other.__size
+
+    def copy(self):
+        rack = Rack()
+        rack.copy_from(self)
+        return rack
+
+    def __contains__(self, letter):
+        return self.__counts[TILE_INDEX[letter]] > 0
+
+    def __len__(self):
+        return self.__size
+
+    def __str__(self):
+        """Returns the tiles as a string, like "AEINST?"."""
+        return string_from_counts(self.__counts)
+
+    def __repr__(self):
+        return str(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+        return self.__counts == other.__counts
+
+
+class Bag:
+    """A class that models a bag of tiles. See the file doc."""
+
+    def __init__(self, counts=None):
+        """
+        Creates a bag with the given 27-entry count list, or a full bag
+        with the normal distribution.
+        """
+        if counts is None:
+            counts = FULL_BAG_COUNTS
+        self.__counts = list(counts)
+        # every tile number, with the ones still in the bag in front
+        self.__tiles = [index for index, count in enumerate(counts)
+                        for i in range(count)]
+        self.__size = len(self.__tiles)
+
+    @classmethod
+    def from_string(cls, letters):
+        """Returns a bag holding the tiles in a string like "AAB??"."""
+        return cls(counts_from_string(letters))
+
+    def draw(self, generator):
+        """
+        Takes a random tile out of the bag using the random.Random
+        generator and returns its tile number. Raises IndexError if the
+        bag is empty.
+        """
+        if not self.__size:
+            raise IndexError("draw from an empty bag")
+        tiles = self.__tiles
+        last = self.__size - 1
+        position = int(generator.random() * self.__size)
+        index = tiles[position]
+        tiles[position] = tiles[last]
+        tiles[last] = index
+        self.__size = last
+        self.__counts[index] -= 1
+        return index
+
+    def draw_into(self, rack, count, generator):
+        """
+        Draws up to count random tiles (fewer if the bag runs out) into
+        the Rack and returns how many were drawn.
+        """
+        count = min(count, self.__size)
+        for i in range(count):
+            rack.add(self.draw(generator))
+        return count
+
+    def fill(self, rack, generator, rack_size=board_module.RACK_SIZE):
+        """Draws tiles into the Rack until it is full or the bag is empty."""
+        return self.draw_into(rack, rack_size - len(rack), generator)
+
+    def put_back(self, index):
+        """Returns one tile (by tile number) to the bag."""
+        if self.__size == len(self.__tiles):  # more tiles than it started with
+            self.__tiles.append(index)
+        else:
+            self.__tiles[self.__size] = index
+        self.__size += 1
+        self.__counts[index] += 1
+
+    def exchange(self, rack, letters, generator):
+        """
+        Swaps the tiles in the string letters from the Rack for the same
+        number of random tiles from the bag. The new tiles are drawn before
+        the old ones go in, as in the rules. Raises ValueError if the bag
+        has fewer tiles than are being exchanged.
+        """
+        if len(letters) > self.__size:
+            raise ValueError("Not enough tiles in the bag to exchange")
+        rack.remove_letters(letters)
+        self.draw_into(rack, len(letters), generator)
+        for letter in letters:
+            self.put_back(TILE_INDEX[letter])
+
+    def remove(self, index):
+        """
+        Takes a particular tile (by tile number) out of the bag, e.g.,
+        because it's known to be on the board. This is O(size of the bag).
+        Raises ValueError if there isn't one in the bag.
+        """
+        tiles = self.__tiles
+        for position in range(self.__size):
+            if tiles[position] == index:
+                last = self.__size - 1
+                tiles[position] = tiles[last]
+                tiles[last] = index
+                self.__size = last
+                self.__counts[index] -= 1
+                return
+        raise ValueError("{} is not in the bag".format(TILE_TYPES[index]))
+
+    def remove_letters(self, letters):
+        for letter in letters:
+            self.remove(TILE_INDEX[letter])
+
+    def copy_from(self, other):
+        """Makes this bag hold exactly what other holds, reusing its lists."""
+        self.__counts[:] = other.__counts
+        self.__tiles[:] = other.__tiles
+        self.__size = other.__size
+
+    def copy(self):
+        bag = Bag([0] * NUMBER_OF_TILE_TYPES)
+        bag.copy_from(self)
+        return bag
+
+    def get_counts(self):
+        """Returns the 27-entry count list. Do not modify it."""
+        return self.__counts
+
+    def __len__(self):
+        return self.__size
+
+    def __str__(self):
+        """Returns the tiles in the bag as a string in tile order."""
+        return string_from_counts(self.__counts)
+
+    def __repr__(self):
+        return str(self)
+
+
+def unseen_tiles(board, rack):
+    """
+    Returns a Bag of the tiles that are neither on the board nor on the
+    rack (a Rack, or a string of letters): the opponent's rack and the
+    tiles in the bag. Blanks on the board count as blanks, whatever letter
+    they were played as.
+    """
+    counts = list(FULL_BAG_COUNTS)
+    for row in board:
+        for tile in row:
+            if tile is not None:
+                if tile.is_blank():
+                    counts[BLANK_INDEX] -= 1
+                else:
+                    counts[TILE_INDEX[str(tile)]] -= 1
+    for index, count in enumerate(counts_from_string(str(rack))):
+        counts[index] -= count
+    if min(counts) < 0:
+        raise ValueError("More tiles on the board and rack than in a bag")
+    return Bag(counts)
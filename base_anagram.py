@@ -10,34 +10,22 @@ there are. For example, let's say we want to anagram AET. E has value 2,
 T has value 3, and A has value 5, so the product is 2 * 3 * 5 = 30. Then,
 we look up what words also have that product: TEA, TAE, EAT, ATE, and ETA.
 
-This file automatically checks for the existence of the necessary
-files required for its work and creates them if needed.
+The anagram dictionary used for lookups comes from a compiled Lexicon
+(see lexicon), which is cached on disk and rebuilt automatically whenever
+the word list changes; anagram_without_blanks takes the Lexicon to use and
+otherwise uses the default one. The functions that write and read the
+anagram dictionary as a .txt file are still provided.
 """
 
+import instrument
+import lexicon as lexicon_module
+import wordlist as wordlist_module
+from lexicon import LETTER_TO_PRIME, number_from_word  # the prime table
 from wordlist import wordlist  # the OWL3
-from os.path import exists  
-
-# letters are sorted by commonness to keep the products small
-
-LETTER_TO_PRIME = {'e': 2, 't': 3, 'a': 5, 'o': 7, 'i': 11, 'n': 13, 's': 17,
-                        'h': 19, 'r': 23, 'd': 29, 'l': 31, 'c': 37, 'u': 41,
-                        'm': 43, 'w': 47, 'f': 53, 'g': 59, 'y': 61, 'p': 67,
-                        'b': 71, 'v': 73, 'k': 79, 'j': 83, 'x': 89, 'q': 97,
-                        'z': 101}
 
 ANAGRAM_DICT_FILENAME = "anagramdictionary.txt"  # to store the dictionary
 
 
-def number_from_word(string_iterable):
-    """Multiplies the value of each letter by each other to produce a
-    unique number."""
-    product = 1
-    for letter in string_iterable:
-        product *= LETTER_TO_PRIME[letter.lower()]
-
-    return product
-
-
 def create_anagram_dictionary(lexicon=wordlist):
     """This function creates the anagram dictionary in RAM and returns it."""
     anagram_dict = {}  # from numbers to list of words
@@ -91,20 +79,22 @@ def create_anagram_dictionary_from_file(filename=ANAGRAM_DICT_FILENAME):
     return anagram_dict
 
 
-def anagram_without_blanks(word):
-    """Anagrams a word in O(n) time using a table lookup.
-    Assumes that the file at ANAGRAM_DICT_FILENAME is operational.
+def anagram_without_blanks(word, lexicon=None):
+    """Anagrams a word in O(n) time using a table lookup in the given
+    Lexicon, or in anagram_dictionary if no Lexicon is given.
     """
+    if instrument.enabled:
+        instrument.count("base_anagram.lookups")
+    if lexicon is not None:
+        return lexicon.anagram_without_blanks(word)
     try:
         return anagram_dictionary[number_from_word(word)]
     except KeyError:
         return []
 
-#  see if the necessary things are in place and if not, create them
+#  the default lexicon's anagram dictionary, which is compiled again
+#  whenever the word list changes
+
+anagram_dictionary = lexicon_module.get_lexicon(
+    wordlist_module.FILENAME).get_anagram_index()
 
-try:
-    anagram("TheCodeSamurai")
-except (NameError, KeyError):
-    if exists(ANAGRAM_DICT_FILENAME):
-        write_anagram_dictionary_to_file()
-    anagram_dictionary = create_anagram_dictionary_from_file()
\ No newline at end of file
@@ -0,0 +1,336 @@
+"""
+This file is the benchmark suite. It times everything that matters for
+speed: importing the package and loading the lexicon, word queries (validity,
+hooks, anagrams, subanagrams, patterns), reading Moves, scoring moves both
+ways and finding every move on the positions in test-board.txt and
+test-board2.txt.
+
+Every benchmark is run a few times first to warm up (filling caches, as a
+long-running server would have them), then timed repeat times with timeit,
+each timing calling it enough times to take at least min_time seconds.
+The result for each benchmark is the best, median, mean and standard
+deviation of the time per call across the repeats, and the peak memory
+allocated during one more call, measured separately with tracemalloc
+because tracing slows everything down. The word queries empty their
+query cache (see querycache) before every call, so they time the query
+itself; their "(cached)" twins time answering it from a full cache.
+
+Results can be saved as JSON and compared against a saved baseline:
+
+    python benchmark.py --save baseline.json
+    (upgrade something)
+    python benchmark.py --baseline baseline.json
+
+which shows how much faster or slower each benchmark got, and exits with
+status 1 if any got slower by more than the threshold. --filter runs only
+the benchmarks whose names match a regular expression.
+"""
+
+import argparse
+import atexit
+import gc
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import lexicon as lexicon_module
+import querycache
+
+
+POSITIONS = (("test-board.txt", "EELPRST"), ("test-board2.txt", "CDDILOP"))
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class Benchmark:
+    """One thing to time: a function called with no arguments."""
+
+    def __init__(self, name, function, warmup=2, group=None):
+        """
+        Takes the name of the benchmark, the function to time, how many
+        times to call it before timing it and the group it is listed in.
+        """
+        self.__name = name
+        self.__function = function
+        self.__warmup = warmup
+        self.__group = group
+
+    def get_name(self):
+        return self.__name
+
+    def get_group(self):
+        return self.__group
+
+    def run(self, repeat=5, min_time=0.2, memory=True):
+        """Times the benchmark (see the file doc) and returns the results."""
+        function = self.__function
+        for i in range(self.__warmup):
+            function()
+
+        timer = timeit.Timer(function)
+        number, elapsed = timer.autorange()
+        if elapsed < min_time:
+            number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+        times = [total / number for total in
+                 timer.repeat(repeat=repeat, number=number)]
+
+        result = {
+            "group": self.__group,
+            "calls": number,
+            "repeat": repeat,
+            "best": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        }
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                function()
+                result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return result
+
+
+def time_in_new_interpreter(code):
+    """
+    Returns how long running code takes in a fresh Python process, timed
+    in that process, for measuring import and load times.
+    """
+    program = ("import time\n"
+               "start = time.perf_counter()\n"
+               "{}\n"
+               "print(time.perf_counter() - start)\n").format(code)
+    output = subprocess.run([sys.executable, "-c", program], cwd=DIRECTORY,
+                            check=True, capture_output=True, text=True)
+    return float(output.stdout.split()[-1])
+
+
+class SubprocessBenchmark(Benchmark):
+    """
+    A Benchmark of code run in a fresh interpreter, like an import. Every
+    repeat is one new process, and no memory is measured.
+    """
+
+    def __init__(self, name, code, group=None):
+        super().__init__(name, None, 0, group)
+        self.__code = code
+
+    def run(self, repeat=5, min_time=0.2, memory=True):
+        times = [time_in_new_interpreter(self.__code) for i in range(repeat)]
+        return {
+            "group": self.get_group(),
+            "calls": 1,
+            "repeat": repeat,
+            "best": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        }
+
+
+def uncached(query, lexicon=None):
+    """
+    Returns a function that calls query after emptying the Lexicon's query
+    cache (see querycache), so that it times the query and not a lookup.
+    """
+    def call():
+        querycache.clear(lexicon)
+        return query()
+    return call
+
+
+def make_benchmarks():
+    """Returns the list of every Benchmark."""
+    import wordlist
+    import wordtools
+    import quackle
+    from anchormovefinder import AnchorMoveFinder
+    from move import Move
+
+    lexicon = lexicon_module.get_default_lexicon()
+    move_finder = AnchorMoveFinder(lexicon)
+    word_list = os.path.join(DIRECTORY, lexicon_module.DEFAULT_WORD_LIST)
+    words = lexicon_module.read_word_list(word_list)
+    cache_directory = tempfile.mkdtemp(prefix="benchmark")
+    atexit.register(shutil.rmtree, cache_directory, True)
+    lexicon_module.store_lexicon(lexicon, word_list, cache_directory)
+
+    benchmarks = [
+        SubprocessBenchmark("import wordtools", "import wordtools",
+                            "load"),
+        Benchmark("compile lexicon",
+                  lambda: lexicon_module.Lexicon(words), 0, "load"),
+        Benchmark("load cached lexicon",
+                  lambda: lexicon_module.load_lexicon(word_list,
+                                                      cache_directory),
+                  1, "load"),
+        Benchmark("check_validity",
+                  lambda: [wordlist.check_validity(word) for word in
+                           ("QUIXOTIC", "RETINAS", "ZZZ", "AA")],
+                  group="queries"),
+        Benchmark("Move from string",
+                  lambda: Move("PORt(MANTEaU)X", "8D"), group="moves"),
+    ]
+
+    queries = [
+        ("hooks", lambda: (wordtools.front_hooks("ARE"),
+                           wordtools.back_hooks("ARE"))),
+        ("anagram", lambda: wordtools.anagram("AEINRST")),
+        ("anagram with 2 blanks", lambda: wordtools.anagram("AEINR??")),
+        ("subanagrams", lambda: wordtools.subanagrams("RETAINS")),
+        ("pattern_match", lambda: wordtools.pattern_match("C?R*S")),
+    ]
+    for name, query in queries:
+        benchmarks.extend([
+            Benchmark(name, uncached(query, lexicon), group="queries"),
+            Benchmark(name + " (cached)", query, group="queries"),
+        ])
+
+    for filename, rack in POSITIONS:
+        position = quackle.read_position(os.path.join(DIRECTORY, filename))
+        board = position.get_board()
+        moves = move_finder.find_all_moves(rack, board)
+        across = [move for move in moves if move.get_coord().is_horizontal()]
+        down = [move for move in moves
+                if not move.get_coord().is_horizontal()]
+        benchmarks.extend([
+            Benchmark("score_move across ({})".format(filename),
+                      lambda board=board, across=across:
+                      [board.score_move(move) for move in across[:100]],
+                      group="moves"),
+            Benchmark("score_move down ({})".format(filename),
+                      lambda board=board, down=down:
+                      [board.score_move(move) for move in down[:100]],
+                      group="moves"),
+            Benchmark("find_all_moves ({})".format(filename),
+                      lambda board=board, rack=rack:
+                      move_finder.find_all_moves(rack, board),
+                      group="movegen"),
+            Benchmark("find_all_moves, cold caches ({})".format(filename),
+                      lambda filename=filename, rack=rack:
+                      move_finder.find_all_moves(
+                          rack, quackle.read_position(os.path.join(
+                              DIRECTORY, filename)).get_board()),
+                      group="movegen"),
+        ])
+    return benchmarks
+
+
+def machine_info():
+    """Returns a dictionary describing the machine and Python."""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_benchmarks(pattern=None, repeat=5, min_time=0.2, memory=True,
+                   output=sys.stderr):
+    """
+    Runs every benchmark whose name matches the regular expression pattern
+    (all of them if it's None), printing progress to output, and returns
+    the results as a dictionary ready for JSON.
+    """
+    results = {}
+    for benchmark in make_benchmarks():
+        if pattern is not None and not re.search(pattern,
+                                                 benchmark.get_name()):
+            continue
+        result = benchmark.run(repeat, min_time, memory)
+        results[benchmark.get_name()] = result
+        if output is not None:
+            print("{:45} {}".format(benchmark.get_name(),
+                                    describe(result)), file=output)
+    return {"machine": machine_info(), "time": time.time(),
+            "results": results}
+
+
+def format_seconds(seconds):
+    """Returns a time in seconds in the most readable unit."""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return "{:.3g}{}".format(seconds / scale, unit)
+    return "{:.3g}ns".format(seconds / 1e-9)
+
+
+def describe(result):
+    """Returns one benchmark's result as a line of text."""
+    text = "median {} (best {}, sd {})".format(
+        format_seconds(result["median"]), format_seconds(result["best"]),
+        format_seconds(result["stdev"]))
+    if "peak_bytes" in result:
+        text += ", peak {:.1f} KiB".format(result["peak_bytes"] / 1024)
+    return text
+
+
+def compare(report, baseline, threshold=0.1):
+    """
+    Returns a list of (name, ratio of median times, regressed) for every
+    benchmark in both reports, where regressed is True if it got slower by
+    more than threshold (a fraction).
+    """
+    comparison = []
+    for name, result in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None or not old["median"]:
+            continue
+        ratio = result["median"] / old["median"]
+        comparison.append((name, ratio, ratio > 1 + threshold))
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmarks.")
+    parser.add_argument("--filter", help="only run benchmarks matching this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="least seconds each timing should take")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="don't measure peak memory")
+    parser.add_argument("--save", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against saved results")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown counted as a regression (0.1 = 10%%)")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON")
+    arguments = parser.parse_args()
+
+    report = run_benchmarks(arguments.filter, arguments.repeat,
+                            arguments.min_time, not arguments.no_memory)
+    if arguments.save:
+        with open(arguments.save, "w") as file:
+            json.dump(report, file, indent=2)
+    if arguments.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+        regressions = 0
+        for name, ratio, regressed in compare(report, baseline,
+                                              arguments.threshold):
+            print("{:45} {:6.2f}x {}".format(
+                name, ratio, "SLOWER" if regressed else
+                "faster" if ratio < 1 else ""))
+            regressions += regressed
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
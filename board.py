@@ -2,32 +2,113 @@
 This file creates the Board class which models a normal 15x15 Scrabble board.
 You can put only Tiles on a board, and the board provides convenience functions
 that allow you to add new Tiles, remove Tiles, move Tiles, score words, etc.
+
+A Board can also be made with another BoardLayout (see layout), like a
+21x21 board read with layout.read_layout, and then has that layout's size
+and bonus squares.
+Scoring reads the letter and word multipliers of each square straight out of
+the flat lists the layout works out once, indexed by row * size + col.
+
+Every Board keeps a Zobrist hash of its tiles up to date as tiles are added
+and removed: each (square, tile) pair has a fixed random 64-bit number, and
+the hash of a board is all the numbers for the tiles on it XORed together,
+so adding or removing a tile is one XOR. Two boards with the same tiles
+(blanks included, along with what they were played as) always have the same
+hash, which is what makes boards usable as dictionary keys for caching.
+
+Search code can try a move with make_move and take it back with unmake_move.
+Every make_move pushes a record of only the squares it filled, the old hash
+and the old caches of the rows and columns it touched onto an undo stack,
+and unmake_move puts all of that back, so nothing is ever copied.
+
+Anything derived from a single row or column (like the cross-checks used by
+move generators) can be kept in that line's cache (see get_line_cache),
+which is thrown away whenever a tile in the line changes.
+
+To follow a game from a feed of positions, keep one Board and bring it up
+to date with each new one: board.apply_delta(board.diff(new_board)). diff
+finds the squares that changed, skipping rows that are the same, and
+apply_delta changes only those, so the hash is updated with one XOR per
+tile and the line caches of everything the move didn't touch are kept.
 """
 
-from constants import NON, DLS, DWS, TLS, TWS
-from constants import BOARD_LAYOUT
+import random
+
+from constants import ALPHABET
 import coordinate as coordinate_module
+import instrument
+from layout import MAX_SIZE, STANDARD
 from move import Move
 
 
-BOARD_SIZE = 15
+BOARD_SIZE = 15  # of a normal board; see get_size for any Board
+BINGO_BONUS = 50
+RACK_SIZE = 7
+
+ZOBRIST_SEED = 0x5C4A881E  # fixed so hashes are the same in every process
+
+
+def make_zobrist_keys(seed=ZOBRIST_SEED):
+    """
+    Returns a list with a dictionary for every square (row by row) from
+    the string of a tile (see Tile.__str__: 'A' for an A, 'a' for a blank
+    played as an A, '?' for an unassigned blank) to a random 64-bit number.
+    There are enough for the biggest board; a board of size n uses the
+    first n * n.
+    """
+    generator = random.Random(seed)
+    tile_strings = list(ALPHABET) + list(ALPHABET.lower()) + ['?']
+    return [{tile_string: generator.getrandbits(64)
+             for tile_string in tile_strings}
+            for square in range(MAX_SIZE * MAX_SIZE)]
+
+ZOBRIST_KEYS = make_zobrist_keys()
 
 
 class Board:
     """This class models a Scrabble board.
     You can manage tiles and score words."""
-    bonuses = BOARD_LAYOUT # 2-dimensional array with normal bonus squares
-    
-    
-    def __init__(self):
-        """Creates a Board with the normal bonus squares and size."""
-        self.__tiles = [[None for x in range(BOARD_SIZE)]
-            for y in range(BOARD_SIZE)]
+
+    def __init__(self, layout=STANDARD):
+        """
+        Creates a Board with the bonus squares and size of the BoardLayout
+        (by default, the normal ones).
+        """
+        self.__layout = layout
+        self.__size = size = layout.get_size()
+        self.__letter_multipliers = layout.get_letter_multipliers()
+        self.__word_multipliers = layout.get_word_multipliers()
+        self.__tiles = [[None for x in range(size)]
+            for y in range(size)]
         # a 2-dimensional array with blank spaces as None
+        self.__hash = 0  # Zobrist hash of the empty board
+        # (direction, index) -> dictionary of data derived from that line,
+        # where HORIZONTAL means a row and VERTICAL means a column
+        self.__line_caches = {}
+        self.__undo_stack = []  # one record for each make_move
 
     def add_tile(self, tile, coordinate):
-        """Adds the specified tile at the specified coordinate"""
-        self.__tiles[coordinate.get_row()][coordinate.get_col()] = tile
+        """
+        Adds the specified tile at the specified coordinate. Raises
+        ValueError if there are moves to unmake (see make_move), since
+        unmaking them would bring back caches of the old tiles.
+        """
+        if self.__undo_stack:
+            raise ValueError("Can't change tiles with moves to unmake")
+        row, col = coordinate.get_row(), coordinate.get_col()
+        keys = ZOBRIST_KEYS[row * self.__size + col]
+        old_tile = self.__tiles[row][col]
+        if old_tile is not None:  # replaced, so take it out of the hash
+            self.__hash ^= keys[str(old_tile)]
+        if tile is not None:
+            self.__hash ^= keys[str(tile)]
+        self.__tiles[row][col] = tile
+        self.__invalidate_lines(row, col)
+
+    def __invalidate_lines(self, row, col):
+        """Throws away the caches of the row and column of a square."""
+        self.__line_caches.pop((coordinate_module.HORIZONTAL, row), None)
+        self.__line_caches.pop((coordinate_module.VERTICAL, col), None)
     
     def get_tile(self, coordinate):
         """Returns the tile at the specified coordinate or None"""
@@ -41,12 +122,53 @@ class Board:
         except AttributeError:
             return None
 
+    def get_row_tiles(self, row):
+        """Returns a list of the tiles in the row (0 to size - 1), with None
+        for empty squares."""
+        return list(self.__tiles[row])
+
+    def get_column_tiles(self, col):
+        """Returns a list of the tiles in the column (0 to size - 1), with
+        None for empty squares."""
+        return [tiles_row[col] for tiles_row in self.__tiles]
+
+    def is_empty(self):
+        """Returns True if there are no tiles on the board."""
+        return all(tile is None for row in self.__tiles for tile in row)
+
     def remove_tile(self, coordinate):
         """
         Removes the tile at the given coordinate: raises an error
-        if the square has nothing on it.
+        if the square has nothing on it. Raises ValueError if there are
+        moves to unmake, like add_tile.
         """
-        self.__tiles[coordinate.get_row()][coordinate.get_col()] = None
+        if self.__undo_stack:
+            raise ValueError("Can't change tiles with moves to unmake")
+        row, col = coordinate.get_row(), coordinate.get_col()
+        old_tile = self.__tiles[row][col]
+        if old_tile is not None:
+            self.__hash ^= ZOBRIST_KEYS[row * self.__size + col][str(old_tile)]
+        self.__tiles[row][col] = None
+        self.__invalidate_lines(row, col)
+
+    def zobrist_hash(self):
+        """
+        Returns the 64-bit Zobrist hash of the tiles on the board. See the
+        file doc for how it works.
+        """
+        return self.__hash
+
+    def get_layout(self):
+        """Returns the BoardLayout of the board."""
+        return self.__layout
+
+    def get_size(self):
+        """Returns the number of rows (and columns), 15 on a normal board."""
+        return self.__size
+
+    def get_center(self):
+        """Returns the row and column of the center square."""
+        return self.__size // 2
 
     def get_bonus(self, coordinate):
         """
@@ -56,28 +178,43 @@ class Board:
         2 => Double Word Score
         3 => Triple Letter Score
         4 => Triple Word Score
+        5 => Quadruple Letter Score (not on a normal board)
+        6 => Quadruple Word Score (not on a normal board)
         """
-        return BOARD_LAYOUT[coordinate.get_row()][coordinate.get_col()]
+        return self.__layout.get_bonus(coordinate.get_row(),
+                                       coordinate.get_col())
 
     def get_letter_multiplier(self, coordinate):
         """Returns 2 if coordinate has a DLS and 3 if
-        it has a TLS, 1 otherwise."""
-        if self.get_bonus(coordinate) == DLS:
-            return 2
-        elif self.get_bonus(coordinate) == TLS:
-            return 3
-        else:
-            return 1
+        it has a TLS (4 for a QLS), 1 otherwise."""
+        return self.__letter_multipliers[
+            coordinate.get_row() * self.__size + coordinate.get_col()]
 
     def get_word_multiplier(self, coordinate):
         """Returns 2 if coordinate has a DWS and 3 if
-        it has a TWS, 1 otherwise."""
-        if self.get_bonus(coordinate) == DWS:
-            return 2
-        elif self.get_bonus(coordinate) == TWS:
-            return 3
-        else:
-            return 1
+        it has a TWS (4 for a QWS), 1 otherwise."""
+        return self.__word_multipliers[
+            coordinate.get_row() * self.__size + coordinate.get_col()]
+
+    def __getstate__(self):
+        """
+        Pickles only the tiles and the hash: the line caches can hold whole
+        Lexicons, and a copy of a board has no moves to unmake.
+        """
+        state = self.__dict__.copy()
+        state["_Board__line_caches"] = {}
+        state["_Board__undo_stack"] = []
+        return state
+
+    def __hash__(self):
+        return self.__hash
+
+    def __eq__(self, other):
+        """Boards are equal if they have the same tiles in the same places."""
+        if not isinstance(other, self.__class__):
+            return False
+        # comparing hashes first makes unequal boards cheap to tell apart
+        return self.__hash == other.__hash and self.__tiles == other.__tiles
 
     def __str__(self):
         """Returns a human-readable table with * standing in for blank spots"""
@@ -101,6 +238,8 @@ class Board:
             #print("Checking if {} can be played over {}".format(
             #     str(tile), str(self.get_tile(current_coord)))
             #)
+            if current_coord is None:  # ran off the board
+                return False
             if tile is None:  # existing tile SHOULD be there
                 if self.get_tile(current_coord) is None:
                     return False
@@ -110,7 +249,117 @@ class Board:
 
             current_coord = current_coord.safe_increment()
         return True
-        
+
+    def check_move(self, move, lexicon):
+        """
+        Returns None if the move is legal on the board, or a string saying
+        why it isn't. A legal move fits on the board (its tiles go on empty
+        squares and the tiles in parentheses are really there), plays at
+        least one tile, covers the center square if the board is empty or
+        touches a tile on it otherwise, and every word it makes is in the
+        lexicon. The main word is read in the same walk that checks every
+        new tile against the cross-checks of its square (see
+        get_cross_checks), so no cross word is ever read out of the board.
+        """
+        if instrument.enabled:
+            instrument.count("board.check_move")
+        row, col, row_step, col_step = self.__walk(move)
+        tiles = self.__tiles
+        if move.get_coord().is_horizontal():
+            direction, index, position = (coordinate_module.HORIZONTAL,
+                                          row, col)
+        else:
+            direction, index, position = (coordinate_module.VERTICAL,
+                                          col, row)
+        played = move.get_just_played_tiles()
+        size = self.__size
+        if position + len(played) > size:
+            return "runs off the board"
+        if all(tile is None for tile in played):
+            return "plays no tiles"
+
+        board_is_empty = self.is_empty()
+        if not board_is_empty:
+            cross_checks = self.get_cross_checks(lexicon, direction, index)
+        center = size // 2
+        move_start = position
+        # tiles already on the board just before the move are part of it
+        while (row - row_step >= 0 and col - col_step >= 0 and
+                tiles[row - row_step][col - col_step] is not None):
+            row, col = row - row_step, col - col_step
+            position -= 1
+
+        word = []
+        touches = False
+        crosses = 0  # how many cross words the new tiles make
+        while position < size:
+            board_tile = tiles[row][col]
+            offset = position - move_start  # where in the move the square is
+            if 0 <= offset < len(played):
+                tile = played[offset]
+                if tile is None:
+                    if board_tile is None:
+                        return "no tile on the board at {}".format(
+                            coordinate_module.Coordinate(col, row, direction,
+                                                         size))
+                    if str(board_tile) != str(move[offset]):
+                        return "{} is on the board, not {}".format(
+                            board_tile, move[offset])
+                    touches = True
+                    word.append(str(board_tile).upper())
+                else:
+                    if board_tile is not None:
+                        return "a tile is already at {}".format(
+                            coordinate_module.Coordinate(col, row, direction,
+                                                         size))
+                    letter = str(tile).upper()
+                    if board_is_empty:
+                        if row == center and col == center:
+                            touches = True
+                    else:
+                        check = cross_checks[position]
+                        if check is not None:
+                            touches = True
+                            crosses += 1
+                            if letter not in check[0]:
+                                return "bad cross word with {}".format(
+                                    letter)
+                    word.append(letter)
+            elif board_tile is not None:  # touching the start or end
+                touches = True
+                word.append(str(board_tile).upper())
+            else:
+                break
+            position += 1
+            row += row_step
+            col += col_step
+
+        if not touches:
+            if board_is_empty:
+                return "the first move must cover the center square"
+            return "does not touch any tile on the board"
+        word = ''.join(word)
+        if len(word) == 1:
+            if crosses:  # a single tile making only a cross word
+                return None
+            return "makes no word of two letters or more"
+        if word not in lexicon:
+            return "{} is not a word".format(word)
+        return None
+
+    def is_legal_move(self, move, lexicon):
+        """Returns True if check_move finds nothing wrong with the move."""
+        return self.check_move(move, lexicon) is None
+
+    def check_moves(self, moves, lexicon):
+        """
+        Returns check_move for every move in moves, each checked against
+        the board as it is. Cross-checks are computed once for every line
+        and kept in the line caches, so checking many moves on one board
+        costs little more than walking each of them.
+        """
+        return [self.check_move(move, lexicon) for move in moves]
+
     def add_move(self, move):
         """Adds the given move to the board."""
         word = move.get_just_played_tiles()
@@ -135,111 +384,330 @@ class Board:
             current_coord = current_coord.safe_increment()
     
 
+    def __walk(self, move):
+        """
+        Returns the row and column of the first square of the move and the
+        row and column steps to take to get to each next square.
+        """
+        coordinate = move.get_coord()
+        if coordinate.is_horizontal():
+            return coordinate.get_row(), coordinate.get_col(), 0, 1
+        else:
+            return coordinate.get_row(), coordinate.get_col(), 1, 0
+
     def count_move(self, move):
         """Scores a word, NOT including parallel plays."""
-        word_added = False  # flag  
-        if not self.is_move_present(move):  # move not on board
-            self.add_move(move)  # add the word
-            word_added = True  # flag
-
-        word = move.get_just_played_tiles()
-        coordinate = move.get_coord()
-        current_coord = coordinate  # track our place in the word
+        row, col, row_step, col_step = self.__walk(move)
+        size = self.__size
+        letter_multipliers = self.__letter_multipliers
+        word_multipliers = self.__word_multipliers
         score = 0
         word_multiplier = 1  # to keep track of word multipliers
-        
-        for tile in word:
-            if tile is None: # just count letter value then move on
-                score += self.get_tile(current_coord).get_value()
-            
+        tiles_played = 0  # to check for a bingo
+
+        for index, tile in enumerate(move.get_just_played_tiles()):
+            if tile is None:  # just count letter value then move on
+                board_tile = self.__tiles[row][col]
+                if board_tile is None:  # move hasn't been checked
+                    board_tile = move[index]
+                score += board_tile.get_value()
+
             else:
-                score += (self.get_letter_multiplier(current_coord) *
-                            tile.get_value())
-        
-                word_multiplier *= self.get_word_multiplier(current_coord)
-            
-            current_coord = current_coord.safe_increment()
+                square = row * size + col
+                score += letter_multipliers[square] * tile.get_value()
+                word_multiplier *= word_multipliers[square]
+                tiles_played += 1
+
+            row += row_step
+            col += col_step
 
         score *= word_multiplier  # update score with word bonuses
         # check for bingo bonus
-        if len([tile for tile in word if tile is not None]) == 7:
-            score += 50
-
-        if word_added:  # remove the word after done scoring it
-            self.remove_move(move)
+        if tiles_played == RACK_SIZE:
+            score += BINGO_BONUS
 
         return score
-    
-    def score_move(self, move):
-        """Scores the given move, including parallel plays."""
-        # if the word isn't on the board, we add it then remove it again
-        word_added = False  # flag  
-        if not self.is_move_present(move):  # move not on board
-            self.add_move(move)  
-            word_added = True  # flag
 
-        word = move.get_just_played_tiles()
-        coordinate = move.get_coord()
-        current_coord = coordinate  # used for tracking
+    def __cross_word_sum(self, row, col, row_step, col_step):
+        """
+        Returns the sum of the values of the tiles touching the square at
+        row and col on either side along the given step (no multipliers),
+        or None if neither neighbor has a tile.
+        """
+        tiles = self.__tiles
+        total = 0
+        found = False
+
+        r, c = row - row_step, col - col_step
+        while 0 <= r and 0 <= c and tiles[r][c] is not None:
+            total += tiles[r][c].get_value()
+            found = True
+            r, c = r - row_step, c - col_step
+
+        r, c = row + row_step, col + col_step
+        size = self.__size
+        while (r < size and c < size and
+                tiles[r][c] is not None):
+            total += tiles[r][c].get_value()
+            found = True
+            r, c = r + row_step, c + col_step
+
+        if found:
+            return total
+        return None
+
+    def __check_fits(self, move):
+        """
+        Raises ValueError unless the move fits on the board or is on it
+        already: it stays on the board, the tiles in parentheses are there
+        and every tile it plays goes on an empty square or is there itself.
+        """
+        row, col, row_step, col_step = self.__walk(move)
+        size = self.__size
+        tiles = self.__tiles
+        placed = present = False  # tiles going on empty squares or there
+        for tile in move.get_just_played_tiles():
+            if row >= size or col >= size:
+                raise ValueError("{} runs off the board".format(move))
+            board_tile = tiles[row][col]
+            if tile is None:
+                if board_tile is None:
+                    raise ValueError("{} needs a tile at {}".format(
+                        move, coordinate_module.Coordinate(
+                            col, row, coordinate_module.HORIZONTAL, size)))
+            elif board_tile is None:
+                placed = True
+            elif board_tile == tile:
+                present = True
+            else:
+                raise ValueError("{} plays over the {} at {}".format(
+                    move, board_tile, coordinate_module.Coordinate(
+                        col, row, coordinate_module.HORIZONTAL, size)))
+            row += row_step
+            col += col_step
+        if placed and present:
+            raise ValueError("{} is only partly on the board".format(move))
+
+    def score_move(self, move, check=True):
+        """
+        Scores the given move, including parallel plays. The board is not
+        changed, and the move may or may not be on it already. Raises
+        ValueError if the move doesn't fit on the board (see __check_fits).
+        A caller that found the move on this board with a MoveFinder can
+        pass check=False to skip checking it again.
+        """
+        if instrument.enabled:
+            instrument.count("board.score_move")
+        if check:
+            self.__check_fits(move)
+        row, col, row_step, col_step = self.__walk(move)
+        size = self.__size
         total_score = self.count_move(move)  # count the main play
 
-
-        if coordinate.is_horizontal():  # parallel plays in columns
-            for tile in word:
-                # if this is an existing tile, nothing needs to be done
-                if tile is None:
-                    pass
-
-                else:
-                    above_current = current_coord.safe_move_up()
-                    below_current = current_coord.safe_move_down()
-                    
-                    # avoid error if on the border of the board
-                    above_tile = self.safe_get_tile(above_current)
-                    below_tile = self.safe_get_tile(below_current)
-                    
-                    # no parallel plays
-                    if above_tile is None and below_tile is None:
-                        pass
-                    else:
-                        word_multiplier = self.get_word_multiplier(current_coord)
-                        score = 0  # keep track of score for this parallel play
-                        # count the tile in the main word
-                        score += (self.get_letter_multiplier(current_coord) *
-                                    tile.get_value())
-                        
-                        # check for letters above the main word
-                        above = current_coord.safe_move_up()
-                        while (above is not None and
-                                self.get_tile(above) is not None):
-                            # no multipliers
-                            score += self.get_tile(above).get_value()
-                            above = above.safe_move_up()
-                        
-                        below = current_coord.safe_move_down()
-                        while (below is not None and
-                                self.get_tile(below) is not None):
-                            # no multipliers
-                            score += self.get_tile(below).get_value()
-                            below = below.safe_move_down()
-                        # update main score                        
-                        total_score += score * word_multiplier
-                # move along in word     
-                current_coord = current_coord.safe_increment()
-
-        else:  # just flip the board to run the algorithm
-            return self.flip().score_move(move.flip())
-
-        if word_added:  # remove the word after done scoring it
-            self.remove_move(move)
-            pass
+        for tile in move.get_just_played_tiles():
+            # if this is an existing tile, nothing needs to be done
+            if tile is not None:
+                # cross words run the other way
+                cross_sum = self.__cross_word_sum(row, col, col_step, row_step)
+                if cross_sum is not None:  # there is a parallel play
+                    square = row * size + col
+                    total_score += (
+                        (cross_sum + self.__letter_multipliers[square] *
+                         tile.get_value()) * self.__word_multipliers[square])
+            # move along in word
+            row += row_step
+            col += col_step
 
         return total_score
 
     def play_move(self, move):
         """Adds the word to the board and returns the score"""
         self.add_move(move)
-        return self.score_move(move)
+        return self.score_move(move, False)
+
+    def make_move(self, move, score=None):
+        """
+        Adds the move to the board so that it can be taken back with
+        unmake_move, and returns its score. Raises ValueError if the
+        move doesn't fit on the board. A search that already has the
+        move's score from this position can pass it in to skip checking
+        and scoring the move again; the move is then trusted to fit.
+        """
+        if score is None:
+            if not self.is_valid_move(move):
+                raise ValueError(
+                    "Invalid word: overlapping or missing tiles")
+            score = self.score_move(move, False)
+
+        row, col, row_step, col_step = self.__walk(move)
+        tiles = self.__tiles
+        squares = []  # (row, col) of every tile placed
+        saved_caches = {}  # line key -> its cache before the move
+
+        for tile in move.get_just_played_tiles():
+            if tile is not None:
+                tiles[row][col] = tile
+                self.__hash ^= ZOBRIST_KEYS[row * self.__size + col][str(tile)]
+                squares.append((row, col))
+                for key in ((coordinate_module.HORIZONTAL, row),
+                            (coordinate_module.VERTICAL, col)):
+                    if key not in saved_caches:
+                        saved_caches[key] = self.__line_caches.pop(key, None)
+            row += row_step
+            col += col_step
+
+        self.__undo_stack.append((squares, saved_caches))
+        return score
+
+    def unmake_move(self):
+        """
+        Takes back the move most recently added with make_move, restoring
+        the board, its hash and its line caches exactly as they were.
+        Raises IndexError if there is no move to take back.
+        """
+        squares, saved_caches = self.__undo_stack.pop()
+        tiles = self.__tiles
+        for row, col in squares:
+            self.__hash ^= ZOBRIST_KEYS[row * self.__size + col][
+                str(tiles[row][col])]
+            tiles[row][col] = None
+        for key, cache in saved_caches.items():
+            if cache is None:
+                self.__line_caches.pop(key, None)
+            else:
+                self.__line_caches[key] = cache
+
+    def diff(self, other):
+        """
+        Returns a list of (Coordinate, tile) for every square where the
+        Board other has a different tile (None if it's empty there), row by
+        row, which apply_delta turns this board into other with. Raises
+        ValueError if other is a different size.
+        """
+        if other.__size != self.__size:
+            raise ValueError("Can't compare boards of different sizes")
+        if self.__hash == other.__hash and self.__tiles == other.__tiles:
+            return []
+        changes = []
+        for row, (tiles, other_tiles) in enumerate(zip(self.__tiles,
+                                                       other.__tiles)):
+            if tiles == other_tiles:
+                continue
+            for col, (tile, other_tile) in enumerate(zip(tiles,
+                                                         other_tiles)):
+                if tile != other_tile:
+                    changes.append((coordinate_module.Coordinate(
+                        col, row, coordinate_module.HORIZONTAL,
+                        self.__size), other_tile))
+        return changes
+
+    def apply_delta(self, changes):
+        """
+        Puts every tile in changes, a list of (Coordinate, tile or None for
+        none) like diff returns, on the board, updating the hash and
+        throwing away the caches of only the rows and columns changed, and
+        returns the set of (direction, index) of those lines. Raises
+        ValueError if there are moves to unmake, since unmaking them would
+        undo the wrong squares.
+        """
+        if self.__undo_stack:
+            raise ValueError("Can't apply a delta with moves to unmake")
+        lines = set()
+        for coordinate, tile in changes:
+            if tile is None:
+                self.remove_tile(coordinate)
+            else:
+                self.add_tile(tile, coordinate)
+            lines.add((coordinate_module.HORIZONTAL, coordinate.get_row()))
+            lines.add((coordinate_module.VERTICAL, coordinate.get_col()))
+        return lines
+
+    def get_undo_depth(self):
+        """Returns how many moves make_move has added that can be unmade."""
+        return len(self.__undo_stack)
+
+    def get_line_cache(self, direction, index):
+        """
+        Returns a dictionary for caching anything derived only from the
+        tiles in one line of the board: the row index if direction is
+        HORIZONTAL and the column index if it is VERTICAL. The dictionary
+        is replaced by an empty one whenever a tile in that line changes.
+        """
+        key = (direction, index)
+        try:
+            return self.__line_caches[key]
+        except KeyError:
+            cache = self.__line_caches[key] = {}
+            return cache
+
+    def get_cross_checks(self, lexicon, direction, index):
+        """
+        Returns a list with an entry for every square of a line for playing
+        words along it in the given direction (a row if HORIZONTAL, a column
+        if VERTICAL). An entry is None if the square is taken or nothing
+        touches it from the other direction; otherwise it is a tuple of the
+        string of letters that make a word with the tiles touching it
+        (according to lexicon) and the sum of those tiles' values.
+
+        Each entry only depends on the perpendicular line through its
+        square, so that's where it is cached.
+        """
+        across = 1 - direction  # the lines the cross words are in
+        key = ("cross checks", lexicon, lexicon.get_revision())
+        checks = []
+        for other_index in range(self.__size):
+            cache = self.get_line_cache(across, other_index)
+            try:
+                line_checks = cache[key]
+            except KeyError:
+                if instrument.enabled:
+                    instrument.count("board.cross_check_lines")
+                line_checks = cache[key] = self.__line_cross_checks(
+                    lexicon, across, other_index)
+            checks.append(line_checks[index])
+        return checks
+
+    def __line_cross_checks(self, lexicon, direction, index):
+        """
+        Returns the cross-check entry (see get_cross_checks) of every square
+        in a line, for words played across it, where the cross words are
+        along the line itself.
+        """
+        if direction == coordinate_module.HORIZONTAL:
+            line = self.__tiles[index]
+        else:
+            line = [row[index] for row in self.__tiles]
+
+        dawg = lexicon.get_dawg()
+        size = self.__size
+        checks = [None] * size
+        for position in range(size):
+            if line[position] is not None:
+                continue
+            start = position
+            while start > 0 and line[start - 1] is not None:
+                start -= 1
+            end = position + 1
+            while end < size and line[end] is not None:
+                end += 1
+            if start == position and end == position + 1:
+                continue  # nothing touching it
+
+            before = line[start:position]
+            after = line[position + 1:end]
+            prefix = ''.join(str(tile).upper() for tile in before)
+            suffix = ''.join(str(tile).upper() for tile in after)
+            value = sum(tile.get_value() for tile in before + after)
+
+            letters = ""
+            node = dawg.follow(prefix)
+            if node is not None:
+                for letter, child in sorted(dawg.get_children(node).items()):
+                    end_node = dawg.follow(suffix, child)
+                    if end_node is not None and dawg.is_terminal(end_node):
+                        letters += letter
+            checks[position] = (letters, value)
+        return checks
 
     def is_move_present(self, move):
         """Returns True if the move is present and False otherwise"""
@@ -258,10 +726,11 @@ class Board:
         """
         Returns a new Board with horizontal and vertical switched, like
         a reflection over the line from A1 to O15"""
-        new_board = Board()
-        for i in range(15):
-            for j in range(15):
-                coord = coordinate_module.Coordinate(i, j, 0)
+        size = self.__size
+        new_board = Board(self.__layout)
+        for i in range(size):
+            for j in range(size):
+                coord = coordinate_module.Coordinate(i, j, 0, size)
                 # direction doesn't matter
                 tile = self.get_tile(coord)
                 new_board.add_tile(tile, coord.flip())
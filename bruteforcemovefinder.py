@@ -0,0 +1,211 @@
+"""
+This file provides BruteForceMoveFinder, a MoveFinder that is slow but
+simple enough to trust, for checking faster ones against (see
+consistency). It doesn't use a DAWG, anchors or cross-checks: it tries
+every word of the lexicon in every place on the board, and keeps the ones
+that fit, can be made with the rack and make only words in the lexicon.
+
+A word goes in a place if the squares just before and after it are empty
+(or off the board), the tiles already on the board there are the word's
+letters, and it plays at least one tile. The first move has to cover the
+center square, and every other move has to touch a tile on the board. Then
+every word the new tiles make across the line is read straight out of the
+board and looked up. Every way the rack can make the tiles played (using
+blanks for any of them) is a different move, and every move is checked
+with Board.is_valid_move before it's kept. Board.check_move isn't used,
+since it reads cross words from the same cached cross-checks as the fast
+finders, so a mistake there would be made by both.
+
+Like AnchorMoveFinder, a single tile that makes words both ways is only
+given as a horizontal move. Words that can't be made with the rack and the
+letters already in a line are ruled out before trying it, which is what
+makes a position take seconds rather than minutes.
+"""
+
+from itertools import combinations
+
+from anchormovefinder import BLANK, rack_string
+from coordinate import Coordinate, HORIZONTAL, VERTICAL
+from MoveFinder import MoveFinder
+from move import Move
+import instrument
+
+
+def letter_counts(letters):
+    """Returns a dictionary from each letter to how many times it's there."""
+    counts = {}
+    for letter in letters:
+        counts[letter] = counts.get(letter, 0) + 1
+    return counts
+
+
+def missing_letters(word_counts, available):
+    """
+    Returns how many of the word's letters (a letter_counts dictionary)
+    aren't in the letter_counts dictionary available.
+    """
+    missing = 0
+    for letter, count in word_counts.items():
+        have = available.get(letter, 0)
+        if count > have:
+            missing += count - have
+    return missing
+
+
+class BruteForceMoveFinder(MoveFinder):
+    """A MoveFinder that tries every word everywhere. See the file doc."""
+
+    @instrument.timed("bruteforcemovefinder.find_all_moves")
+    def find_all_moves(self, tiles, board):
+        """
+        Finds every move on the board with the given tiles (see rack_string)
+        and returns a list of Moves, like AnchorMoveFinder.find_all_moves.
+        """
+        rack = letter_counts(rack_string(tiles))
+        blanks = rack.pop(BLANK, 0)
+        size = board.get_size()
+
+        # (direction, index, letters, letter_counts of the rack and the
+        # letters) of every line, with None for the empty squares
+        lines = []
+        for direction in (HORIZONTAL, VERTICAL):
+            for index in range(size):
+                if direction == HORIZONTAL:
+                    line_tiles = board.get_row_tiles(index)
+                else:
+                    line_tiles = board.get_column_tiles(index)
+                letters = [None if tile is None else str(tile).upper()
+                           for tile in line_tiles]
+                lines.append((direction, index, letters, letter_counts(
+                    letter for letter in letters if letter is not None)))
+        everything = dict(rack)  # the rack and every letter on the board
+        for direction, index, letters, line_counts in lines[:size]:
+            for letter, count in line_counts.items():
+                everything[letter] = everything.get(letter, 0) + count
+        for direction, index, letters, line_counts in lines:
+            for letter, count in rack.items():
+                line_counts[letter] = line_counts.get(letter, 0) + count
+
+        moves = []
+        buckets = self.get_lexicon().get_length_buckets()
+        for length in sorted(buckets):
+            if not 2 <= length <= size:
+                continue
+            for word in buckets[length]:
+                word_counts = letter_counts(word)
+                if missing_letters(word_counts, everything) > blanks:
+                    continue
+                for direction, index, letters, available in lines:
+                    if missing_letters(word_counts, available) > blanks:
+                        continue
+                    for start in range(size - length + 1):
+                        moves.extend(self.__place(
+                            word, board, direction, index, letters, start,
+                            rack, blanks))
+        if instrument.enabled:
+            instrument.count("bruteforcemovefinder.moves", len(moves))
+        return moves
+
+    def __place(self, word, board, direction, index, letters, start, rack,
+                blanks):
+        """
+        Returns a list of every Move playing word at start in the line whose
+        letters are given (None for empty squares) that the rack makes.
+        """
+        size = len(letters)
+        end = start + len(word)
+        if ((start > 0 and letters[start - 1] is not None) or
+                (end < size and letters[end] is not None)):
+            return []
+        played = []  # offsets in the word of the tiles played
+        for offset, letter in enumerate(word):
+            on_board = letters[start + offset]
+            if on_board is None:
+                played.append(offset)
+            elif on_board != letter:
+                return []
+        if not played or not self.__is_legal(word, board, direction, index,
+                                             start, played):
+            return []
+
+        moves = []
+        for count in range(min(blanks, len(played)) + 1):
+            for blanked in combinations(played, count):
+                needed = letter_counts(word[offset] for offset in played
+                                       if offset not in blanked)
+                if missing_letters(needed, rack):
+                    continue
+                move = self.__make_move(word, board, direction, index, start,
+                                        blanked)
+                if board.is_valid_move(move):
+                    moves.append(move)
+        return moves
+
+    def __is_legal(self, word, board, direction, index, start, played):
+        """
+        Returns True if playing word at start with the tiles at the offsets
+        played covers the center square of an empty board or touches a tile
+        on any other, makes only words in the lexicon across the line, and
+        isn't a single tile played down that also makes a word across.
+        """
+        size = board.get_size()
+        lexicon = self.get_lexicon()
+        if board.is_empty():
+            center = board.get_center()
+            return (index == center and
+                    start <= center < start + len(word))
+
+        touches = len(played) < len(word)  # some of the word is on the board
+        for offset in played:
+            position = start + offset
+            if direction == HORIZONTAL:
+                across = board.get_column_tiles(position)
+            else:
+                across = board.get_row_tiles(position)
+            first = index
+            while first > 0 and across[first - 1] is not None:
+                first -= 1
+            last = index
+            while last < size - 1 and across[last + 1] is not None:
+                last += 1
+            if first == last:
+                continue  # no word across
+            if direction == VERTICAL and len(played) == 1:
+                return False  # found as a horizontal move instead
+            touches = True
+            cross_word = ''.join(word[offset] if square == index else
+                                 str(across[square]).upper()
+                                 for square in range(first, last + 1))
+            if cross_word not in lexicon:
+                return False
+        return touches
+
+    def __make_move(self, word, board, direction, index, start, blanked):
+        """
+        Returns the Move playing word at start, with blanks for the letters
+        at the offsets in blanked and the tiles on the board in parentheses.
+        """
+        size = board.get_size()
+        if direction == HORIZONTAL:
+            line_tiles = board.get_row_tiles(index)
+            coordinate = Coordinate(start, index, HORIZONTAL, size)
+        else:
+            line_tiles = board.get_column_tiles(index)
+            coordinate = Coordinate(index, start, VERTICAL, size)
+        string = ""
+        on_board = False
+        for offset, letter in enumerate(word):
+            tile = line_tiles[start + offset]
+            if tile is None:
+                if on_board:
+                    string += ')'
+                    on_board = False
+                string += letter.lower() if offset in blanked else letter
+            else:
+                if not on_board:
+                    string += '('
+                    on_board = True
+                string += str(tile)
+        if on_board:
+            string += ')'
+        return Move(string, coordinate)
@@ -0,0 +1,230 @@
+"""
+This file anagrams many racks at once, for making study decks and quizzes
+out of tens of thousands of alphagrams. It works like base_anagram, looking
+racks up in the lexicon's anagram index by their prime products, but:
+
+every rack's product is worked out once, and racks with the same letters
+    (in any order) are only looked up once
+a rack with blanks is looked up once for every set of letters the blanks
+    could be, rather than once for every ordered choice as wordtools.anagram
+    does, so "AEINR??" takes 351 lookups instead of 676 and no duplicates
+    have to be removed
+results are yielded one rack at a time, in the order of the racks, so a
+    deck can be written out as it's made instead of kept in memory
+
+anagram_racks takes any iterable of racks, like read_racks(file) or
+study_deck(lengths), and can also spread them across a pool of processes.
+Run as a script, it writes one line per rack, the rack followed by its
+anagrams, for the racks in a file or a whole study deck:
+
+    python bulk_anagram.py racks.txt --output answers.txt
+    python bulk_anagram.py --deck 7 8 --output deck.txt
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations_with_replacement, islice
+
+import lexicon as lexicon_module
+from lexicon import LETTER_TO_PRIME
+
+BLANK = '?'
+
+PRIMES = {letter.upper(): prime for letter, prime in LETTER_TO_PRIME.items()}
+
+
+def rack_key(rack):
+    """
+    Returns the (prime product, number of blanks) of the rack, which is the
+    same for every ordering of its tiles. Raises ValueError for a tile that
+    isn't a letter or a blank.
+    """
+    product = 1
+    blanks = 0
+    for tile in rack.upper():
+        if tile == BLANK:
+            blanks += 1
+        else:
+            try:
+                product *= PRIMES[tile]
+            except KeyError:
+                raise ValueError("Bad tile {} in rack {}".format(tile, rack))
+    return product, blanks
+
+
+def blank_products(blanks):
+    """Returns the product of every set of letters the blanks could be."""
+    products = []
+    for letters in combinations_with_replacement(PRIMES.values(), blanks):
+        product = 1
+        for prime in letters:
+            product *= prime
+        products.append(product)
+    return products
+
+
+def look_up(key, index, blank_tables):
+    """
+    Returns the sorted list of words made with the rack of the key in the
+    anagram index, where blank_tables is a dictionary from numbers of
+    blanks to their blank_products, filled in as needed.
+    """
+    product, blanks = key
+    if not blanks:
+        return list(index.get(product, ()))
+    if blanks not in blank_tables:
+        blank_tables[blanks] = blank_products(blanks)
+    words = []
+    for blank_product in blank_tables[blanks]:
+        found = index.get(product * blank_product)
+        if found:
+            words.extend(found)
+    words.sort()
+    return words
+
+
+def anagram_chunk(racks, lexicon=None):
+    """Returns a list of the anagrams of each rack in the list."""
+    if lexicon is None:
+        lexicon = worker_lexicon
+    index = lexicon.get_anagram_index()
+    blank_tables = {}
+    found = {}  # key -> words, so repeated letters are looked up once
+    results = []
+    for key in map(rack_key, racks):
+        words = found.get(key)
+        if words is None:
+            words = found[key] = look_up(key, index, blank_tables)
+        results.append(words)
+    return results
+
+
+def chunks(iterable, size):
+    """Yields lists of size items of the iterable at a time."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# the Lexicon each worker process uses, set by initialize_worker
+worker_lexicon = None
+
+
+def initialize_worker(lexicon):
+    global worker_lexicon
+    worker_lexicon = lexicon
+
+
+def anagram_racks(racks, lexicon=None, processes=0, chunk_size=2000):
+    """
+    Yields (rack, sorted list of its anagrams) for every rack in the
+    iterable, in order, anagramming chunk_size racks at a time. With
+    processes=0 (the default) everything happens in this process; otherwise
+    the chunks are spread across that many worker processes (None for one
+    per CPU), which only pays off for very large inputs on several CPUs.
+    Raises ValueError for a rack with a tile that isn't a letter or a blank.
+    """
+    lexicon = lexicon_module.choose_lexicon(lexicon)
+    if processes == 0:
+        for chunk in chunks(racks, chunk_size):
+            yield from zip(chunk, anagram_chunk(chunk, lexicon))
+        return
+
+    # forked workers share the already loaded lexicon instead of loading it
+    with ProcessPoolExecutor(processes, multiprocessing.get_context("fork"),
+                             initialize_worker, (lexicon,)) as pool:
+        pending = chunks(racks, chunk_size)
+        window = deque()  # chunks in flight and their futures, oldest first
+        for chunk in islice(pending, 2 * (processes or 4)):
+            window.append((chunk, pool.submit(anagram_chunk, chunk)))
+        while window:
+            chunk, future = window.popleft()
+            results = future.result()
+            for chunk_after in islice(pending, 1):
+                window.append((chunk_after,
+                               pool.submit(anagram_chunk, chunk_after)))
+            yield from zip(chunk, results)
+
+
+def read_racks(file):
+    """Yields the rack on every line of the file, skipping blank lines."""
+    for line in file:
+        rack = line.strip()
+        if rack:
+            yield rack
+
+
+def study_deck(lengths, lexicon=None):
+    """
+    Yields the alphagram (the letters in alphabetical order) of every word
+    with one of the lengths, once each, shortest first and then in
+    alphabetical order.
+    """
+    buckets = lexicon_module.choose_lexicon(lexicon).get_length_buckets()
+    for length in sorted(lengths):
+        yield from sorted(set(''.join(sorted(word))
+                              for word in buckets.get(length, ())))
+
+
+def write_answers(results, output):
+    """
+    Writes each (rack, anagrams) as a line of the rack and its anagrams
+    separated by spaces, and returns how many racks there were.
+    """
+    count = 0
+    for rack, words in results:
+        output.write(rack)
+        if words:
+            output.write(' ' + ' '.join(words))
+        output.write('\n')
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Anagram every rack in a file or a whole study deck.")
+    parser.add_argument("racks", nargs="?",
+                        help="file with one rack per line (default stdin)")
+    parser.add_argument("--deck", type=int, nargs="+", metavar="LENGTH",
+                        help="anagram every alphagram of these lengths")
+    parser.add_argument("--output", help="file to write (default stdout)")
+    parser.add_argument("--processes", type=int, default=0)
+    parser.add_argument("--word-list",
+                        default=lexicon_module.DEFAULT_WORD_LIST)
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    lexicon = lexicon_module.get_lexicon(arguments.word_list)
+    racks_file = None
+    if arguments.deck:
+        racks = study_deck(arguments.deck, lexicon)
+    elif arguments.racks:
+        racks_file = open(arguments.racks)
+        racks = read_racks(racks_file)
+    else:
+        racks = read_racks(sys.stdin)
+    output = sys.stdout if arguments.output is None else \
+        open(arguments.output, "w")
+    try:
+        count = write_answers(anagram_racks(racks, lexicon,
+                                            arguments.processes), output)
+    finally:
+        if racks_file is not None:
+            racks_file.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print("Anagrammed {} racks in {:.2f}s".format(count, elapsed),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+This file checks a MoveFinder against BruteForceMoveFinder (see
+bruteforcemovefinder) on random positions, so that the fast move
+generators can be made faster without fear of losing moves.
+
+Every position is made from a seed and a number, so it can be made again
+exactly: a random number of turns (up to max_turns) of random moves found
+by the MoveFinder being checked, played from a seeded Bag, and then a full
+rack. Only moves Board.check_move finds legal are played, so a finder that
+finds illegal moves can't build an illegal position. Both finders find
+every move there, and any difference is a mismatch:
+
+missing
+    moves the reference finds and the finder doesn't
+extra
+    moves the finder finds that the reference doesn't (illegal moves,
+    or legal ones written differently)
+duplicates
+    moves the finder gives more than once
+
+Moves are compared by their coordinate and move string, like "8H" and
+"QUIx(OTE)". check_consistency spreads the positions across a pool of
+processes and reports every mismatched position along with how long each
+finder took and how much faster the finder is. The finder is given by its
+module and class names, so that every worker process can make its own.
+
+Run as a script, it prints the report and exits with status 1 if any
+position didn't match:
+
+    python consistency.py anchormovefinder.AnchorMoveFinder --positions 40
+"""
+
+import argparse
+import importlib
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bag import Bag, Rack
+from board import Board
+from bruteforcemovefinder import BruteForceMoveFinder
+from simulation import tiles_played
+import lexicon as lexicon_module
+
+
+DEFAULT_FINDER = "anchormovefinder.AnchorMoveFinder"
+MAX_TURNS = 12
+MAX_LISTED = 10  # moves listed for each kind of mismatch in a position
+
+
+def load_finder(name, lexicon=None):
+    """
+    Returns a MoveFinder of the class named like "module.Class", for the
+    Lexicon. Raises ValueError if there's no such class.
+    """
+    module_name, _, class_name = name.rpartition('.')
+    try:
+        finder_class = getattr(importlib.import_module(module_name),
+                               class_name)
+    except (ImportError, AttributeError, ValueError):
+        raise ValueError("No MoveFinder {}".format(name))
+    return finder_class(lexicon)
+
+
+def random_position(move_finder, seed, number, max_turns=MAX_TURNS):
+    """
+    Returns the (Board, rack string) of position number of a run: up to
+    max_turns turns of random legal moves found by move_finder, then a
+    full rack.
+    """
+    lexicon = move_finder.get_lexicon()
+    generator = random.Random(seed * 1000003 + number)
+    bag = Bag()
+    rack = Rack()
+    board = Board()
+    for turn in range(generator.randint(0, max_turns)):
+        bag.fill(rack, generator)
+        moves = move_finder.find_all_moves(str(rack), board)
+        move = None
+        while moves:
+            move = moves.pop(generator.randrange(len(moves)))
+            if board.check_move(move, lexicon) is None:
+                break
+            move = None
+        if move is None:
+            break
+        board.add_move(move)
+        rack.remove_letters(tiles_played(move))
+    bag.fill(rack, generator)
+    return board, str(rack)
+
+
+def move_key(move):
+    """Returns what two moves are compared by: (coordinate, move string)."""
+    return str(move.get_coord()), move.to_string()
+
+
+def compare_moves(reference_moves, moves):
+    """
+    Returns a dictionary of the sorted lists of missing, extra and
+    duplicate moves (see the file doc) as move_keys.
+    """
+    expected = set(map(move_key, reference_moves))
+    found = {}  # move_key -> how many times moves has it
+    for key in map(move_key, moves):
+        found[key] = found.get(key, 0) + 1
+    return {
+        "missing": sorted(expected.difference(found)),
+        "extra": sorted(set(found).difference(expected)),
+        "duplicates": sorted(key for key, count in found.items()
+                             if count > 1),
+    }
+
+
+# the (reference, finder) MoveFinders each worker process uses
+worker_finders = None
+
+
+def initialize_worker(finder_name, word_list):
+    """Makes the move finders in a worker process."""
+    global worker_finders
+    lexicon = lexicon_module.get_lexicon(word_list)
+    worker_finders = (BruteForceMoveFinder(lexicon),
+                      load_finder(finder_name, lexicon))
+
+
+def check_position(seed, number, max_turns=MAX_TURNS):
+    """
+    Makes position number of a run in a worker process and returns a
+    dictionary of what was found there: the rack and board, how many moves
+    and seconds each finder took and the mismatches (see compare_moves).
+    """
+    reference, finder = worker_finders
+    board, rack = random_position(finder, seed, number, max_turns)
+
+    start = time.perf_counter()
+    reference_moves = reference.find_all_moves(rack, board)
+    reference_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    moves = finder.find_all_moves(rack, board)
+    seconds = time.perf_counter() - start
+
+    result = {"number": number, "rack": rack, "board": str(board),
+              "reference_moves": len(reference_moves), "moves": len(moves),
+              "reference_seconds": reference_seconds, "seconds": seconds}
+    result.update(compare_moves(reference_moves, moves))
+    return result
+
+
+def check_consistency(finder_name=DEFAULT_FINDER, positions=20, seed=0,
+                      processes=None,
+                      word_list=lexicon_module.DEFAULT_WORD_LIST,
+                      max_turns=MAX_TURNS):
+    """
+    Checks the MoveFinder named finder_name (see load_finder) against
+    BruteForceMoveFinder on positions random positions across a pool of
+    processes (processes=0 checks them all in this process) and returns a
+    report dictionary: how many positions and moves there were, every
+    position that didn't match (with up to MAX_LISTED moves of each kind
+    of mismatch), the seconds each finder took in all and the speedup.
+    Raises ValueError if there's no such MoveFinder.
+    """
+    load_finder(finder_name)  # fail here rather than in every worker
+    arguments = (finder_name, word_list)
+    numbers = range(positions)
+
+    start = time.perf_counter()
+    if processes == 0:
+        initialize_worker(*arguments)
+        results = [check_position(seed, number, max_turns)
+                   for number in numbers]
+    else:
+        with ProcessPoolExecutor(processes, initializer=initialize_worker,
+                                 initargs=arguments) as pool:
+            results = list(pool.map(check_position, [seed] * positions,
+                                    numbers, [max_turns] * positions))
+    elapsed = time.perf_counter() - start
+    return summarize(finder_name, seed, results, elapsed)
+
+
+def summarize(finder_name, seed, results, elapsed):
+    """Returns the report of check_consistency for its results."""
+    report = {"finder": finder_name, "seed": seed, "positions": len(results),
+              "moves": 0, "mismatched": [], "reference_seconds": 0.0,
+              "seconds": 0.0}
+    for result in results:
+        report["moves"] += result["reference_moves"]
+        report["reference_seconds"] += result["reference_seconds"]
+        report["seconds"] += result["seconds"]
+        kinds = ("missing", "extra", "duplicates")
+        if any(result[kind] for kind in kinds):
+            mismatch = {key: result[key] for key in
+                        ("number", "rack", "board", "reference_moves",
+                         "moves")}
+            for kind in kinds:
+                mismatch[kind] = len(result[kind])
+                mismatch[kind + "_moves"] = [
+                    ' '.join(key) for key in result[kind][:MAX_LISTED]]
+            report["mismatched"].append(mismatch)
+
+    report["speedup"] = round(report["reference_seconds"] /
+                              report["seconds"], 1) \
+        if report["seconds"] else None
+    report["reference_seconds"] = round(report["reference_seconds"], 3)
+    report["seconds"] = round(report["seconds"], 3)
+    report["elapsed_seconds"] = round(elapsed, 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check a MoveFinder against the brute force one.")
+    parser.add_argument("finder", nargs="?", default=DEFAULT_FINDER,
+                        help="module.Class of the MoveFinder to check")
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (0 for none)")
+    parser.add_argument("--word-list",
+                        default=lexicon_module.DEFAULT_WORD_LIST)
+    arguments = parser.parse_args()
+
+    report = check_consistency(arguments.finder, arguments.positions,
+                               arguments.seed, arguments.processes,
+                               arguments.word_list, arguments.max_turns)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if report["mismatched"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ This file details some basic constants: the normal Scrabble bonus square
 layout and the tile values and counts in a normal bag.
 It also provides a list of all the normal regulation tiles to use
 in a bag and a list of every letter in the alphabet and '?'.
+(For drawing tiles quickly, see the Bag and Rack classes in bag.)
 """
 
 from string import ascii_uppercase
@@ -14,6 +15,7 @@ ALPHABET_WITH_Q_MARK = ascii_uppercase + "?"
 # ID's for each bonus square type, NON is a normal square
 
 NON, DLS, DWS, TLS, TWS = 0, 1, 2, 3, 4
+QLS, QWS = 5, 6  # quadruple letter and word, on bigger boards (see layout)
 
 BOARD_LAYOUT = [
     [TWS, NON, NON, DLS, NON, NON, NON, TWS, NON, NON, NON, DLS, NON, NON, TWS],
@@ -115,4 +117,4 @@ for tile in ALPHABET_WITH_Q_MARK:
 
 TILE_LIST = make_unique(TILE_BAG)
 
-TILE_LIST_WITH_BLANK = make_unique(TILE_BAG)
\ No newline at end of file
+TILE_LIST_WITH_BLANK = make_unique(TILE_BAG_WITH_BLANK)
\ No newline at end of file
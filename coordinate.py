@@ -5,10 +5,18 @@ and array indices and direction. Note that A8 means the left-middle
 TWS square and a word going horizontally, but 8A means a word going from
 that square going vertically. Also note that A-O signifies column and
 1-15 signifies row.
+
+Coordinates are on a normal 15x15 board unless given another size, for
+boards with other layouts (see layout): on a 21x21 board, A-U and 1-21.
 """
 
+from string import ascii_uppercase
+
+import instrument
+
 HORIZONTAL, VERTICAL = 0, 1  # for representing direction
-LETTERS = "ABCDEFGHIJKLMNO"  # for translating between A-O and 0-14
+LETTERS = ascii_uppercase  # for translating between A-O and 0-14, etc.
+DEFAULT_SIZE = 15
 
 
 class Coordinate:
@@ -20,27 +28,32 @@ class Coordinate:
     return new coordinates instead of changing the existing one.
     """
 
-    def __init__(self, col, row, direction):
+    def __init__(self, col, row, direction, size=DEFAULT_SIZE):
         """
         Takes two integers col and row from 0-14 that signify
         column and row respectively, and direction that is either
-        horizontal (0) or vertical (1).
+        horizontal (0) or vertical (1). On a board of another size, col
+        and row go up to size - 1.
         """
-        if not (0 <= col <= 14 and
-                0 <= row <= 14 and
+        if not (0 <= col < size and
+                0 <= row < size and
                 0 <= direction <= 1):  # invalid coordinate
             raise ValueError("Coordinate values out of bounds")
+        if instrument.enabled:
+            instrument.count("coordinate.created")
 
         self.__col = col
         self.__row = row
         self.__direction = direction
+        self.__size = size
 
     @classmethod
-    def initialize_from_string(cls, coord_string):
+    def initialize_from_string(cls, coord_string, size=DEFAULT_SIZE):
         """
         Takes one string of the form letter + number or number + letter,
         between A-O and 1-15, like "O15" or "8A", with letter signifying
-        column and number signifying row, and returns a Coordinate.
+        column and number signifying row, and returns a Coordinate on a
+        board of the given size.
         """
         if coord_string[0] in LETTERS:  # signifies vertical direction
             direction = VERTICAL
@@ -56,7 +69,7 @@ class Coordinate:
                 raise ValueError("Invalid letter value or improper syntax")
 
         try:
-            return cls(col, row-1, direction)
+            return cls(col, row-1, direction, size)
 
         except (TypeError, ValueError):  # bad coordinates
             raise ValueError("Coordinate values out of bounds")
@@ -74,13 +87,18 @@ class Coordinate:
         """Returns the row value from 0-14"""
         return self.__row
 
+    def get_size(self):
+        """Returns the size of the board the coordinate is on."""
+        return self.__size
+
     def flip(self):
         """
         Returns the Coordinate with reversed direction and row-column
         "A7" -> "1G"
         "9F" -> "I6"
         """
-        return Coordinate(self.__row, self.__col, 1 - self.__direction)
+        return Coordinate(self.__row, self.__col, 1 - self.__direction,
+                          self.__size)
         
     
     def increment(self):
@@ -91,9 +109,11 @@ class Coordinate:
         """
         try:
             if self.__direction is HORIZONTAL:
-                return Coordinate(self.__col + 1, self.__row, self.__direction)
+                return Coordinate(self.__col + 1, self.__row, self.__direction,
+                                  self.__size)
             else:
-                return Coordinate(self.__col, self.__row + 1, self.__direction)
+                return Coordinate(self.__col, self.__row + 1, self.__direction,
+                                  self.__size)
         except ValueError:
             raise ValueError("Incremented coordinate from" +
                                 " {} out of bounds!".format(str(self)))
@@ -104,9 +124,11 @@ class Coordinate:
         """
         try:
             if self.__direction is HORIZONTAL:
-                return Coordinate(self.__col + 1, self.__row, self.__direction)
+                return Coordinate(self.__col + 1, self.__row, self.__direction,
+                                  self.__size)
             else:
-                return Coordinate(self.__col, self.__row + 1, self.__direction)
+                return Coordinate(self.__col, self.__row + 1, self.__direction,
+                                  self.__size)
         except ValueError:
             return None
 
@@ -144,7 +166,8 @@ class Coordinate:
         the coordinate is out of bounds. Keeps the current direction.
         """
         try:
-            return Coordinate(self.__col, self.__row - 1, self.__direction)
+            return Coordinate(self.__col, self.__row - 1, self.__direction,
+                              self.__size)
         except ValueError:
             return ValueError("Moved a Coordinate past the first row!")
 
@@ -154,7 +177,8 @@ class Coordinate:
         the coordinate is out of bounds. Keeps the current direction.
         """
         try:
-            return Coordinate(self.__col, self.__row + 1, self.__direction)
+            return Coordinate(self.__col, self.__row + 1, self.__direction,
+                              self.__size)
         except ValueError:
             return ValueError("Moved a Coordinate past the last row!")
 
@@ -164,7 +188,8 @@ class Coordinate:
         the coordinate is out of bounds. Keeps the current direction.
         """
         try:
-            return Coordinate(self.__col + 1, self.__row, self.__direction)
+            return Coordinate(self.__col + 1, self.__row, self.__direction,
+                              self.__size)
         except ValueError:
             return ValueError("Moved a Coordinate past the last column!")
 
@@ -174,7 +199,8 @@ class Coordinate:
         the coordinate is out of bounds. Keeps the current direction.
         """
         try:
-            return Coordinate(self.__col - 1, self.__row, self.__direction)
+            return Coordinate(self.__col - 1, self.__row, self.__direction,
+                              self.__size)
         except ValueError:
             return ValueError("Moved a Coordinate past the first column!")
 
@@ -184,7 +210,8 @@ class Coordinate:
         raising ValueError.
         """
         try:
-            return Coordinate(self.__col, self.__row - 1, self.__direction)
+            return Coordinate(self.__col, self.__row - 1, self.__direction,
+                              self.__size)
         except ValueError:
             return None
 
@@ -194,7 +221,8 @@ class Coordinate:
         raising ValueError.
         """
         try:
-            return Coordinate(self.__col, self.__row + 1, self.__direction)
+            return Coordinate(self.__col, self.__row + 1, self.__direction,
+                              self.__size)
         except ValueError:
             return None
 
@@ -204,7 +232,8 @@ class Coordinate:
         raising ValueError.
         """
         try:
-            return Coordinate(self.__col - 1, self.__row, self.__direction)
+            return Coordinate(self.__col - 1, self.__row, self.__direction,
+                              self.__size)
         except ValueError:
             return None
 
@@ -214,6 +243,7 @@ class Coordinate:
         raising ValueError.
         """
         try:
-            return Coordinate(self.__col + 1, self.__row, self.__direction)
+            return Coordinate(self.__col + 1, self.__row, self.__direction,
+                              self.__size)
         except ValueError:
             return None
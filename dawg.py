@@ -0,0 +1,299 @@
+"""
+This file provides the Dawg class, a Directed Acyclic Word Graph. A DAWG is
+a trie of every word in a lexicon in which identical suffix trees have been
+merged together, so it is both very small and very fast to walk letter by
+letter, which is exactly what a move generator needs: it can check whether
+a partial word can still be extended while it places tiles.
+
+Nodes are numbered, with node 0 being the root. Every node has a dictionary
+from letters to child node numbers and a flag marking whether the path from
+the root to that node spells a complete word.
+
+Words can also be added and removed after the DAWG is built, in time
+proportional to the length of the word: any node on the word's path that
+is shared with other words is copied first, the path is changed, and then
+it is merged back into identical nodes from the bottom up, so the DAWG
+stays minimal.
+"""
+
+
+ROOT = 0  # the node every word starts from
+
+
+class Dawg:
+    """
+    A class that models a minimized DAWG. Build one with from_words; the
+    words must be given in sorted order.
+    """
+
+    def __init__(self):
+        """Creates a DAWG with only a root node, i.e., no words."""
+        self.__edges = [{}]  # node number -> {letter: child node number}
+        self.__terminal = [False]  # node number -> True if a word ends there
+        # only needed for adding and removing words, so made on first use
+        self.__register = None  # node signature -> node number
+        self.__in_degree = None  # node number -> number of parents
+        self.__free = []  # numbers of deleted nodes, to be reused
+
+    @classmethod
+    def from_words(cls, sorted_words):
+        """
+        Builds a minimized DAWG from an iterable of words in sorted order,
+        using Daciuk's incremental algorithm: every time a new word is added,
+        the part of the previous word that can no longer change is merged
+        with any identical node that already exists.
+        """
+        dawg = cls()
+        edges = dawg.__edges
+        terminal = dawg.__terminal
+        register = {}  # node signature -> node number
+        unchecked = []  # (parent, letter, child) not yet minimized
+        previous = ""
+
+        def minimize(down_to):
+            """Merges the unchecked nodes below depth down_to."""
+            while len(unchecked) > down_to:
+                parent, letter, child = unchecked.pop()
+                signature = (terminal[child],
+                             tuple(sorted(edges[child].items())))
+                if signature in register:
+                    # an identical node exists; reuse it, leaving the
+                    # duplicate unreachable to be dropped by __renumber
+                    edges[parent][letter] = register[signature]
+                    edges[child] = None  # free its memory right away
+                else:
+                    register[signature] = child
+
+        for word in sorted_words:
+            if word <= previous:
+                raise ValueError("Words must be unique and in sorted order")
+
+            common = 0  # length of the prefix shared with the previous word
+            for a, b in zip(word, previous):
+                if a != b:
+                    break
+                common += 1
+
+            minimize(common)
+
+            if unchecked:
+                node = unchecked[-1][2]
+            else:
+                node = ROOT
+
+            for letter in word[common:]:  # add the new suffix
+                edges.append({})
+                terminal.append(False)
+                child = len(edges) - 1
+                edges[node][letter] = child
+                unchecked.append((node, letter, child))
+                node = child
+
+            terminal[node] = True
+            previous = word
+
+        minimize(0)
+        dawg.__renumber()
+        return dawg
+
+    def __renumber(self):
+        """
+        Removes the unreachable nodes left behind by merging and numbers the
+        rest in breadth-first order, keeping the root at 0.
+        """
+        order = [ROOT]  # reachable nodes in breadth-first order
+        new_number = {ROOT: 0}
+        for node in order:
+            for child in self.__edges[node].values():
+                if child not in new_number:
+                    new_number[child] = len(order)
+                    order.append(child)
+
+        self.__edges = [{letter: new_number[child]
+                         for letter, child in self.__edges[node].items()}
+                        for node in order]
+        self.__terminal = [self.__terminal[node] for node in order]
+
+    def __signature(self, node):
+        """Returns a hashable value that is equal for identical nodes."""
+        return (self.__terminal[node],
+                tuple(sorted(self.__edges[node].items())))
+
+    def __ensure_register(self):
+        """Makes the register and parent counts if they don't exist yet."""
+        if self.__register is not None:
+            return
+        self.__register = {}
+        self.__in_degree = [0] * len(self.__edges)
+        for node, children in enumerate(self.__edges):
+            if children is None:  # deleted node
+                continue
+            if node != ROOT:
+                self.__register[self.__signature(node)] = node
+            for child in children.values():
+                self.__in_degree[child] += 1
+
+    def __new_node(self, children, terminal):
+        """Makes a node, reusing a deleted one if possible, and returns it."""
+        for child in children.values():
+            self.__in_degree[child] += 1
+        if self.__free:
+            node = self.__free.pop()
+            self.__edges[node] = children
+            self.__terminal[node] = terminal
+            self.__in_degree[node] = 0
+        else:
+            node = len(self.__edges)
+            self.__edges.append(children)
+            self.__terminal.append(terminal)
+            self.__in_degree.append(0)
+        return node
+
+    def __delete_node(self, node):
+        """Deletes an unregistered node, and any children left orphaned."""
+        for child in self.__edges[node].values():
+            self.__in_degree[child] -= 1
+            if self.__in_degree[child] == 0:
+                signature = self.__signature(child)
+                if self.__register.get(signature) == child:
+                    del self.__register[signature]
+                self.__delete_node(child)
+        self.__edges[node] = None
+        self.__terminal[node] = False
+        self.__free.append(node)
+
+    def __set_child(self, parent, letter, child):
+        """Points the edge from parent along letter at child."""
+        old = self.__edges[parent].get(letter)
+        if old is not None:
+            self.__in_degree[old] -= 1
+        self.__edges[parent][letter] = child
+        self.__in_degree[child] += 1
+
+    def __unshare_path(self, string):
+        """
+        Follows string from the root as far as possible and returns the list
+        of nodes on the way, starting with the root. Every node on the path
+        that had other parents is replaced by a copy, and every node on the
+        path is taken out of the register, so that the path can be changed
+        without changing any other word.
+        """
+        path = [ROOT]
+        for letter in string:
+            child = self.__edges[path[-1]].get(letter)
+            if child is None:
+                break
+            if self.__in_degree[child] > 1:  # shared with another word
+                child_copy = self.__new_node(dict(self.__edges[child]),
+                                             self.__terminal[child])
+                self.__set_child(path[-1], letter, child_copy)
+                child = child_copy
+            else:
+                signature = self.__signature(child)
+                if self.__register.get(signature) == child:
+                    del self.__register[signature]
+            path.append(child)
+        return path
+
+    def __minimize_path(self, path, string):
+        """
+        Merges the nodes on path (as returned by __unshare_path, for string)
+        with identical registered nodes from the bottom up, deleting any
+        node that no longer leads to a word, and registers the rest.
+        """
+        for depth in range(len(path) - 1, 0, -1):
+            node = path[depth]
+            parent = path[depth - 1]
+            letter = string[depth - 1]
+
+            if not self.__edges[node] and not self.__terminal[node]:
+                del self.__edges[parent][letter]  # dead end
+                self.__in_degree[node] -= 1
+                self.__delete_node(node)
+                continue
+
+            signature = self.__signature(node)
+            existing = self.__register.get(signature)
+            if existing is None:
+                self.__register[signature] = node
+            elif existing != node:
+                self.__set_child(parent, letter, existing)
+                self.__delete_node(node)
+
+    def add(self, word):
+        """Adds the word to the DAWG. Does nothing if it's already there."""
+        if word in self:
+            return
+        self.__ensure_register()
+
+        path = self.__unshare_path(word)
+        for letter in word[len(path) - 1:]:  # add the missing suffix
+            child = self.__new_node({}, False)
+            self.__set_child(path[-1], letter, child)
+            path.append(child)
+        self.__terminal[path[-1]] = True
+
+        self.__minimize_path(path, word)
+
+    def remove(self, word):
+        """Removes the word from the DAWG. Does nothing if it isn't there."""
+        if word not in self:
+            return
+        self.__ensure_register()
+
+        path = self.__unshare_path(word)
+        self.__terminal[path[-1]] = False
+
+        self.__minimize_path(path, word)
+
+    def __contains__(self, word):
+        """Returns True if the word is in the DAWG and False otherwise."""
+        node = self.follow(word)
+        return node is not None and self.__terminal[node]
+
+    def follow(self, string, node=ROOT):
+        """
+        Returns the node reached by following the letters of string from
+        the given node, or None if the path leaves the DAWG.
+        """
+        edges = self.__edges
+        for letter in string:
+            node = edges[node].get(letter)
+            if node is None:
+                return None
+        return node
+
+    def get_child(self, node, letter):
+        """Returns the child of node along letter, or None."""
+        return self.__edges[node].get(letter)
+
+    def get_children(self, node):
+        """Returns the dictionary from letters to children of the node."""
+        return self.__edges[node]
+
+    def is_terminal(self, node):
+        """Returns True if a word ends at the given node."""
+        return self.__terminal[node]
+
+    def get_edges(self):
+        """
+        Returns the list of every node's child dictionary, indexed by node
+        number, with None for deleted nodes. Move generators read this
+        directly in their inner loops. Do not modify it.
+        """
+        return self.__edges
+
+    def get_terminals(self):
+        """Returns the list of word-ending flags indexed by node number."""
+        return self.__terminal
+
+    def words(self, node=ROOT, prefix=""):
+        """Yields every word reachable from node in alphabetical order."""
+        if self.__terminal[node]:
+            yield prefix
+        for letter in sorted(self.__edges[node]):
+            yield from self.words(self.__edges[node][letter], prefix + letter)
+
+    def __len__(self):
+        """Returns the number of nodes in the DAWG."""
+        return len(self.__edges) - len(self.__free)
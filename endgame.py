@@ -0,0 +1,364 @@
+"""
+This file provides the EndgameSolver class, which finds the best way to
+play out a game once the bag is empty. At that point both racks are known,
+so the rest of the game is a two-player search problem with no luck in it.
+
+The solver runs a negamax alpha-beta search, deepening one turn at a time
+until the whole game has been searched or the time budget runs out, and
+returns the result of the deepest search it finished. Moves are tried best
+first (the best move found for the position before, then highest score
+first), and every searched position is remembered in a TranspositionTable
+keyed by the board's Zobrist hash and both racks, so positions reached by
+playing the same moves in a different order are only searched once. The
+board itself is never copied: every move is tried with Board.make_move and
+taken back with Board.unmake_move.
+
+Values are always spread: how many points better off the player to move
+will be than the opponent, from now until the end of the game. A player
+who goes out gets the value of the tiles left on the other rack and the
+other player loses it, and if both players pass in a row the game ends and
+each player loses the value of their own rack. A search that stops short of
+the end of the game values the positions it stops at the same way, as if
+both players were stuck with the tiles they hold.
+"""
+
+import time
+from collections import OrderedDict
+
+from anchormovefinder import rack_string
+from bag import rack_after_move, rack_value
+
+
+PASS = None  # stands for passing in a principal variation
+
+# what a value stored in the transposition table means
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+TIME_CHECK_INTERVAL = 256  # how many nodes to search between clock checks
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget runs out."""
+    pass
+
+
+class TranspositionTable:
+    """
+    A class that remembers the result of searching a position. It holds at
+    most capacity positions; when it is full, the position stored longest
+    ago is forgotten to make room.
+    """
+
+    def __init__(self, capacity=500000):
+        """Creates an empty table that holds up to capacity positions."""
+        # key -> (depth, value, bound, best, horizon)
+        self.__entries = OrderedDict()
+        self.__capacity = capacity
+
+    def lookup(self, key):
+        """
+        Returns (depth, value, bound, best move string, horizon) for the
+        position, or None if it isn't in the table.
+        """
+        return self.__entries.get(key)
+
+    def store(self, key, depth, value, bound, best, horizon=False):
+        """
+        Remembers that searching the position to depth gave value, which is
+        EXACT, a LOWER_BOUND or an UPPER_BOUND, that best (a move string,
+        or None) was the best move, and whether the search stopped at the
+        depth limit anywhere rather than playing every line out. A deeper
+        result is never replaced by a shallower one.
+        """
+        entries = self.__entries
+        old = entries.get(key)
+        if old is not None:
+            if old[0] > depth:
+                return
+            entries.move_to_end(key)
+        entries[key] = (depth, value, bound, best, horizon)
+        if len(entries) > self.__capacity:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+class EndgameResult:
+    """The result of an EndgameSolver search."""
+
+    def __init__(self, value, principal_variation, depth, nodes, elapsed,
+                 exact):
+        self.__value = value
+        self.__principal_variation = principal_variation
+        self.__depth = depth
+        self.__nodes = nodes
+        self.__elapsed = elapsed
+        self.__exact = exact
+
+    def get_value(self):
+        """Returns the spread the player to move gets with best play."""
+        return self.__value
+
+    def get_principal_variation(self):
+        """
+        Returns the list of Moves (PASS for a pass) both players are
+        expected to play, starting with the player to move.
+        """
+        return self.__principal_variation
+
+    def get_best_move(self):
+        """Returns the move to play now, or PASS."""
+        if self.__principal_variation:
+            return self.__principal_variation[0]
+        return PASS
+
+    def get_depth(self):
+        """Returns how many turns deep the search that gave this went."""
+        return self.__depth
+
+    def get_nodes(self):
+        """Returns how many positions were searched in total."""
+        return self.__nodes
+
+    def get_elapsed(self):
+        """Returns how many seconds the search took."""
+        return self.__elapsed
+
+    def is_exact(self):
+        """Returns True if the search reached the end of every line."""
+        return self.__exact
+
+    def __str__(self):
+        return "{:+d} after {} turns ({} nodes, {:.2f}s): {}".format(
+            self.__value, self.__depth, self.__nodes, self.__elapsed,
+            ' '.join("pass" if move is PASS else str(move)
+                     for move in self.__principal_variation))
+
+    def __repr__(self):
+        return str(self)
+
+
+class EndgameSolver:
+    """
+    A class that solves endgames on a Board using any MoveFinder to find
+    the possible moves.
+    """
+
+    def __init__(self, move_finder, table_capacity=500000,
+                 move_cache_capacity=50000):
+        """
+        Takes the MoveFinder to use, how many positions the transposition
+        table holds and how many move lists to keep between searches.
+        """
+        self.__move_finder = move_finder
+        self.__table = TranspositionTable(table_capacity)
+        # (board hash, rack) -> list of (score, move, move string, rack left)
+        self.__move_cache = OrderedDict()
+        self.__move_cache_capacity = move_cache_capacity
+        self.__nodes = 0
+        self.__deadline = None
+        self.__reached_horizon = False
+
+    def get_transposition_table(self):
+        return self.__table
+
+    def solve(self, board, rack, opponent_rack, time_limit=10.0,
+              max_depth=None):
+        """
+        Searches for the best play on the board for the player holding rack
+        (tiles as in rack_string) against opponent_rack, for at most
+        time_limit seconds (None for no limit) and max_depth turns (by
+        default, enough to play the game out). Returns an EndgameResult for
+        the deepest search that finished. The board is left as it was.
+        """
+        rack = ''.join(sorted(rack_string(rack)))
+        opponent_rack = ''.join(sorted(rack_string(opponent_rack)))
+        if max_depth is None:
+            # every turn plays a tile, except for passes, and two passes
+            # in a row end the game
+            max_depth = 2 * (len(rack) + len(opponent_rack)) + 1
+
+        start = time.perf_counter()
+        if time_limit is None:
+            self.__deadline = None
+        else:
+            self.__deadline = start + time_limit
+        self.__nodes = 0
+
+        result = None
+        for depth in range(1, max_depth + 1):
+            self.__reached_horizon = False
+            try:
+                value = self.__negamax(board, rack, opponent_rack, 0, depth,
+                                       float("-inf"), float("inf"))
+            except SearchTimeout:
+                break
+            exact = not self.__reached_horizon
+            result = EndgameResult(
+                value, self.__principal_variation(board, rack, opponent_rack,
+                                                  depth),
+                depth, self.__nodes, time.perf_counter() - start, exact)
+            if exact:  # every line was searched to the end of the game
+                break
+
+        if result is None:  # not even one turn deep in time: take top score
+            moves = self.__scored_moves(board, rack)
+            if moves:
+                best = [moves[0][1]]
+                value = moves[0][0]
+            else:
+                best = [PASS]
+                value = 0
+            result = EndgameResult(value, best, 0, self.__nodes,
+                                   time.perf_counter() - start, False)
+        return result
+
+    def __scored_moves(self, board, rack):
+        """
+        Returns a list of (score, move, move string, rack left) for every
+        move with the rack, highest score first. Moves that go out come
+        first among equal scores.
+        """
+        key = (board.zobrist_hash(), rack)
+        cache = self.__move_cache
+        try:
+            moves = cache[key]
+            cache.move_to_end(key)
+            return moves
+        except KeyError:
+            pass
+
+        moves = []
+        for move in self.__move_finder.find_all_moves(rack, board):
+            rack_left = rack_after_move(rack, move)
+            moves.append((board.score_move(move, False), move, str(move),
+                          rack_left))
+        moves.sort(key=lambda entry: (-entry[0], len(entry[3])))
+
+        cache[key] = moves
+        if len(cache) > self.__move_cache_capacity:
+            cache.popitem(last=False)
+        return moves
+
+    def __negamax(self, board, rack, opponent_rack, passes, depth, alpha,
+                  beta):
+        """
+        Returns the value for the player holding rack, searching depth
+        turns ahead, where passes is how many passes in a row were just
+        made. The value is exact if it is strictly between alpha and beta.
+        """
+        self.__nodes += 1
+        if (self.__deadline is not None and
+                self.__nodes % TIME_CHECK_INTERVAL == 0 and
+                time.perf_counter() > self.__deadline):
+            raise SearchTimeout
+
+        if not opponent_rack:  # the opponent just went out
+            return -2 * rack_value(rack)
+        if passes >= 2:  # both players passed, so the game is over
+            return rack_value(opponent_rack) - rack_value(rack)
+        if depth == 0:  # estimate it as if the game ended here
+            self.__reached_horizon = True
+            return rack_value(opponent_rack) - rack_value(rack)
+
+        key = (board.zobrist_hash(), rack, opponent_rack, passes)
+        entry = self.__table.lookup(key)
+        best_string = None
+        if entry is not None:
+            entry_depth, entry_value, bound, best_string, horizon = entry
+            if entry_depth >= depth and (
+                    bound == EXACT or
+                    (bound == LOWER_BOUND and entry_value >= beta) or
+                    (bound == UPPER_BOUND and entry_value <= alpha)):
+                if horizon:  # the value is only as good as that search
+                    self.__reached_horizon = True
+                return entry_value
+
+        moves = self.__scored_moves(board, rack)
+        if best_string is not None:  # try the best move from before first
+            for index, entry in enumerate(moves):
+                if entry[2] == best_string:
+                    moves = [entry] + moves[:index] + moves[index + 1:]
+                    break
+
+        # whether this position's own search reaches the horizon, kept
+        # apart from the rest of the search to store it with the value
+        reached_horizon = self.__reached_horizon
+        self.__reached_horizon = False
+        original_alpha = alpha
+        best_value = float("-inf")
+        best = None
+        for score, move, move_string, rack_left in moves:
+            board.make_move(move, score)
+            try:
+                value = score - self.__negamax(board, opponent_rack,
+                                               rack_left, 0, depth - 1,
+                                               -beta, -alpha)
+            finally:
+                board.unmake_move()
+            if value > best_value:
+                best_value = value
+                best = move_string
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if alpha < beta:  # passing wasn't cut off
+            value = -self.__negamax(board, opponent_rack, rack, passes + 1,
+                                    depth - 1, -beta, -alpha)
+            if value > best_value:
+                best_value = value
+                best = None
+
+        if best_value <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_value >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        horizon = self.__reached_horizon
+        self.__table.store(key, depth, best_value, bound, best, horizon)
+        self.__reached_horizon = reached_horizon or horizon
+        return best_value
+
+    def __principal_variation(self, board, rack, opponent_rack, depth):
+        """
+        Returns the list of best moves found by the last search, by
+        following the best moves stored in the transposition table.
+        """
+        variation = []
+        passes = 0
+        made = 0
+        try:
+            while depth > 0 and rack and opponent_rack and passes < 2:
+                entry = self.__table.lookup(
+                    (board.zobrist_hash(), rack, opponent_rack, passes))
+                if entry is None:
+                    break
+                best_string = entry[3]
+                if best_string is None:
+                    variation.append(PASS)
+                    passes += 1
+                    rack, opponent_rack = opponent_rack, rack
+                else:
+                    for score, move, move_string, rack_left in (
+                            self.__scored_moves(board, rack)):
+                        if move_string == best_string:
+                            break
+                    else:
+                        break
+                    variation.append(move)
+                    board.make_move(move, score)
+                    made += 1
+                    passes = 0
+                    rack, opponent_rack = opponent_rack, rack_left
+                depth -= 1
+        finally:
+            for i in range(made):
+                board.unmake_move()
+        return variation
@@ -0,0 +1,255 @@
+"""
+This file evaluates exchanges and passing: for every set of tiles a player
+could keep, how good the rack they'll start their next turn with is likely
+to be, given the tiles they can't see (see bag.unseen_tiles).
+
+A rack is worth the value of the best leave (see leaves) it holds with one
+tile fewer: what it would be worth if its worst tile were played off for
+nothing. Passing keeps the rack as it is, so it's worth just that. An
+exchange keeps some tiles and draws the rest, so it's worth the mean value
+of the racks it could make, each weighted by how likely its draw is.
+
+Every distinct keep is only tried once, so a rack with duplicates has fewer
+than the 127 exchanges of seven different tiles. Draws come from the
+unseen tiles, which are the same whatever is kept, since exchanged tiles go
+back in the bag only after drawing. So every keep of the same size shares
+one list of draws. The draws of a size are all worked out exactly (from
+products of binomial coefficients of the unseen counts) when there are at
+most exact_limit of them, and sampled otherwise. The value of every rack
+is only looked up once, however many keeps and draws make it.
+
+evaluate_exchanges returns the options ranked best first. EquityStrategy
+(see game) values its moves the same way, as their score plus the option
+that keeps the same tiles, so that moves and exchanges are compared on the
+same footing.
+"""
+
+import random
+from itertools import product
+
+from bag import (Bag, NUMBER_OF_TILE_TYPES, TILE_INDEX, TILE_TYPES,
+                 counts_from_string)
+from board import RACK_SIZE
+from leaves import BINOMIAL, MAX_LEAVE_SIZE, SIZE_OFFSETS, rank_indices
+
+
+# A rack is evaluated every turn of a game, so these keep that under
+# 20ms: only draws of one tile are exact.
+EXACT_LIMIT = 30  # most draws of one size worked out exactly
+SAMPLES = 32  # draws sampled when there are more than that
+
+
+def choose(n, k):
+    """Returns n choose k, for any n and k (BINOMIAL only goes so far)."""
+    if k < 0 or k > n:
+        return 0
+    if n < len(BINOMIAL) and k < len(BINOMIAL[n]):
+        return BINOMIAL[n][k]
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
+class ExchangeOption:
+    """An exchange (or a pass) and what it's worth. See the file doc."""
+
+    def __init__(self, keep, exchanged, equity, exact):
+        self.__keep = keep
+        self.__exchanged = exchanged
+        self.__equity = equity
+        self.__exact = exact
+
+    def get_keep(self):
+        """Returns the tiles kept, like "ERS"."""
+        return self.__keep
+
+    def get_exchanged(self):
+        """Returns the tiles exchanged, or "" for passing."""
+        return self.__exchanged
+
+    def get_equity(self):
+        """Returns the expected value of the rack the option leads to."""
+        return self.__equity
+
+    def is_exact(self):
+        """Returns True unless the equity comes from sampled draws."""
+        return self.__exact
+
+    def is_pass(self):
+        return not self.__exchanged
+
+    def __repr__(self):
+        if self.is_pass():
+            return "ExchangeOption(pass, {:.2f})".format(self.__equity)
+        return "ExchangeOption(-{} keeping {}, {:.2f})".format(
+            self.__exchanged, self.__keep or '-', self.__equity)
+
+
+def distinct_keeps(counts):
+    """
+    Yields every distinct sub-multiset of the tiles with the 27-entry count
+    list as sorted tile numbers, including the empty one and all of them.
+    """
+    present = [index for index in range(NUMBER_OF_TILE_TYPES)
+               if counts[index]]
+    for kept in product(*(range(counts[index] + 1) for index in present)):
+        keep = []
+        for index, count in zip(present, kept):
+            keep.extend([index] * count)
+        yield tuple(keep)
+
+
+def exact_draws(counts, size, limit):
+    """
+    Returns a list of (probability, sorted tile numbers) of every distinct
+    draw of size tiles from tiles with the 27-entry count list, or None if
+    there are more than limit of them.
+    """
+    present = [index for index in range(NUMBER_OF_TILE_TYPES)
+               if counts[index]]
+    total = choose(sum(counts), size)
+    draws = []
+
+    def add(position, left, ways, drawn):
+        """Adds the draws of left more tiles from present[position:]."""
+        if left == 0:
+            draws.append((ways / total, tuple(drawn)))
+            return len(draws) <= limit
+        if position == len(present):
+            return True
+        index = present[position]
+        for count in range(min(left, counts[index]), -1, -1):
+            if not add(position + 1, left - count,
+                       ways * choose(counts[index], count),
+                       drawn + [index] * count):
+                return False
+        return True
+
+    if not total or not add(0, size, 1, []):
+        return None
+    return draws
+
+
+def sampled_draws(counts, size, samples, generator):
+    """
+    Returns a list of (probability, sorted tile numbers) of samples random
+    draws of size tiles from tiles with the 27-entry count list, with the
+    same draws merged.
+    """
+    bag = Bag(list(counts))
+    found = {}  # sorted tile numbers -> how many times drawn
+    for sample in range(samples):
+        drawn = [bag.draw(generator) for i in range(size)]
+        for index in drawn:
+            bag.put_back(index)
+        key = tuple(sorted(drawn))
+        found[key] = found.get(key, 0) + 1
+    return [(times / samples, drawn) for drawn, times in found.items()]
+
+
+def rack_value(indices, values):
+    """
+    Returns the value (see the file doc) of the rack with the sorted tile
+    numbers, given the LeaveTable's array of values.
+    """
+    size = len(indices)
+    if size <= MAX_LEAVE_SIZE:
+        return values[rank_indices(indices)]
+    # Without the tile at position p, the tiles before it keep their terms
+    # of rank_indices and the ones after it move down a place, so every
+    # leave's rank is the terms before p (added up going along) plus
+    # after[p + 1]. This runs for every rack an exchange could draw, so
+    # it's kept to one pass each way.
+    after = [0] * (size + 1)
+    total = 0
+    for position in range(size - 1, 0, -1):
+        total += BINOMIAL[indices[position] + position - 1][position]
+        after[position] = total
+    rank = SIZE_OFFSETS[size - 1]
+    best = values[rank + after[1]]
+    previous = indices[0]
+    for position in range(1, size):
+        rank += BINOMIAL[previous + position - 1][position]
+        index = indices[position]
+        if index != previous:  # else it's the same leave as before
+            value = values[rank + after[position + 1]]
+            if value > best:
+                best = value
+            previous = index
+    return best
+
+
+def evaluate_exchanges(rack, unseen, leave_table, can_exchange=True,
+                       exact_limit=EXACT_LIMIT, samples=SAMPLES,
+                       generator=None):
+    """
+    Returns a list of ExchangeOptions for passing and every distinct
+    exchange with the rack (a string like "AEINST?") when unseen (a string
+    or a 27-entry count list) is every tile the player can't see, best
+    first. If can_exchange is False (there are fewer than seven tiles in
+    the bag), there's only passing. Sampled draws use generator (by
+    default, one seeded with the rack and unseen tiles, so evaluating the
+    same position always gives the same answer).
+    """
+    values = leave_table.get_values()
+    if isinstance(unseen, str):
+        unseen = counts_from_string(unseen)
+    rack_indices = tuple(sorted(TILE_INDEX[letter] for letter in rack))
+    if generator is None:
+        generator = random.Random(str(rack_indices) + str(unseen))
+
+    draws = {}  # size -> (list of (probability, draw), whether exact)
+    known = {}  # sorted tile numbers of a rack -> its value
+    options = []
+    keeps = distinct_keeps(counts_from_string(rack)) if can_exchange \
+        else [rack_indices]
+    for keep in keeps:
+        size = len(rack_indices) - len(keep)
+        if size > sum(unseen):
+            continue  # can't draw that many
+        if size not in draws:
+            found = exact_draws(unseen, size, exact_limit)
+            draws[size] = (found, True) if found is not None else \
+                (sampled_draws(unseen, size, samples, generator), False)
+        outcomes, exact = draws[size]
+        equity = 0.0
+        for probability, drawn in outcomes:
+            indices = tuple(sorted(keep + drawn))
+            value = known.get(indices)
+            if value is None:
+                value = known[indices] = rack_value(indices, values)
+            equity += probability * value
+        exchanged = list(rack_indices)
+        for index in keep:
+            exchanged.remove(index)
+        options.append(ExchangeOption(
+            ''.join(TILE_TYPES[index] for index in keep),
+            ''.join(TILE_TYPES[index] for index in exchanged), equity,
+            exact))
+    options.sort(key=ExchangeOption.get_equity, reverse=True)
+    return options
+
+
+def exchange_allowed(unseen):
+    """
+    Returns True unless there are fewer than RACK_SIZE tiles in the bag
+    (unseen, a string or a 27-entry count list, less a full rack).
+    """
+    if isinstance(unseen, str):
+        return len(unseen) - RACK_SIZE >= RACK_SIZE
+    return sum(unseen) - RACK_SIZE >= RACK_SIZE
+
+
+def best_exchange(rack, unseen, leave_table, **options):
+    """
+    Returns the best ExchangeOption that exchanges at least one tile (see
+    evaluate_exchanges), or None if exchanging isn't allowed (see
+    exchange_allowed).
+    """
+    if not exchange_allowed(unseen):
+        return None
+    for option in evaluate_exchanges(rack, unseen, leave_table, **options):
+        if not option.is_pass():
+            return option
+    return None
@@ -0,0 +1,483 @@
+"""
+This file provides the Game class, which plays a whole game of Scrabble
+between two Strategies, and play_games, which plays many games at once
+across a pool of processes and reports how well each strategy did and how
+fast it all ran.
+
+A Strategy picks the move to make with a rack. There are three of them:
+GreedyStrategy always makes the top scoring move, EquityStrategy the move
+with the best score plus the expected value of the rack it leads to, or an
+exchange if the best one is worth more than any move (see exchange), and
+SimulationStrategy the move that does best in a short simulation (see
+simulation). Strategies are given to play_games by name (see STRATEGIES),
+so that every worker process can make its own. The greedy and equity
+strategies can also look their first moves up in an opening table (see
+openings) instead of finding them.
+
+Every game draws its tiles from a Bag seeded from the seed of the run and
+the game number, so a run can be repeated exactly, and the two strategies
+take turns going first. Each game keeps track of how long it spent in each
+phase of a turn (choosing a move, putting it on the board, drawing tiles),
+which play_games adds up.
+
+Run as a script, it plays a match and prints the report:
+
+    python game.py greedy equity --games 100 --processes 4
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from anchormovefinder import AnchorMoveFinder
+from bag import Bag, Rack, rack_after_move, string_from_counts
+from board import Board
+from exchange import ExchangeOption, evaluate_exchanges, exchange_allowed
+from simulation import PASS, Simulator, best_move, tiles_played
+import leaves as leaves_module
+import lexicon as lexicon_module
+import openings as openings_module
+
+
+SCORELESS_TURNS_TO_END = 6  # the game ends after this many in a row
+PHASES = ("choose", "play", "draw")
+
+
+class Strategy:
+    """An abstract class for choosing a move. See the file doc."""
+
+    name = None
+
+    def choose_move(self, board, rack, unseen):
+        """
+        Returns the Move to make on the board with rack (a string like
+        "AEINST?"), an ExchangeOption (see exchange) or PASS, when unseen
+        (a string) is every tile the player can't see.
+        """
+        raise NotImplementedError
+
+
+def look_up_opening(openings, by_equity, board, rack):
+    """
+    Returns the best opening for the rack from the OpeningTable openings,
+    or None if there's no table ranked the right way (by equity or by
+    score) or it isn't the first move with a full rack on a normal board.
+    """
+    if (openings is None or openings.is_equity_table() != by_equity or
+            len(rack) != openings_module.RACK_SIZE or not board.is_empty() or
+            board.get_layout() != openings_module.STANDARD):
+        return None
+    found = openings.lookup(rack)
+    return None if found is None else found[0]
+
+
+class GreedyStrategy(Strategy):
+    """A Strategy that always makes the top scoring move."""
+
+    name = "greedy"
+
+    def __init__(self, move_finder, openings=None):
+        self.__move_finder = move_finder
+        self.__openings = openings
+
+    def choose_move(self, board, rack, unseen):
+        opening = look_up_opening(self.__openings, False, board, rack)
+        if opening is not None:
+            return opening
+        return best_move(self.__move_finder, board, rack)[1]
+
+
+class EquityStrategy(Strategy):
+    """
+    A Strategy that makes the move with the best score plus leave, or
+    exchanges if that's worth more. While exchanging is allowed, a leave is
+    worth what the exchange keeping the same tiles is (see exchange), so
+    that moves and exchanges are valued the same way. Otherwise it's worth
+    its value in the LeaveTable.
+    """
+
+    name = "equity"
+
+    def __init__(self, move_finder, leave_table, openings=None,
+                 exchanges=True):
+        """
+        Takes the MoveFinder, the LeaveTable and an OpeningTable ranked by
+        equity with the same leave table, if any, to look first moves up in.
+        With exchanges=False, it never exchanges.
+        """
+        self.__move_finder = move_finder
+        self.__leave_table = leave_table
+        self.__openings = openings
+        self.__exchanges = exchanges
+
+    def choose_move(self, board, rack, unseen):
+        opening = look_up_opening(self.__openings, True, board, rack)
+        if opening is not None:
+            return opening
+        ranked = None  # ExchangeOptions, best first
+        if self.__exchanges and exchange_allowed(unseen):
+            ranked = evaluate_exchanges(rack, unseen, self.__leave_table)
+            # sorted tiles kept -> what they're worth
+            kept_equity = {''.join(sorted(option.get_keep())):
+                           option.get_equity() for option in ranked}
+        best = PASS
+        best_equity = None
+        for move in self.__move_finder.find_all_moves(rack, board):
+            kept = rack_after_move(rack, move)
+            if ranked is None:
+                leave = self.__leave_table.value(kept)
+            else:
+                leave = kept_equity[''.join(sorted(kept))]
+            equity = board.score_move(move, False) + leave
+            if best_equity is None or equity > best_equity:
+                best, best_equity = move, equity
+        if ranked is not None:
+            exchange = next(option for option in ranked
+                            if not option.is_pass())
+            if best_equity is None or exchange.get_equity() > best_equity:
+                return exchange
+        return best
+
+
+class SimulationStrategy(Strategy):
+    """
+    A Strategy that simulates the top scoring moves and makes the one with
+    the best mean equity. Its Simulator runs in this process, since the
+    games themselves are already spread across processes.
+    """
+
+    name = "simulation"
+
+    def __init__(self, word_list, candidates=5, iterations=32, plies=2,
+                 seed=0):
+        self.__simulator = Simulator(word_list, plies=plies, processes=0,
+                                     seed=seed)
+        self.__candidates = candidates
+        self.__iterations = iterations
+
+    def choose_move(self, board, rack, unseen):
+        candidates = self.__simulator.candidates(board, rack,
+                                                 self.__candidates)
+        if len(candidates) == 1:  # just passing
+            return PASS
+        results = self.__simulator.simulate(board, rack, unseen, candidates,
+                                            self.__iterations)
+        return results[0].get_move()
+
+
+STRATEGIES = ("greedy", "equity", "simulation")
+
+
+def make_strategy(name, word_list=lexicon_module.DEFAULT_WORD_LIST,
+                  leave_table=None, seed=0, openings=None):
+    """
+    Returns the Strategy with the given name (see STRATEGIES). The equity
+    strategy needs a LeaveTable. The greedy and equity strategies look
+    their first moves up in the OpeningTable openings, if it is ranked the
+    way they rank moves.
+    """
+    move_finder = AnchorMoveFinder(lexicon_module.get_lexicon(word_list))
+    if name == "greedy":
+        return GreedyStrategy(move_finder, openings)
+    elif name == "equity":
+        return EquityStrategy(move_finder, leave_table, openings)
+    elif name == "simulation":
+        return SimulationStrategy(word_list, seed=seed)
+    raise ValueError("Unknown strategy {}".format(name))
+
+
+class GameResult:
+    """The result of one Game."""
+
+    def __init__(self, names, scores, moves, turns, phase_times,
+                 leave_results):
+        self.__names = names
+        self.__scores = scores
+        self.__moves = moves
+        self.__turns = turns
+        self.__phase_times = phase_times
+        self.__leave_results = leave_results
+
+    def get_names(self):
+        """Returns the names of the two strategies, first player first."""
+        return self.__names
+
+    def get_scores(self):
+        """Returns the final scores, first player first."""
+        return self.__scores
+
+    def get_moves(self):
+        """Returns how many moves (not passes) were made."""
+        return self.__moves
+
+    def get_turns(self):
+        return self.__turns
+
+    def get_phase_times(self):
+        """Returns a dictionary of seconds spent in each of PHASES."""
+        return self.__phase_times
+
+    def get_leave_results(self):
+        """
+        Returns a list of (leave, points) for every move after which the
+        player had another turn: what they kept, and what they scored next.
+        These are the results leaves.build_from_results reads.
+        """
+        return self.__leave_results
+
+    def get_winner(self):
+        """Returns 0 or 1 for the player who won, or None for a tie."""
+        if self.__scores[0] == self.__scores[1]:
+            return None
+        return 0 if self.__scores[0] > self.__scores[1] else 1
+
+
+class Game:
+    """A class that plays a game between two Strategies."""
+
+    def __init__(self, strategies, seed=0):
+        """
+        Takes the two Strategies, first player first, and the seed of the
+        random number generator that draws the tiles.
+        """
+        self.__strategies = strategies
+        self.__generator = random.Random(seed)
+        self.__board = Board()
+        self.__bag = Bag()
+        self.__racks = [Rack(), Rack()]
+        for rack in self.__racks:
+            self.__bag.fill(rack, self.__generator)
+        self.__scores = [0, 0]
+        self.__player = 0
+        self.__turns = 0
+        self.__moves = 0
+        self.__scoreless_turns = 0
+        self.__phase_times = dict.fromkeys(PHASES, 0.0)
+        self.__last_leaves = [None, None]  # what each player kept last
+        self.__leave_results = []
+        self.__over = False
+
+    def get_board(self):
+        return self.__board
+
+    def get_scores(self):
+        return self.__scores
+
+    def get_rack(self, player):
+        return self.__racks[player]
+
+    def get_player_to_move(self):
+        return self.__player
+
+    def is_over(self):
+        return self.__over
+
+    def unseen(self, player):
+        """Returns the tiles the player can't see as a string."""
+        bag_counts = self.__bag.get_counts()
+        rack_counts = self.__racks[1 - player].get_counts()
+        return string_from_counts([in_bag + on_rack for in_bag, on_rack
+                                   in zip(bag_counts, rack_counts)])
+
+    def play_turn(self):
+        """Lets the player to move make their move."""
+        player = self.__player
+        rack = self.__racks[player]
+        phase_times = self.__phase_times
+
+        start = time.perf_counter()
+        move = self.__strategies[player].choose_move(
+            self.__board, str(rack), self.unseen(player))
+        chosen = time.perf_counter()
+        phase_times["choose"] += chosen - start
+
+        if move is PASS:
+            score = 0
+            leave = None
+        elif isinstance(move, ExchangeOption):
+            score = 0
+            self.__bag.exchange(rack, move.get_exchanged(), self.__generator)
+            leave = move.get_keep()
+        else:
+            score = self.__board.make_move(move)
+            rack.remove_letters(tiles_played(move))
+            self.__moves += 1
+            leave = str(rack)
+        played = time.perf_counter()
+        phase_times["play"] += played - chosen
+
+        self.__scores[player] += score
+        if self.__last_leaves[player] is not None:
+            self.__leave_results.append((self.__last_leaves[player], score))
+        self.__last_leaves[player] = leave
+        self.__bag.fill(rack, self.__generator)
+        phase_times["draw"] += time.perf_counter() - played
+
+        self.__turns += 1
+        self.__scoreless_turns = 0 if score else self.__scoreless_turns + 1
+        if rack.is_empty():  # went out: gets the other rack's value
+            value = self.__racks[1 - player].value()
+            self.__scores[player] += value
+            self.__scores[1 - player] -= value
+            self.__over = True
+        elif self.__scoreless_turns >= SCORELESS_TURNS_TO_END:
+            for other in (0, 1):
+                self.__scores[other] -= self.__racks[other].value()
+            self.__over = True
+        self.__player = 1 - player
+
+    def play(self):
+        """Plays the game to the end and returns its GameResult."""
+        while not self.__over:
+            self.play_turn()
+        return GameResult([strategy.name for strategy in self.__strategies],
+                          list(self.__scores), self.__moves, self.__turns,
+                          dict(self.__phase_times), self.__leave_results)
+
+
+# the Strategies each worker process uses, by name
+worker_strategies = None
+
+
+def initialize_worker(names, word_list, leave_file, seed,
+                      opening_file=None):
+    """Makes the strategies in a worker process."""
+    global worker_strategies
+    leave_table = None
+    if "equity" in names:
+        leave_table = leaves_module.load_leave_table(leave_file)
+    openings = None
+    if opening_file is not None:
+        openings = openings_module.OpeningTable.load(opening_file)
+    worker_strategies = {name: make_strategy(name, word_list, leave_table,
+                                             seed, openings)
+                         for name in names}
+
+
+def play_game(names, seed, number):
+    """
+    Plays game number of a run in a worker process and returns its
+    GameResult. The strategies swap who goes first every game.
+    """
+    if number % 2:
+        names = names[::-1]
+    strategies = [worker_strategies[name] for name in names]
+    return Game(strategies, seed * 1000003 + number).play()
+
+
+def play_games(first, second, games=10, seed=0, processes=None,
+               word_list=lexicon_module.DEFAULT_WORD_LIST,
+               leave_file=leaves_module.DEFAULT_FILENAME, leave_output=None,
+               opening_file=None):
+    """
+    Plays games between the strategies named first and second across a
+    pool of processes (processes=0 plays them all in this process) and
+    returns a report dictionary: wins and mean score for each strategy,
+    and games per second, moves per second and time spent in each phase.
+    If leave_output is a file, every leave result is written to it as a
+    "LEAVE POINTS" line. If opening_file is an opening table (see
+    openings), first moves are looked up in it.
+    """
+    names = (first, second)
+    arguments = (sorted(set(names)), word_list, leave_file, seed,
+                 opening_file)
+    if "equity" in names:
+        leaves_module.load_leave_table(leave_file).close()  # make it if needed
+
+    start = time.perf_counter()
+    if processes == 0:
+        initialize_worker(*arguments)
+        results = (play_game(names, seed, number) for number in range(games))
+        report = summarize(names, results, leave_output)
+    else:
+        with ProcessPoolExecutor(processes, initializer=initialize_worker,
+                                 initargs=arguments) as pool:
+            results = pool.map(play_game, [names] * games, [seed] * games,
+                               range(games))
+            report = summarize(names, results, leave_output)
+    elapsed = time.perf_counter() - start
+
+    report["seconds"] = round(elapsed, 3)
+    report["games_per_second"] = round(report["games"] / elapsed, 3)
+    report["moves_per_second"] = round(report["moves"] / elapsed, 2)
+    return report
+
+
+def summarize(names, results, leave_output=None):
+    """Returns the report of play_games (but the timing) for its results."""
+    report = {"games": 0, "moves": 0, "turns": 0, "ties": 0,
+              "strategies": {name: {"wins": 0, "points": 0, "games": 0}
+                             for name in names},
+              "phase_seconds": dict.fromkeys(PHASES, 0.0)}
+    for result in results:
+        report["games"] += 1
+        report["moves"] += result.get_moves()
+        report["turns"] += result.get_turns()
+        for phase, seconds in result.get_phase_times().items():
+            report["phase_seconds"][phase] += seconds
+        winner = result.get_winner()
+        if winner is None:
+            report["ties"] += 1
+        for player, (name, score) in enumerate(zip(result.get_names(),
+                                                   result.get_scores())):
+            statistics = report["strategies"][name]
+            statistics["games"] += 1
+            statistics["points"] += score
+            if winner == player:
+                statistics["wins"] += 1
+        if leave_output is not None:
+            for leave, points in result.get_leave_results():
+                leave_output.write("{} {}\n".format(leave or '-', points))
+
+    for statistics in report["strategies"].values():
+        if statistics["games"]:
+            statistics["mean_score"] = round(
+                statistics["points"] / statistics["games"], 2)
+    total = sum(report["phase_seconds"].values())
+    report["phase_fractions"] = {
+        phase: round(seconds / total, 3) if total else 0.0
+        for phase, seconds in report["phase_seconds"].items()}
+    report["phase_seconds"] = {phase: round(seconds, 3) for phase, seconds
+                               in report["phase_seconds"].items()}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play games between two strategies.")
+    parser.add_argument("first", choices=STRATEGIES)
+    parser.add_argument("second", choices=STRATEGIES)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (0 for none)")
+    parser.add_argument("--word-list",
+                        default=lexicon_module.DEFAULT_WORD_LIST)
+    parser.add_argument("--leaves", default=leaves_module.DEFAULT_FILENAME)
+    parser.add_argument("--leave-results",
+                        help="file to write LEAVE POINTS lines to")
+    parser.add_argument("--openings",
+                        help="opening table to look first moves up in")
+    arguments = parser.parse_args()
+
+    leave_output = None
+    if arguments.leave_results:
+        leave_output = open(arguments.leave_results, "w")
+    try:
+        report = play_games(arguments.first, arguments.second,
+                            arguments.games, arguments.seed,
+                            arguments.processes, arguments.word_list,
+                            arguments.leaves, leave_output,
+                            arguments.openings)
+    finally:
+        if leave_output is not None:
+            leave_output.close()
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
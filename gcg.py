@@ -0,0 +1,380 @@
+"""
+This file reads and replays games saved in GCG notation, the format most
+Scrabble programs save games in:
+
+    #player1 alice Alice
+    #player2 bob Bob
+    >alice: AEINRST 8D NASTIER +64 64
+    >bob: ADEGLOU F7 G.OULED +24 24
+    >alice: ?EINRST -  +0 64
+
+Positions are written the same way as for Coordinate ("8D" goes across,
+"F7" goes down), lowercase letters are blanks and a '.' is a tile already
+on the board that the word plays through. Other turns are exchanges
+("-EIR"), passes ("-"), withdrawn phonies ("--"), challenge bonuses and
+time penalties ("(challenge)", "(time)") and the tiles left on a rack at
+the end ("(EIR)").
+
+read_turns parses a file one line at a time and yields a Turn for each
+line, and replay plays those turns on a single Board as it goes, yielding
+each move with the score the Board gives it, so nothing is kept in memory
+except the current position. check_game replays a whole game and checks
+every score and running total against the log, and check_games does that
+for a whole archive of games across a pool of processes:
+
+    python gcg.py archive/ --processes 8
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from board import Board, BOARD_SIZE, RACK_SIZE
+from constants import TILE_VALUES
+from coordinate import Coordinate, HORIZONTAL
+from move import Move
+
+
+PLAYER_LINE = re.compile(r"^#player([12])\s+(\S+)\s*(.*)$")
+TURN_LINE = re.compile(r"^>([^:]+):\s*(.*)$")
+POSITION = re.compile(r"^(\d+[A-Oa-o]|[A-Oa-o]\d+)$")
+EXTENSION = ".gcg"
+
+# the kinds of Turn
+MOVE, EXCHANGE, PASS, WITHDRAWN, BONUS, END_RACK = range(6)
+
+
+class GcgError(ValueError):
+    """Raised for a line that can't be read or a move that can't be made."""
+
+    def __init__(self, line_number, message):
+        super().__init__("line {}: {}".format(line_number, message))
+        self.line_number = line_number
+
+
+class Turn:
+    """One line of a game: a move, exchange, pass, bonus or penalty."""
+
+    def __init__(self, line_number, player, kind, rack, position, word,
+                 score, total):
+        self.__line_number = line_number
+        self.__player = player
+        self.__kind = kind
+        self.__rack = rack
+        self.__position = position
+        self.__word = word
+        self.__score = score
+        self.__total = total
+
+    def get_line_number(self):
+        return self.__line_number
+
+    def get_player(self):
+        """Returns the nickname of the player who took the turn."""
+        return self.__player
+
+    def get_kind(self):
+        """Returns MOVE, EXCHANGE, PASS, WITHDRAWN, BONUS or END_RACK."""
+        return self.__kind
+
+    def get_rack(self):
+        """Returns the rack before the turn (or the rack left, END_RACK)."""
+        return self.__rack
+
+    def get_position(self):
+        """Returns the position of a MOVE, like "8D", or None."""
+        return self.__position
+
+    def get_word(self):
+        """
+        Returns the word of a MOVE as written in the log, the tiles
+        exchanged, or None.
+        """
+        return self.__word
+
+    def get_score(self):
+        """Returns the points the log says the turn was worth."""
+        return self.__score
+
+    def get_total(self):
+        """Returns the player's total after the turn, from the log."""
+        return self.__total
+
+    def __str__(self):
+        return ">{}: {} {} {} {:+d} {}".format(
+            self.__player, self.__rack, self.__position or "",
+            self.__word or "", self.__score, self.__total)
+
+    def __repr__(self):
+        return str(self)
+
+
+def parse_turn(line_number, line):
+    """Returns the Turn for a '>' line of a GCG file."""
+    match = TURN_LINE.match(line)
+    if not match:
+        raise GcgError(line_number, "not a turn: {!r}".format(line))
+    player = match.group(1).strip()
+    fields = match.group(2).split()
+    try:
+        score = int(fields[-2])
+        total = int(fields[-1])
+    except (IndexError, ValueError):
+        raise GcgError(line_number, "no score and total: {!r}".format(line))
+    fields = fields[:-2]
+
+    if len(fields) == 1 and fields[0].startswith('('):
+        return Turn(line_number, player, END_RACK, fields[0].strip("()"),
+                    None, None, score, total)
+    if len(fields) == 2 and fields[1].startswith('('):
+        if fields[1] in ("(challenge)", "(time)"):
+            return Turn(line_number, player, BONUS, fields[0], None,
+                        fields[1], score, total)
+        return Turn(line_number, player, END_RACK, fields[1].strip("()"),
+                    None, None, score, total)
+    if len(fields) == 2 and fields[1] == "--":
+        return Turn(line_number, player, WITHDRAWN, fields[0], None, None,
+                    score, total)
+    if len(fields) == 2 and fields[1] == "-":
+        return Turn(line_number, player, PASS, fields[0], None, None,
+                    score, total)
+    if len(fields) == 2 and fields[1].startswith('-'):
+        return Turn(line_number, player, EXCHANGE, fields[0], None,
+                    fields[1][1:], score, total)
+    if len(fields) == 3 and POSITION.match(fields[1]):
+        return Turn(line_number, player, MOVE, fields[0], fields[1].upper(),
+                    fields[2], score, total)
+    raise GcgError(line_number, "unknown turn: {!r}".format(line))
+
+
+def read_turns(lines, players=None):
+    """
+    Yields a Turn for every turn in the lines of a GCG file. If players is
+    a dictionary, the nickname of each #player line is added to it with
+    the player's full name.
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.rstrip("\n")
+        if line.startswith('>'):
+            yield parse_turn(line_number, line)
+        elif players is not None:
+            match = PLAYER_LINE.match(line)
+            if match:
+                players[match.group(2)] = match.group(3).strip()
+
+
+def move_from_turn(board, turn):
+    """
+    Returns the Move for a MOVE turn, filling in every '.' with the tile on
+    the board there. Raises GcgError if the move runs off the board or a
+    '.' is over an empty square.
+    """
+    try:
+        coordinate = Coordinate.initialize_from_string(turn.get_position())
+    except ValueError:
+        raise GcgError(turn.get_line_number(), "bad position {}".format(
+            turn.get_position()))
+    word = turn.get_word()
+    if '.' not in word:
+        return Move(word, coordinate)
+
+    row, col = coordinate.get_row(), coordinate.get_col()
+    if coordinate.is_horizontal():
+        row_step, col_step = 0, 1
+    else:
+        row_step, col_step = 1, 0
+    string = ""
+    on_board = False
+    for letter in word:
+        if not (row < BOARD_SIZE and col < BOARD_SIZE):
+            raise GcgError(turn.get_line_number(), "runs off the board")
+        if letter == '.':
+            tile = board.get_tile(Coordinate(col, row, HORIZONTAL))
+            if tile is None:
+                raise GcgError(turn.get_line_number(),
+                               "'.' over an empty square")
+            if not on_board:
+                string += '('
+                on_board = True
+            string += str(tile)
+        else:
+            if on_board:
+                string += ')'
+                on_board = False
+            string += letter
+        row += row_step
+        col += col_step
+    if on_board:
+        string += ')'
+    return Move(string, coordinate)
+
+
+def replay(lines, players=None):
+    """
+    Replays the game in the lines of a GCG file on a new Board (filling in
+    players as read_turns does), yielding (board, turn, move, score) after
+    every turn, where move is the Move made (None for any other kind of
+    turn) and score is what the Board scored it as. The board is the same
+    object every time and is changed by the next turn, so copy it if it is
+    needed later. A withdrawn phony is taken back off the board. Raises
+    GcgError if a move can't be made.
+    """
+    board = Board()
+    for turn in read_turns(lines, players):
+        move = None
+        score = None
+        kind = turn.get_kind()
+        if kind == MOVE:
+            move = move_from_turn(board, turn)
+            try:
+                score = board.make_move(move)
+            except ValueError as error:
+                raise GcgError(turn.get_line_number(), str(error))
+        elif kind == WITHDRAWN:
+            if not board.get_undo_depth():
+                raise GcgError(turn.get_line_number(),
+                               "no move to withdraw")
+            board.unmake_move()
+        elif kind == END_RACK:
+            score = sum(TILE_VALUES[letter] for letter in
+                        turn.get_rack().upper())
+            if turn.get_score() > 0:  # the other player went out
+                score *= 2
+            else:
+                score = -score
+        yield board, turn, move, score
+
+
+def check_game(filename):
+    """
+    Replays the game in the file and returns a dictionary (ready for JSON)
+    of what was in it and every line where the log's score or running total
+    doesn't match.
+    """
+    start = time.perf_counter()
+    players = {}
+    summary = {"file": filename, "turns": 0, "moves": 0, "bingos": 0,
+               "points": 0, "mismatches": []}
+    totals = {}
+    try:
+        with open(filename) as file:
+            for board, turn, move, score in replay(file, players):
+                summary["turns"] += 1
+                player = turn.get_player()
+                logged = turn.get_score()
+                totals[player] = totals.get(player, 0) + logged
+                if move is not None:
+                    summary["moves"] += 1
+                    summary["points"] += score
+                    played = sum(1 for tile in move.get_just_played_tiles()
+                                 if tile is not None)
+                    if played == RACK_SIZE:
+                        summary["bingos"] += 1
+                if score is not None and score != logged:
+                    summary["mismatches"].append(
+                        {"line": turn.get_line_number(), "turn": str(turn),
+                         "logged": logged, "scored": score})
+                if totals[player] != turn.get_total():
+                    summary["mismatches"].append(
+                        {"line": turn.get_line_number(), "turn": str(turn),
+                         "logged_total": turn.get_total(),
+                         "total": totals[player]})
+                    totals[player] = turn.get_total()  # only report it once
+    except (OSError, ValueError) as error:
+        summary["error"] = str(error)
+    summary["players"] = players
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+    return summary
+
+
+def gcg_files(paths):
+    """Yields every .gcg file in the given files and directories, sorted."""
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, filenames in os.walk(path):
+                subdirectories.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(EXTENSION):
+                        yield os.path.join(directory, filename)
+        else:
+            yield path
+
+
+def check_games(paths, processes=None, chunk_size=16):
+    """
+    Yields check_game for every file in gcg_files(paths), in order, with
+    the games spread across a pool of processes (processes=0 checks them
+    all in this process).
+    """
+    filenames = gcg_files(paths)
+    if processes == 0:
+        for filename in filenames:
+            yield check_game(filename)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        yield from pool.map(check_game, filenames, chunksize=chunk_size)
+
+
+def aggregate(summaries):
+    """
+    Returns the totals of an iterable of check_game dictionaries, taking
+    one at a time so a generator of them is never held in memory.
+    """
+    statistics = {"games": 0, "errors": 0, "turns": 0, "moves": 0,
+                  "bingos": 0, "points": 0, "mismatches": 0,
+                  "games_with_mismatches": 0}
+    for summary in summaries:
+        statistics["games"] += 1
+        if "error" in summary:
+            statistics["errors"] += 1
+        for key in ("turns", "moves", "bingos", "points"):
+            statistics[key] += summary[key]
+        statistics["mismatches"] += len(summary["mismatches"])
+        if summary["mismatches"]:
+            statistics["games_with_mismatches"] += 1
+    if statistics["moves"]:
+        statistics["points_per_move"] = round(
+            statistics["points"] / statistics["moves"], 2)
+    return statistics
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay GCG games and check their scores.")
+    parser.add_argument("paths", nargs="+",
+                        help="GCG files or directories of them")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (0 for none)")
+    parser.add_argument("--json", action="store_true",
+                        help="print every game's summary as a JSON line")
+    arguments = parser.parse_args()
+
+    def reported(summaries):
+        """Prints every summary (or its problems) as it goes past."""
+        for summary in summaries:
+            if arguments.json:
+                print(json.dumps(summary))
+            else:
+                if "error" in summary:
+                    print("{}: {}".format(summary["file"], summary["error"]))
+                for mismatch in summary["mismatches"]:
+                    print("{}: {}".format(summary["file"], mismatch))
+            yield summary
+
+    start = time.perf_counter()
+    statistics = aggregate(reported(check_games(arguments.paths,
+                                                arguments.processes)))
+    elapsed = time.perf_counter() - start
+    statistics["seconds"] = round(elapsed, 2)
+    if elapsed:
+        statistics["games_per_second"] = round(statistics["games"] / elapsed,
+                                               1)
+    print(json.dumps(statistics), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
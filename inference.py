@@ -0,0 +1,265 @@
+"""
+This file provides the RackInferrer class, which works out what the
+opponent probably kept on their rack from the move they just played.
+
+Before the move, the opponent's rack was the tiles they played plus some
+leave drawn from the tiles we can't see. Every possible leave is enumerated
+as a multiset (a count of each tile type, never a list of tiles, so there
+are at most a few hundred thousand of them rather than the billions of
+ordered draws) and given its prior weight, the hypergeometric probability
+of having drawn exactly that rack: the product over tile types of
+C(available, held). Those weights are built up tile type by tile type
+during the enumeration, so no rack is ever scored twice.
+
+The most probable leaves (up to max_racks of them, and only until they make
+up mass of the prior) are then weighted by how likely the opponent was to
+make that move holding them: all their moves with the full rack are ranked
+by equity (score plus leave value, see leaves), and a move that gave up
+e points of equity compared to the best one has likelihood exp(-e /
+temperature). This is by far the slow part, since it runs the move
+generator once per rack, so it is spread across a pool of processes.
+
+The result is a RackDistribution, which can draw an opponent's leave at
+random in proportion to its probability; Simulator.simulate takes one to
+give the opponent realistic racks instead of uniformly random ones.
+"""
+
+import bisect
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+from anchormovefinder import AnchorMoveFinder, rack_string
+from bag import (NUMBER_OF_TILE_TYPES, TILE_INDEX, TILE_TYPES,
+                 counts_from_string)
+from simulation import tiles_played
+import board as board_module
+import leaves as leaves_module
+import lexicon as lexicon_module
+
+
+def binomial(n, k):
+    """Returns n choose k (0 if k > n)."""
+    return math.comb(n, k) if 0 <= k <= n else 0
+
+
+def enumerate_leaves(pool_counts, played_counts, size):
+    """
+    Yields (leave string, prior weight) for every multiset of size tiles
+    that can be taken from pool_counts (a 27-entry count list), where the
+    weight is proportional to the chance of having drawn the leave plus the
+    tiles in played_counts from the pool plus the played tiles.
+    """
+    types = [index for index in range(NUMBER_OF_TILE_TYPES)
+             if pool_counts[index] or played_counts[index]]
+    # most tiles of the types after position i that could still be taken
+    remaining = [0] * (len(types) + 1)
+    for position in range(len(types) - 1, -1, -1):
+        remaining[position] = remaining[position + 1] + pool_counts[
+            types[position]]
+    held = []
+
+    def extend(position, left, weight):
+        if left == 0:
+            # the played tiles of the remaining types are still held
+            for index in types[position:]:
+                weight *= binomial(pool_counts[index] + played_counts[index],
+                                   played_counts[index])
+            yield ''.join(held), weight
+            return
+        if position == len(types) or remaining[position] < left:
+            return
+        index = types[position]
+        available = pool_counts[index] + played_counts[index]
+        for count in range(min(left, pool_counts[index]), -1, -1):
+            held.append(TILE_TYPES[index] * count)
+            yield from extend(position + 1, left - count,
+                              weight * binomial(available,
+                                                count + played_counts[index]))
+            held.pop()
+
+    yield from extend(0, size, 1)
+
+
+def play_likelihood(move_finder, leave_table, board, move, played, leave,
+                    temperature):
+    """
+    Returns how likely a player holding played + leave was to make move on
+    board, exp(-(best equity - equity of move) / temperature).
+    """
+    rack = played + leave
+    best = None
+    for other in move_finder.find_all_moves(rack, board):
+        equity = leaves_module.static_equity(board, other, rack, leave_table)
+        if best is None or equity > best:
+            best = equity
+    equity = board.score_move(move) + leave_table.value(leave)
+    if best is None or equity >= best:
+        return 1.0
+    return math.exp((equity - best) / temperature)
+
+
+class RackDistribution:
+    """The probability of every leave the opponent might have kept."""
+
+    def __init__(self, leaves, probabilities):
+        """Takes a list of leave strings and their matching probabilities."""
+        self.__leaves = leaves
+        self.__probabilities = probabilities
+        self.__cumulative = []
+        total = 0.0
+        for probability in probabilities:
+            total += probability
+            self.__cumulative.append(total)
+
+    def get_leaves(self):
+        return self.__leaves
+
+    def get_probabilities(self):
+        return self.__probabilities
+
+    def most_likely(self, count=10):
+        """Returns the count most probable (leave, probability) pairs."""
+        pairs = sorted(zip(self.__leaves, self.__probabilities),
+                       key=lambda pair: pair[1], reverse=True)
+        return pairs[:count]
+
+    def draw_leave(self, generator):
+        """Returns a random leave, chosen in proportion to probability."""
+        target = generator.random() * self.__cumulative[-1]
+        position = bisect.bisect_right(self.__cumulative, target)
+        return self.__leaves[min(position, len(self.__leaves) - 1)]
+
+    def draw_into(self, bag, rack, generator):
+        """
+        Moves a random leave (see draw_leave) from the Bag to the Rack.
+        Tiles of the leave that are no longer in the bag are skipped.
+        """
+        counts = bag.get_counts()
+        for letter in self.draw_leave(generator):
+            index = TILE_INDEX[letter]
+            if counts[index]:
+                bag.remove(index)
+                rack.add(index)
+
+    def __len__(self):
+        return len(self.__leaves)
+
+    def __str__(self):
+        return ', '.join("{} {:.3f}".format(leave or '-', probability)
+                         for leave, probability in self.most_likely(5))
+
+    def __repr__(self):
+        return str(self)
+
+
+# the MoveFinder and LeaveTable each worker process uses
+worker_move_finder = None
+worker_leave_table = None
+
+
+def initialize_worker(word_list, leave_file):
+    """Loads the lexicon and maps the leave table in a worker process."""
+    global worker_move_finder, worker_leave_table
+    worker_move_finder = AnchorMoveFinder(
+        lexicon_module.get_lexicon(word_list))
+    worker_leave_table = leaves_module.LeaveTable.load(leave_file)
+
+
+def run_likelihoods(board, move, played, leaves, temperature):
+    """Returns play_likelihood for each leave in a worker process."""
+    return [play_likelihood(worker_move_finder, worker_leave_table, board,
+                            move, played, leave, temperature)
+            for leave in leaves]
+
+
+class RackInferrer:
+    """
+    A class that infers the opponent's leave from their move. Use it as a
+    context manager, or call close, to shut its processes down.
+    """
+
+    def __init__(self, word_list=lexicon_module.DEFAULT_WORD_LIST,
+                 leave_file=leaves_module.DEFAULT_FILENAME, processes=None,
+                 temperature=8.0, max_racks=500, mass=0.95, chunk_size=25):
+        """
+        word_list and leave_file are what every process loads its Lexicon
+        and LeaveTable from, processes is the number of worker processes
+        (None for one per CPU, 0 to do everything in this process),
+        temperature is how many points of equity make a move e times less
+        likely, max_racks and mass limit which leaves are weighed by
+        likelihood (see the file doc), and chunk_size is how many leaves
+        each task sent to a worker has.
+        """
+        self.__word_list = word_list
+        self.__temperature = temperature
+        self.__max_racks = max_racks
+        self.__mass = mass
+        self.__chunk_size = chunk_size
+        self.__move_finder = AnchorMoveFinder(
+            lexicon_module.get_lexicon(word_list))
+        self.__leave_table = leaves_module.load_leave_table(leave_file)
+        if processes == 0:
+            self.__pool = None
+        else:
+            self.__pool = ProcessPoolExecutor(
+                processes, initializer=initialize_worker,
+                initargs=(word_list, leave_file))
+
+    def close(self):
+        """Shuts the worker processes down and unmaps the leave table."""
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+        self.__leave_table.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def infer(self, board, move, unseen):
+        """
+        Returns the RackDistribution of what the opponent kept after
+        playing move on board, which must be the board as it was before
+        the move. unseen is every tile we can't see after the move (a Bag,
+        Rack or string): the opponent's leave and the tiles in the bag.
+        """
+        played = tiles_played(move)
+        pool_counts = counts_from_string(rack_string(str(unseen)))
+        size = min(board_module.RACK_SIZE - len(played), sum(pool_counts))
+
+        candidates = sorted(
+            enumerate_leaves(pool_counts, counts_from_string(played), size),
+            key=lambda pair: pair[1], reverse=True)
+        total = sum(weight for leave, weight in candidates)
+        chosen = []
+        mass = 0.0
+        for leave, weight in candidates:
+            if len(chosen) >= self.__max_racks or mass >= self.__mass:
+                break
+            chosen.append((leave, weight))
+            mass += weight / total
+
+        leaves = [leave for leave, weight in chosen]
+        if self.__pool is None:
+            likelihoods = [play_likelihood(
+                self.__move_finder, self.__leave_table, board, move, played,
+                leave, self.__temperature) for leave in leaves]
+        else:
+            futures = [self.__pool.submit(
+                run_likelihoods, board, move, played,
+                leaves[start:start + self.__chunk_size], self.__temperature)
+                for start in range(0, len(leaves), self.__chunk_size)]
+            likelihoods = []
+            for future in futures:
+                likelihoods.extend(future.result())
+
+        weights = [weight * likelihood for (leave, weight), likelihood
+                   in zip(chosen, likelihoods)]
+        total = sum(weights)
+        if not total:  # no leave explains the move; fall back on the prior
+            weights = [weight for leave, weight in chosen]
+            total = sum(weights)
+        return RackDistribution(leaves, [weight / total
+                                         for weight in weights])
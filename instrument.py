@@ -0,0 +1,136 @@
+"""
+This file provides opt-in counters and timers for the hot paths of the
+package: lexicon lookups, anagram recursions, Coordinates made, moves
+scored, and the anchors, nodes and moves of move generation. It is off by
+default, and while it is off every instrumented spot costs one check of
+the module-level flag enabled:
+
+    if instrument.enabled:
+        instrument.count("board.score_move")
+
+Turn it on with enable(), read everything recorded with snapshot() (a
+dictionary ready for JSON or a metrics system) and start over with reset().
+To see what one request costs, wrap it in profile(), which turns
+instrumentation on just for the block and fills in the counts and times
+recorded inside it:
+
+    with instrument.profile() as recorded:
+        move_finder.find_all_moves(rack, board)
+    print(recorded["counters"]["anchormovefinder.nodes"])
+
+Counters are plain dictionary updates and are not locked, so profiles of
+requests running in several threads at once will see each other's counts.
+"""
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+enabled = False
+
+counters = {}  # name -> count
+timers = {}  # name -> [calls, total seconds]
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Forgets every count and time recorded so far."""
+    counters.clear()
+    timers.clear()
+
+
+def count(name, amount=1):
+    """Adds amount to the named counter. Only call it if enabled is True."""
+    counters[name] = counters.get(name, 0) + amount
+
+
+def add_time(name, seconds):
+    """Records one call of the named timer taking seconds."""
+    entry = timers.get(name)
+    if entry is None:
+        timers[name] = [1, seconds]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def timed(name):
+    """
+    A decorator that records every call of the function with the named
+    timer while instrumentation is enabled. While it's disabled, a call
+    costs one more function call and the check of enabled.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """
+    Returns a copy of everything recorded: {"counters": {name: count},
+    "timers": {name: {"calls": calls, "seconds": total seconds}}}.
+    """
+    return {
+        "counters": dict(counters),
+        "timers": {name: {"calls": calls, "seconds": seconds}
+                   for name, (calls, seconds) in timers.items()},
+    }
+
+
+def difference(after, before):
+    """Returns what was recorded between two snapshots."""
+    result = {"counters": {}, "timers": {}}
+    for name, value in after["counters"].items():
+        change = value - before["counters"].get(name, 0)
+        if change:
+            result["counters"][name] = change
+    for name, entry in after["timers"].items():
+        old = before["timers"].get(name, {"calls": 0, "seconds": 0.0})
+        calls = entry["calls"] - old["calls"]
+        if calls:
+            result["timers"][name] = {"calls": calls,
+                                      "seconds": entry["seconds"] -
+                                      old["seconds"]}
+    return result
+
+
+@contextmanager
+def profile():
+    """
+    Enables instrumentation for the block and yields a dictionary that is
+    filled in, when the block ends, with what was recorded inside it (in
+    the form of snapshot) and the "seconds" the block took. Instrumentation
+    is left on or off as it was before.
+    """
+    global enabled
+    was_enabled = enabled
+    recorded = {}
+    before = snapshot()
+    enabled = True
+    start = time.perf_counter()
+    try:
+        yield recorded
+    finally:
+        seconds = time.perf_counter() - start
+        enabled = was_enabled
+        recorded.update(difference(snapshot(), before))
+        recorded["seconds"] = seconds
@@ -0,0 +1,157 @@
+"""
+This file provides the BoardLayout class, which describes a board: how big
+it is and where its bonus squares are. A Board is made with a layout (the
+standard 15x15 one by default), and everything that scores or finds moves
+reads the size, the center and the multipliers from it.
+
+A layout works its multipliers out once, into flat lists indexed by
+row * size + col, so scoring a square is one list lookup instead of a
+lookup of the bonus and a comparison against each kind of bonus square.
+
+Layouts can be written as text, one row per line and one character per
+square, using the same symbols as Quackle's board dumps (see quackle) plus
+two for the quadruple squares of bigger boards:
+
+    .  normal square
+    '  double letter    "  triple letter    ^  quadruple letter
+    -  double word      =  triple word      ~  quadruple word
+
+parse_layout and read_layout read layouts written this way, and
+get_layout finds a layout by name (see LAYOUTS) or filename. Only the
+standard board is built in; bigger boards, like the 21x21 ones with
+quadruple squares, are read from files, and mirrored helps write one from
+its top left quadrant.
+"""
+
+from constants import NON, DLS, DWS, TLS, TWS, QLS, QWS
+from constants import BOARD_LAYOUT
+
+
+LETTER_MULTIPLIERS = {NON: 1, DLS: 2, DWS: 1, TLS: 3, TWS: 1, QLS: 4, QWS: 1}
+WORD_MULTIPLIERS = {NON: 1, DLS: 1, DWS: 2, TLS: 1, TWS: 3, QLS: 1, QWS: 4}
+
+SYMBOLS = {'.': NON, "'": DLS, '-': DWS, '"': TLS, '=': TWS, '^': QLS,
+           '~': QWS}
+BONUS_SYMBOLS = {bonus: symbol for symbol, bonus in SYMBOLS.items()}
+
+MAX_SIZE = 26  # columns are named with one letter
+
+
+class BoardLayout:
+    """The size and bonus squares of a board. See the file doc."""
+
+    def __init__(self, name, bonuses):
+        """
+        Takes the name of the layout and a square list of rows of bonus
+        square IDs (see constants). Raises ValueError if it isn't square,
+        has an even size (so no center square) or is too big.
+        """
+        size = len(bonuses)
+        if not size % 2 or size > MAX_SIZE:
+            raise ValueError("A layout needs an odd size up to {}".format(
+                MAX_SIZE))
+        if any(len(row) != size for row in bonuses):
+            raise ValueError("Layout {} isn't square".format(name))
+        self.__name = name
+        self.__size = size
+        self.__bonuses = tuple(tuple(row) for row in bonuses)
+        self.__letter_multipliers = [LETTER_MULTIPLIERS[bonus]
+                                     for row in bonuses for bonus in row]
+        self.__word_multipliers = [WORD_MULTIPLIERS[bonus]
+                                   for row in bonuses for bonus in row]
+
+    def get_name(self):
+        return self.__name
+
+    def get_size(self):
+        """Returns the number of rows (and columns)."""
+        return self.__size
+
+    def get_center(self):
+        """Returns the row and column of the center square."""
+        return self.__size // 2
+
+    def get_bonuses(self):
+        """Returns the rows of bonus square IDs, as tuples."""
+        return self.__bonuses
+
+    def get_bonus(self, row, col):
+        return self.__bonuses[row][col]
+
+    def get_letter_multipliers(self):
+        """
+        Returns the letter multiplier of every square, row by row, in one
+        list indexed by row * size + col. Do not modify it.
+        """
+        return self.__letter_multipliers
+
+    def get_word_multipliers(self):
+        """Returns the word multipliers, like get_letter_multipliers."""
+        return self.__word_multipliers
+
+    def to_text(self):
+        """Returns the layout written as text (see the file doc)."""
+        return ''.join(''.join(BONUS_SYMBOLS[bonus] for bonus in row) + '\n'
+                       for row in self.__bonuses)
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+        return self.__bonuses == other.__bonuses
+
+    def __hash__(self):
+        return hash(self.__bonuses)
+
+    def __repr__(self):
+        return "BoardLayout({!r}, {}x{})".format(self.__name, self.__size,
+                                                 self.__size)
+
+
+def parse_layout(text, name="custom"):
+    """
+    Returns the BoardLayout written in the text (see the file doc),
+    ignoring blank lines and spaces. Raises ValueError for a symbol that
+    isn't a square or a layout that isn't square.
+    """
+    bonuses = []
+    for line in text.splitlines():
+        line = line.replace(' ', '')
+        if not line:
+            continue
+        try:
+            bonuses.append([SYMBOLS[symbol] for symbol in line])
+        except KeyError as error:
+            raise ValueError("{} is not a square".format(error))
+    return BoardLayout(name, bonuses)
+
+
+def read_layout(filename):
+    """Returns the BoardLayout in a file, named after the file."""
+    with open(filename) as file:
+        return parse_layout(file.read(), filename)
+
+
+def mirrored(quadrant):
+    """
+    Returns the rows of a board made by mirroring the top left quadrant
+    (the rows and columns up to and including the center) both ways.
+    """
+    center = len(quadrant) - 1
+    size = 2 * center + 1
+    return [[quadrant[min(row, size - 1 - row)][min(col, size - 1 - col)]
+             for col in range(size)] for row in range(size)]
+
+
+STANDARD = BoardLayout("standard", BOARD_LAYOUT)
+
+LAYOUTS = {layout.get_name(): layout for layout in (STANDARD,)}
+
+
+def get_layout(name):
+    """
+    Returns the layout in LAYOUTS with the given name, or else the one in
+    the file with that name.
+    """
+    if name in LAYOUTS:
+        return LAYOUTS[name]
+    return read_layout(name)
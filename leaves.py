@@ -0,0 +1,305 @@
+"""
+This file provides the LeaveTable class, which gives the value of the tiles
+left on a rack after a move (the leave). Ranking moves by score plus leave
+value (equity) instead of score alone is what keeps a player from burning
+their S and blanks for a few points.
+
+The table has a value for every multiset of up to MAX_LEAVE_SIZE tiles
+(blanks included), stored in one flat array of 32-bit floats. Each multiset
+of k tiles, written as tile numbers a1 <= a2 <= ... <= ak (see bag), has a
+fixed position in the array: turning it into the strictly increasing
+b1 < b2 < ... < bk with bi = ai + i - 1 makes it a k-combination, whose
+rank in the combinatorial number system is C(b1, 1) + C(b2, 2) + ... +
+C(bk, k). Adding the number of multisets smaller than k gives the position.
+So a lookup is a handful of additions from a precomputed table of binomial
+coefficients and one array access, with no hashing or searching at all.
+Multisets that can't happen (three blanks, say) just have unused slots.
+
+Tables are saved as a short header followed by the raw array, and load
+maps the file into memory with mmap instead of reading it, so every process
+using the same table file shares one copy and loading takes no time.
+
+A table can be made from self-play results with build_from_results (or
+"python leaves.py build RESULTS TABLE"): every line of the results file is
+a leave and the equity it was worth, e.g., the points the player scored on
+their next turn. Until there are results, make_heuristic_table makes a
+rough table from a value for each tile and penalties for duplicates and
+unbalanced vowels.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+from array import array
+from itertools import combinations_with_replacement
+
+from bag import (NUMBER_OF_TILE_TYPES, TILE_INDEX, TILE_TYPES, FULL_BAG_COUNTS,
+                 rack_after_move)
+
+
+MAX_LEAVE_SIZE = 6  # a move has to play at least one of the seven tiles
+
+MAGIC = b"LEAVES01"
+HEADER = struct.Struct("<8sII")  # magic, largest leave size, entries
+
+DEFAULT_FILENAME = "leaves.bin"
+
+# BINOMIAL[n][k] is n choose k
+BINOMIAL = [[0] * (MAX_LEAVE_SIZE + 2)
+            for n in range(NUMBER_OF_TILE_TYPES + MAX_LEAVE_SIZE + 1)]
+for n in range(len(BINOMIAL)):
+    BINOMIAL[n][0] = 1
+    for k in range(1, MAX_LEAVE_SIZE + 2):
+        if n > 0:
+            BINOMIAL[n][k] = BINOMIAL[n - 1][k - 1] + BINOMIAL[n - 1][k]
+
+# SIZE_OFFSETS[k] is the number of multisets with fewer than k tiles
+SIZE_OFFSETS = [0]
+for k in range(MAX_LEAVE_SIZE + 1):
+    SIZE_OFFSETS.append(SIZE_OFFSETS[-1] +
+                        BINOMIAL[NUMBER_OF_TILE_TYPES + k - 1][k])
+
+TABLE_SIZE = SIZE_OFFSETS[MAX_LEAVE_SIZE + 1]
+
+# rough value of keeping each tile, used by make_heuristic_table
+TILE_LEAVE_VALUES = {
+    '?': 25.0, 'S': 8.0, 'Z': 4.0, 'X': 3.5, 'R': 1.5, 'H': 1.0, 'E': 1.0,
+    'C': 0.5, 'N': 0.5, 'D': 0.5, 'M': 0.5, 'T': 0.0, 'J': 0.0, 'L': -0.5,
+    'K': -0.5, 'A': -0.5, 'Y': -1.0, 'P': -1.0, 'I': -2.0, 'F': -2.0,
+    'B': -2.5, 'G': -2.5, 'O': -2.5, 'W': -3.5, 'U': -4.5, 'V': -6.0,
+    'Q': -7.0,
+}
+DUPLICATE_PENALTY = 4.0  # for every copy of a tile beyond the first
+VOWELS = "AEIOU"
+
+
+def rank_indices(indices):
+    """
+    Returns the position in the table of the leave made of the given tile
+    numbers, which must be in non-decreasing order.
+    """
+    rank = SIZE_OFFSETS[len(indices)]
+    for position, index in enumerate(indices):
+        rank += BINOMIAL[index + position][position + 1]
+    return rank
+
+
+def rank_counts(counts):
+    """Returns the position in the table of a 27-entry count list."""
+    indices = []
+    for index, count in enumerate(counts):
+        if count:
+            indices.extend([index] * count)
+    return rank_indices(indices)
+
+
+def rank_letters(letters):
+    """Returns the position in the table of a leave like "EST?"."""
+    return rank_indices(sorted(TILE_INDEX[letter] for letter in letters))
+
+
+def all_leaves():
+    """
+    Yields every possible leave (fitting in a normal bag) as a tuple of
+    tile numbers in non-decreasing order, smallest leaves first.
+    """
+    for size in range(MAX_LEAVE_SIZE + 1):
+        for indices in combinations_with_replacement(
+                range(NUMBER_OF_TILE_TYPES), size):
+            possible = True
+            for index in set(indices):
+                if indices.count(index) > FULL_BAG_COUNTS[index]:
+                    possible = False
+                    break
+            if possible:
+                yield indices
+
+
+class LeaveTable:
+    """A class that looks up leave values. See the file doc."""
+
+    def __init__(self, values, mapped=None):
+        """
+        Takes the flat sequence of TABLE_SIZE float values, and the mmap
+        it lives in, if any, so it can be closed.
+        """
+        if len(values) != TABLE_SIZE:
+            raise ValueError("A leave table needs {} values".format(
+                TABLE_SIZE))
+        self.__values = values
+        self.__mapped = mapped
+
+    @classmethod
+    def load(cls, filename=DEFAULT_FILENAME):
+        """
+        Returns the table in the file, mapped into memory. Raises
+        ValueError if the file isn't a leave table of the right size.
+        """
+        with open(filename, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, max_size, entries = HEADER.unpack_from(mapped)
+        if (magic != MAGIC or max_size != MAX_LEAVE_SIZE or
+                entries != TABLE_SIZE or
+                len(mapped) != HEADER.size + 4 * entries):
+            mapped.close()
+            raise ValueError("{} is not a leave table".format(filename))
+        values = memoryview(mapped)[HEADER.size:].cast('f')
+        return cls(values, mapped)
+
+    def save(self, filename=DEFAULT_FILENAME):
+        """Writes the table to the file (see load)."""
+        temporary = "{}.{}.tmp".format(filename, os.getpid())
+        with open(temporary, "wb") as file:
+            file.write(HEADER.pack(MAGIC, MAX_LEAVE_SIZE, TABLE_SIZE))
+            array('f', self.__values).tofile(file)
+        os.replace(temporary, filename)
+
+    def close(self):
+        """Unmaps the file, if the table was loaded from one."""
+        if self.__mapped is not None:
+            self.__values.release()
+            self.__mapped.close()
+            self.__mapped = None
+
+    def value(self, letters):
+        """Returns the value of a leave like "EST?"."""
+        return self.__values[rank_letters(letters)]
+
+    def value_of_counts(self, counts):
+        """Returns the value of a leave given as a 27-entry count list."""
+        return self.__values[rank_counts(counts)]
+
+    def value_of_indices(self, indices):
+        """Returns the value of a leave given as sorted tile numbers."""
+        return self.__values[rank_indices(indices)]
+
+    def get_values(self):
+        return self.__values
+
+
+def heuristic_value(indices):
+    """Returns the rough value of a leave (see TILE_LEAVE_VALUES)."""
+    letters = [TILE_TYPES[index] for index in indices]
+    value = sum(TILE_LEAVE_VALUES[letter] for letter in letters)
+    for letter in set(letters):
+        value -= DUPLICATE_PENALTY * (letters.count(letter) - 1)
+    vowels = sum(1 for letter in letters if letter in VOWELS)
+    consonants = sum(1 for letter in letters
+                     if letter not in VOWELS and letter != '?')
+    value -= 1.5 * max(0, abs(vowels - consonants) - 1)
+    if not vowels and len(letters) >= 3 and '?' not in letters:
+        value -= 3.0
+    return value
+
+
+def make_heuristic_table():
+    """Returns a LeaveTable of heuristic_value for every leave."""
+    values = array('f', bytes(4 * TABLE_SIZE))
+    for indices in all_leaves():
+        values[rank_indices(indices)] = heuristic_value(indices)
+    return LeaveTable(values)
+
+
+def build_from_results(lines, prior_weight=10.0):
+    """
+    Returns a LeaveTable made from self-play results, given as lines of a
+    leave (like "EST?", or "-" for none) and the equity it was worth. A
+    leave's value is how much better it did than the average leave. Leaves
+    seen only a few times are pulled towards a prior, the sum of a value
+    for each tile worked out from every result (prior_weight is how many
+    results the prior counts as), and leaves never seen get just the prior.
+    """
+    totals = {}  # rank -> [sum of equities, number of results, indices]
+    grand_total = 0.0
+    count = 0
+    for line in lines:
+        fields = line.split()
+        if len(fields) != 2 or line.startswith('#'):
+            continue
+        leave = "" if fields[0] == "-" else fields[0].upper()
+        equity = float(fields[1])
+        indices = sorted(TILE_INDEX[letter] for letter in leave)
+        entry = totals.setdefault(rank_indices(indices),
+                                  [0.0, 0, tuple(indices)])
+        entry[0] += equity
+        entry[1] += 1
+        grand_total += equity
+        count += 1
+    if not count:
+        raise ValueError("No results to build a leave table from")
+    mean = grand_total / count
+
+    # each tile gets the average difference from the mean per tile of
+    # the leaves it was in
+    tile_sums = [0.0] * NUMBER_OF_TILE_TYPES
+    tile_counts = [0] * NUMBER_OF_TILE_TYPES
+    for total, seen, indices in totals.values():
+        for index in indices:
+            tile_sums[index] += (total - mean * seen) / len(indices)
+            tile_counts[index] += seen
+    tile_values = [tile_sums[index] / tile_counts[index]
+                   if tile_counts[index] else 0.0
+                   for index in range(NUMBER_OF_TILE_TYPES)]
+
+    values = array('f', bytes(4 * TABLE_SIZE))
+    for indices in all_leaves():
+        rank = rank_indices(indices)
+        prior = sum(tile_values[index] for index in indices)
+        if rank in totals:
+            total, seen = totals[rank][0], totals[rank][1]
+            values[rank] = ((total - mean * seen + prior * prior_weight) /
+                            (seen + prior_weight))
+        else:
+            values[rank] = prior
+    return LeaveTable(values)
+
+
+def load_leave_table(filename=DEFAULT_FILENAME):
+    """
+    Returns the LeaveTable in the file, making and saving the heuristic
+    table there first if the file doesn't exist.
+    """
+    if not os.path.exists(filename):
+        make_heuristic_table().save(filename)
+    return LeaveTable.load(filename)
+
+
+def static_equity(board, move, rack, leave_table):
+    """
+    Returns the score of the move plus the value of what it leaves on the
+    rack (a string like "AEINST?").
+    """
+    return (board.score_move(move) +
+            leave_table.value(rack_after_move(rack, move)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build leave tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser(
+        "build", help="build a table from self-play results")
+    build.add_argument("results", help="file of 'LEAVE EQUITY' lines")
+    build.add_argument("table", nargs="?", default=DEFAULT_FILENAME)
+    heuristic = commands.add_parser(
+        "heuristic", help="build the rough heuristic table")
+    heuristic.add_argument("table", nargs="?", default=DEFAULT_FILENAME)
+    lookup = commands.add_parser("lookup", help="look up leaves")
+    lookup.add_argument("leaves", nargs="+")
+    lookup.add_argument("--table", default=DEFAULT_FILENAME)
+    arguments = parser.parse_args()
+
+    if arguments.command == "build":
+        with open(arguments.results) as results:
+            build_from_results(results).save(arguments.table)
+    elif arguments.command == "heuristic":
+        make_heuristic_table().save(arguments.table)
+    else:
+        table = LeaveTable.load(arguments.table)
+        for leave in arguments.leaves:
+            print("{} {:+.2f}".format(leave.upper(),
+                                      table.value(leave.upper())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+"""
+This file provides the Lexicon class, which compiles a word list (like the
+OWL2 in OWL2.txt) into every structure the rest of the package looks words
+up in:
+
+the word set, for checking validity
+the anagram index, from prime products to words (see base_anagram)
+the DAWG, for walking words letter by letter (see dawg)
+the hook table, from strings to the letters that can go in front of and
+    behind them to make a word
+the length buckets, from word lengths to sorted lists of words
+
+Compiling all of this from a big word list takes a while, so load_lexicon
+keeps every compiled Lexicon in a cache file in a directory next to the
+word list. The cache file is named after a hash of the word list's contents
+and FORMAT_VERSION, so editing the word list or changing what gets compiled
+makes the old cache file miss and the word list is compiled again; otherwise
+the compiled Lexicon is just read back in.
+
+Small edits to a word list don't need a full compile either: apply_delta
+adds and removes words in every structure in place, and update_lexicon
+does that for a word list on disk and caches the result.
+
+A Lexicon is self-contained, so any number of them can be used in the same
+process: get_lexicon loads each word list once and hands the same Lexicon
+to every caller, and everything that looks words up (wordlist, base_anagram,
+wordtools, the MoveFinders) takes the Lexicon to use as an argument, falling
+back on the default one (the OWL2) when it isn't given.
+"""
+
+import bisect
+import functools
+import hashlib
+import os
+import pickle
+import re
+import threading
+
+from dawg import Dawg
+
+
+# letters are sorted by commonness to keep the products small
+
+LETTER_TO_PRIME = {'e': 2, 't': 3, 'a': 5, 'o': 7, 'i': 11, 'n': 13, 's': 17,
+                        'h': 19, 'r': 23, 'd': 29, 'l': 31, 'c': 37, 'u': 41,
+                        'm': 43, 'w': 47, 'f': 53, 'g': 59, 'y': 61, 'p': 67,
+                        'b': 71, 'v': 73, 'k': 79, 'j': 83, 'x': 89, 'q': 97,
+                        'z': 101}
+
+FORMAT_VERSION = 2  # bump whenever the compiled structures change
+
+DEFAULT_WORD_LIST = "OWL2.txt"  # because of copyright issues, the OWL2
+
+CACHE_DIRECTORY = ".lexicon_cache"  # made next to the word list
+CACHE_EXTENSION = ".lexicon"
+
+
+def number_from_word(string_iterable):
+    """Multiplies the value of each letter by each other to produce a
+    unique number."""
+    product = 1
+    for letter in string_iterable:
+        product *= LETTER_TO_PRIME[letter.lower()]
+
+    return product
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_whole_words(regexp):
+    """Returns the compiled regex matching whole lines against regexp."""
+    return re.compile('^' + regexp + '$', re.MULTILINE)
+
+
+def read_word_list(filename):
+    """Returns a list of the words in the file, one word per line."""
+    with open(filename) as file:
+        return [line.strip().upper() for line in file if line.strip()]
+
+
+def hash_word_list(filename):
+    """
+    Returns a hex digest identifying both the contents of the word list and
+    the compiled format, so that a change to either gives a new digest.
+    """
+    digest = hashlib.sha1("format {}\n".format(FORMAT_VERSION).encode())
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Lexicon:
+    """
+    This class models a compiled word list. Every structure is built in
+    the constructor and only changes through apply_delta.
+    """
+
+    def __init__(self, words, name="lexicon", source_hash=None):
+        """
+        Compiles the iterable of words. name is only used to identify the
+        lexicon (load_lexicon uses the word list's filename) and source_hash
+        is the hash of the word list it came from, if any.
+        """
+        self.__name = name
+        self.__source_hash = source_hash
+        self.__revision = 0  # goes up every time the words change
+        self.__caches = {}  # derived data, thrown away when the words change
+        self.__lock = threading.Lock()  # guards the caches
+        self.__words = set(word.upper() for word in words)
+
+        sorted_words = sorted(self.__words)
+
+        self.__anagram_index = {}  # from numbers to list of words
+        self.__length_buckets = {}  # from lengths to sorted list of words
+        hooks = {}  # from strings to [front hook list, back hook list]
+
+        for word in sorted_words:
+            product = number_from_word(word)
+            if product in self.__anagram_index:
+                self.__anagram_index[product].append(word)
+            else:
+                self.__anagram_index[product] = [word]
+
+            if len(word) in self.__length_buckets:
+                self.__length_buckets[len(word)].append(word)
+            else:
+                self.__length_buckets[len(word)] = [word]
+
+            # every word is a hook of the string without its first letter
+            # and of the string without its last letter
+            hooks.setdefault(word[1:], [[], []])[0].append(word[0])
+            hooks.setdefault(word[:-1], [[], []])[1].append(word[-1])
+
+        self.__hooks = {stem: (''.join(sorted(front)), ''.join(sorted(back)))
+                        for stem, (front, back) in hooks.items()}
+
+        self.__dawg = Dawg.from_words(sorted_words)
+
+    def get_name(self):
+        """Returns the name of the lexicon."""
+        return self.__name
+
+    def get_source_hash(self):
+        """Returns the hash of the word list it was compiled from, or None."""
+        return self.__source_hash
+
+    def set_source_hash(self, source_hash):
+        """Records the hash of the word list this lexicon now matches."""
+        self.__source_hash = source_hash
+
+    def get_revision(self):
+        """
+        Returns a number that goes up every time words are added or removed,
+        so anything derived from the lexicon can tell when it's out of date.
+        """
+        return self.__revision
+
+    def get_words(self):
+        """Returns the set of every word. Do not modify it."""
+        return self.__words
+
+    def get_anagram_index(self):
+        """Returns the dictionary from prime products to lists of words."""
+        return self.__anagram_index
+
+    def get_dawg(self):
+        """Returns the Dawg of every word."""
+        return self.__dawg
+
+    def get_hooks(self):
+        """
+        Returns the dictionary from strings to a tuple of two strings: the
+        letters that can go in front of it and the letters that can go
+        behind it to make a word. Strings with no hooks are not included.
+        """
+        return self.__hooks
+
+    def get_length_buckets(self):
+        """Returns the dictionary from lengths to sorted lists of words."""
+        return self.__length_buckets
+
+    def get_cache(self, key, make):
+        """
+        Returns the value cached under key for this lexicon, calling make()
+        to create it the first time. Every cached value is thrown away when
+        the words change, and none of them are saved with the lexicon.
+        """
+        try:
+            return self.__caches[key]
+        except KeyError:
+            pass
+        with self.__lock:
+            if key not in self.__caches:
+                self.__caches[key] = make()
+            return self.__caches[key]
+
+    def check_validity(self, word):
+        """Returns True if the word is in the lexicon and False otherwise."""
+        return word.upper() in self.__words
+
+    def anagram_without_blanks(self, letters):
+        """Returns every word made of exactly the given letters."""
+        try:
+            return self.__anagram_index[number_from_word(letters)]
+        except KeyError:
+            return []
+
+    def front_hooks(self, word):
+        """Returns a string of every letter that can go in front of word."""
+        return self.__hooks.get(word.upper(), ("", ""))[0]
+
+    def back_hooks(self, word):
+        """Returns a string of every letter that can go behind word."""
+        return self.__hooks.get(word.upper(), ("", ""))[1]
+
+    def regex_search(self, regexp):
+        """
+        Searches the lexicon for a particular regular expression, whole
+        words only, and returns the matches in alphabetical order.
+        """
+        word_string = self.get_cache(
+            "word string", lambda: '\n'.join(sorted(self.__words)))
+        return compile_whole_words(regexp).findall(word_string)
+
+    def __len__(self):
+        """Returns the number of words in the lexicon."""
+        return len(self.__words)
+
+    def __contains__(self, word):
+        return word in self.__words
+
+    def apply_delta(self, added=(), removed=()):
+        """
+        Adds the words in added and removes the words in removed from every
+        compiled structure, in time proportional to the number of words
+        changed rather than the size of the lexicon. Words that are already
+        present (for added) or absent (for removed) are ignored. Returns the
+        number of words that were actually added and removed.
+        """
+        added = sorted(set(word.upper() for word in added) - self.__words)
+        removed = sorted(set(word.upper() for word in removed) & self.__words)
+
+        for word in removed:
+            self.__words.remove(word)
+
+            product = number_from_word(word)
+            self.__anagram_index[product].remove(word)
+            if not self.__anagram_index[product]:
+                del self.__anagram_index[product]
+
+            bucket = self.__length_buckets[len(word)]
+            del bucket[bisect.bisect_left(bucket, word)]
+            if not bucket:
+                del self.__length_buckets[len(word)]
+
+            self.__change_hook(word[1:], 0, word[0], False)
+            self.__change_hook(word[:-1], 1, word[-1], False)
+
+            self.__dawg.remove(word)
+
+        for word in added:
+            self.__words.add(word)
+
+            product = number_from_word(word)
+            bisect.insort(self.__anagram_index.setdefault(product, []), word)
+
+            bisect.insort(self.__length_buckets.setdefault(len(word), []),
+                          word)
+
+            self.__change_hook(word[1:], 0, word[0], True)
+            self.__change_hook(word[:-1], 1, word[-1], True)
+
+            self.__dawg.add(word)
+
+        if added or removed:
+            self.__revision += 1
+            self.__source_hash = None  # no longer matches any word list
+            with self.__lock:
+                self.__caches = {}
+
+        return len(added), len(removed)
+
+    def __change_hook(self, stem, side, letter, present):
+        """
+        Adds (if present is True) or removes the hook letter on the given
+        side of stem, 0 for front and 1 for back.
+        """
+        hooks = list(self.__hooks.get(stem, ("", "")))
+        letters = set(hooks[side])
+        if present:
+            letters.add(letter)
+        else:
+            letters.discard(letter)
+        hooks[side] = ''.join(sorted(letters))
+
+        if hooks[0] or hooks[1]:
+            self.__hooks[stem] = tuple(hooks)
+        else:
+            self.__hooks.pop(stem, None)
+
+    def write_word_list(self, filename):
+        """Writes every word to the file in sorted order, one per line."""
+        with open(filename, "w") as file:
+            for word in sorted(self.__words):
+                file.write(word + "\n")
+
+    def __getstate__(self):
+        """Leaves the caches and the lock out when pickling."""
+        state = self.__dict__.copy()
+        del state["_Lexicon__caches"]
+        del state["_Lexicon__lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__caches = {}
+        self.__lock = threading.Lock()
+
+    def save(self, filename):
+        """
+        Writes the compiled lexicon to the given file. The file is written
+        under a temporary name first and then renamed, so another process
+        reading the same cache never sees half a file.
+        """
+        temporary = "{}.{}.tmp".format(filename, os.getpid())
+        with open(temporary, "wb") as file:
+            pickle.dump((FORMAT_VERSION, self), file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, filename)
+
+    @classmethod
+    def read(cls, filename):
+        """
+        Returns the Lexicon saved in the given file. Raises ValueError if the
+        file was written with a different FORMAT_VERSION.
+        """
+        with open(filename, "rb") as file:
+            version, lexicon = pickle.load(file)
+        if version != FORMAT_VERSION or not isinstance(lexicon, cls):
+            raise ValueError("{} has an outdated lexicon format".format(
+                filename))
+        return lexicon
+
+
+def cache_filename(filename, source_hash, cache_directory=None):
+    """
+    Returns the name of the cache file for the word list filename with the
+    given hash. If cache_directory is None, CACHE_DIRECTORY next to the
+    word list is used.
+    """
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(filename),
+                                       CACHE_DIRECTORY)
+    name = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(cache_directory, "{}-{}{}".format(
+        name, source_hash, CACHE_EXTENSION))
+
+
+def load_lexicon(filename, cache_directory=None):
+    """
+    Returns the compiled Lexicon for the word list in filename, reading it
+    from the cache if the word list hasn't changed since it was last
+    compiled and compiling and caching it otherwise. Cache files left over
+    from older versions of the same word list are deleted.
+    """
+    source_hash = hash_word_list(filename)
+    cached = cache_filename(filename, source_hash, cache_directory)
+
+    if os.path.exists(cached):
+        try:
+            return Lexicon.read(cached)
+        except (ValueError, EOFError, pickle.UnpicklingError):
+            pass  # unreadable cache: just compile again
+
+    name = os.path.splitext(os.path.basename(filename))[0]
+    lexicon = Lexicon(read_word_list(filename), name, source_hash)
+    store_lexicon(lexicon, filename, cache_directory)
+
+    return lexicon
+
+
+def store_lexicon(lexicon, filename, cache_directory=None):
+    """
+    Saves the lexicon as the cache for the word list in filename, deleting
+    cache files left over from older versions of the same word list.
+    """
+    source_hash = lexicon.get_source_hash()
+    cached = cache_filename(filename, source_hash, cache_directory)
+    name = os.path.splitext(os.path.basename(filename))[0]
+
+    directory = os.path.dirname(cached)
+    os.makedirs(directory, exist_ok=True)
+    for old in os.listdir(directory):  # stale versions of this word list
+        old_hash = old[len(name) + 1:-len(CACHE_EXTENSION)]
+        if (old.startswith(name + "-") and old.endswith(CACHE_EXTENSION) and
+                len(old_hash) == len(source_hash) and old_hash != source_hash):
+            try:
+                os.remove(os.path.join(directory, old))
+            except OSError:
+                pass  # another process got to it first
+    lexicon.save(cached)
+
+
+def update_lexicon(filename, added=(), removed=(), cache_directory=None):
+    """
+    Adds and removes words from the word list in filename without compiling
+    it again: the cached Lexicon is loaded, the change is applied to it with
+    apply_delta, the word list is rewritten and the updated Lexicon is cached
+    for the new contents. Returns the updated Lexicon.
+    """
+    lexicon = load_lexicon(filename, cache_directory)
+    if lexicon.apply_delta(added, removed) == (0, 0):
+        return lexicon  # nothing changed
+
+    lexicon.write_word_list(filename)
+    lexicon.set_source_hash(hash_word_list(filename))
+    store_lexicon(lexicon, filename, cache_directory)
+
+    return lexicon
+
+
+# every Lexicon loaded by get_lexicon, by absolute word list filename
+loaded_lexicons = {}
+loaded_lexicons_lock = threading.Lock()
+
+
+def get_lexicon(filename=DEFAULT_WORD_LIST, cache_directory=None):
+    """
+    Returns the Lexicon for the word list in filename, loading it with
+    load_lexicon the first time and returning the same Lexicon after that,
+    so every part of a program shares one copy of each lexicon.
+    """
+    key = os.path.abspath(filename)
+    try:
+        return loaded_lexicons[key]
+    except KeyError:
+        pass
+    with loaded_lexicons_lock:
+        if key not in loaded_lexicons:
+            loaded_lexicons[key] = load_lexicon(filename, cache_directory)
+        return loaded_lexicons[key]
+
+
+def get_default_lexicon():
+    """Returns the Lexicon for DEFAULT_WORD_LIST."""
+    return get_lexicon(DEFAULT_WORD_LIST)
+
+
+def choose_lexicon(lexicon):
+    """Returns lexicon, or the default Lexicon if lexicon is None."""
+    if lexicon is None:
+        return get_default_lexicon()
+    return lexicon
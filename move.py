@@ -10,7 +10,8 @@ a blank that has been set to F (like in 'fAINTERS'), while 'F' represents
 a normal F tile. This function can be called from Move if desired.
 """
 
-from coordinate import Coordinate
+import constants  # has to be loaded before tile, which it imports
+from coordinate import Coordinate, DEFAULT_SIZE
 from tile import Tile
 import re
 
@@ -29,13 +30,13 @@ class Move():
     iterate over every tile in the move, including ones on the board.
     """
 
-    def __init__(self, word, coord):
+    def __init__(self, word, coord, size=DEFAULT_SIZE):
         """
         Initializes a Move with the given string (only alphabetic characters)
         and coordinate. Coord can either be a Coordinate or a string, which
-        will be converted to a Coordinate. Word is a string, following the
-        rules of the class doc: lowercase means blank, parentheses mean already
-        played. Example: PORt(MANTEaU)X
+        will be converted to a Coordinate on a board of the given size. Word
+        is a string, following the rules of the class doc: lowercase means
+        blank, parentheses mean already played. Example: PORt(MANTEaU)X
         """
         
         tilelist = self.tiles_from_string(word)
@@ -44,7 +45,7 @@ class Move():
         self.__just_played_tiles = tilelist[1]
         
         if isinstance(coord, str):
-            self.__coord = Coordinate.initialize_from_string(coord)
+            self.__coord = Coordinate.initialize_from_string(coord, size)
         else:
             self.__coord = coord
 
@@ -65,6 +66,9 @@ class Move():
                 else:
                     string += str(tile)
 
+        if string.count('(') > string.count(')'):  # ends on the board
+            string += ')'
+
         return string
     def __str__(self):
         """Returns a string in the syntax described in the class doc."""
@@ -83,6 +87,9 @@ class Move():
                 else:
                     string += str(tile)
 
+        if string.count('(') > string.count(')'):  # ends on the board
+            string += ')'
+
         return str(self.__coord) + ' ' + string
     
     @classmethod
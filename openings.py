@@ -0,0 +1,441 @@
+"""
+This file provides the OpeningTable class, which looks up the best first
+move of the game for a rack instead of finding it. On an empty board the
+best move depends only on the seven tiles, so the table has one fixed-size
+record for every multiset of seven tiles (blanks included): the word
+(lowercase letters for blanks), the column it starts in on the center row,
+its score and its equity. Every opening can be played down the center
+column just as well, so only the across move is kept.
+
+Racks have positions in the table the same way leaves do (see leaves): the
+multiset's tile numbers a1 <= ... <= a7 (see bag), made strictly increasing
+with bi = ai + i - 1, are ranked in the combinatorial number system as
+C(b1, 1) + ... + C(b7, 7), so a lookup is seven additions and a slice.
+Racks a bag can't hold, and racks with no word at all, have empty records.
+
+Tables are saved as a short header followed by the records, and load maps
+the file into memory with mmap, so every process shares one copy.
+
+build_table works out every record without a move generator. An opening
+is one word made of some of the rack's letters, plus up to two blanks
+standing for letters it doesn't have, so the words are indexed by the
+prime product (see base_anagram) of what's left of them once zero, one or
+two letters are taken out for blanks. The words a rack can play are then
+found by looking up the product of each part of its letters, and each is
+scored with the multipliers of the center row, with the blanks on the
+occurrences of their letter that would have been worth the least. The
+racks are split among a pool of processes by their first two tiles.
+
+Ranked with a LeaveTable, the record is the move with the best equity
+(score plus leave value); without one, the top scoring move. Either way
+the table says which it is, with is_equity_table:
+
+    python openings.py build --leaves leaves.bin
+    python openings.py lookup AEINST?
+"""
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, combinations_with_replacement
+
+from bag import (BLANK_INDEX, FULL_BAG_COUNTS, NUMBER_OF_TILE_TYPES,
+                 TILE_INDEX, TILE_TYPES)
+from board import BINGO_BONUS
+from constants import TILE_VALUES
+from coordinate import Coordinate, HORIZONTAL
+from layout import STANDARD
+from leaves import BINOMIAL
+from lexicon import LETTER_TO_PRIME
+from move import Move
+import leaves as leaves_module
+import lexicon as lexicon_module
+
+
+RACK_SIZE = 7
+MAX_BLANKS = FULL_BAG_COUNTS[BLANK_INDEX]
+
+MAGIC = b"OPENING1"
+HEADER = struct.Struct("<8sIII")  # magic, rack size, entries, flags
+RECORD = struct.Struct("<fHB7s")  # equity, score, column, word
+EQUITY_FLAG = 1  # ranked by equity rather than score
+
+DEFAULT_FILENAME = "openings.bin"
+
+TABLE_SIZE = BINOMIAL[NUMBER_OF_TILE_TYPES + RACK_SIZE - 1][RACK_SIZE]
+
+SIZE = STANDARD.get_size()  # openings are for the normal board
+ROW = STANDARD.get_center()  # every opening goes through the center square
+PRIMES = {letter.upper(): prime for letter, prime in LETTER_TO_PRIME.items()}
+
+
+def rank_indices(indices):
+    """Returns the position in the table of seven sorted tile numbers."""
+    rank = 0
+    for position, index in enumerate(indices):
+        rank += BINOMIAL[index + position][position + 1]
+    return rank
+
+
+def rank_rack(rack):
+    """Returns the position in the table of a rack like "AEINST?"."""
+    if len(rack) != RACK_SIZE:
+        raise ValueError("A rack needs {} tiles, not {}".format(
+            RACK_SIZE, rack))
+    return rank_indices(sorted(TILE_INDEX[letter] for letter in
+                               rack.upper()))
+
+
+def all_racks(first=None):
+    """
+    Yields every rack a full bag can hold, as seven sorted tile numbers,
+    starting with the tile numbers first if given.
+    """
+    first = tuple(first or ())
+    low = first[-1] if first else 0
+    for rest in combinations_with_replacement(
+            range(low, NUMBER_OF_TILE_TYPES), RACK_SIZE - len(first)):
+        indices = first + rest
+        possible = True
+        for index in set(indices):
+            if indices.count(index) > FULL_BAG_COUNTS[index]:
+                possible = False
+                break
+        if possible:
+            yield indices
+
+
+def row_placements():
+    """
+    Returns a dictionary from word lengths to a list of (column, letter
+    multipliers, word multiplier) for every place on the center row a word
+    of that length covers the center square.
+    """
+    letter_multipliers = STANDARD.get_letter_multipliers()
+    word_multipliers = STANDARD.get_word_multipliers()
+    placements = {}
+    for length in range(2, RACK_SIZE + 1):
+        placements[length] = []
+        for column in range(max(0, ROW - length + 1),
+                            min(ROW, SIZE - length) + 1):
+            start = ROW * SIZE + column
+            word_multiplier = 1
+            for multiplier in word_multipliers[start:start + length]:
+                word_multiplier *= multiplier
+            placements[length].append(
+                (column, letter_multipliers[start:start + length],
+                 word_multiplier))
+    return placements
+
+
+def product_of(letters):
+    result = 1
+    for letter in letters:
+        result *= PRIMES[letter]
+    return result
+
+
+def make_word_index(words):
+    """
+    Returns a list, for each number of blanks up to MAX_BLANKS, of a
+    dictionary from the prime product of the letters of a word not played
+    with blanks to the (score, word with blanks in lowercase, column) of
+    the top scoring such opening (see best_placement).
+    """
+    placements = row_placements()
+    indexes = [{} for blanks in range(MAX_BLANKS + 1)]
+    for word in sorted(words):
+        if not 2 <= len(word) <= RACK_SIZE:
+            continue
+        columns = word_placements(word, placements)
+        for blanks in range(MAX_BLANKS + 1):
+            index = indexes[blanks]
+            for blank_letters in sorted(set(combinations(sorted(word),
+                                                         blanks))):
+                rest = list(word)
+                for letter in blank_letters:
+                    rest.remove(letter)
+                key = product_of(rest)
+                score, column, played = best_placement(word, blank_letters,
+                                                       columns)
+                old = index.get(key)
+                if old is None or score > old[0]:
+                    index[key] = (score, played, column)
+    return indexes
+
+
+def word_placements(word, placements):
+    """
+    Returns a list of (column, points of each letter, word multiplier) for
+    every place for the word on the center row (see row_placements).
+    """
+    values = [TILE_VALUES[letter] for letter in word]
+    return [(column, [value * multiplier for value, multiplier
+                      in zip(values, letter_multipliers)], word_multiplier)
+            for column, letter_multipliers, word_multiplier
+            in placements[len(word)]]
+
+
+def best_placement(word, blank_letters, columns):
+    """
+    Returns (score, column, word with blanks in lowercase) of the best
+    place for the word among the columns (see word_placements), where
+    blank_letters are played with blanks.
+    """
+    bingo = BINGO_BONUS if len(word) == RACK_SIZE else 0
+    best = None
+    for column, points, word_multiplier in columns:
+        blanked = []
+        for letter in blank_letters:
+            # the blank goes where its letter would have been worth least
+            blanked.append(min(
+                (points[position], position)
+                for position, other in enumerate(word)
+                if other == letter and position not in blanked)[1])
+        score = ((sum(points) - sum(points[position] for position in blanked))
+                 * word_multiplier + bingo)
+        if best is None or score > best[0]:
+            best = (score, column, blanked)
+    score, column, blanked = best
+    return score, column, ''.join(
+        letter.lower() if position in blanked else letter
+        for position, letter in enumerate(word))
+
+
+def parts(letters):
+    """
+    Yields every sub-multiset of the sorted letters (a string), as its
+    prime product and the letters left out of it.
+    """
+    if not letters:
+        yield 1, ""
+        return
+    letter = letters[0]
+    count = 1
+    while count < len(letters) and letters[count] == letter:
+        count += 1
+    rest = letters[count:]
+    prime = PRIMES[letter]
+    for total, left in parts(rest):
+        for used in range(count + 1):
+            yield total * prime ** used, letter * (count - used) + left
+
+
+def best_opening(indices, word_index, leave_table=None):
+    """
+    Returns (equity, score, column, word) of the best opening for the rack
+    of sorted tile numbers, or None if no word can be played.
+    """
+    blanks = indices.count(BLANK_INDEX)
+    letters = ''.join(TILE_TYPES[index] for index in indices
+                      if index != BLANK_INDEX)
+    best = None
+    for total, left in parts(letters):
+        for blanks_used in range(blanks + 1):
+            found = word_index[blanks_used].get(total)
+            if found is None:
+                continue
+            score, word, column = found
+            equity = score
+            if leave_table is not None:
+                equity += leave_table.value(left +
+                                            '?' * (blanks - blanks_used))
+            choice = (equity, score, word, column)
+            if (best is None or choice[:2] > best[:2] or
+                    (choice[:2] == best[:2] and choice[2:] < best[2:])):
+                best = choice
+    if best is None:
+        return None
+    equity, score, word, column = best
+    return equity, score, column, word
+
+
+class OpeningTable:
+    """A class that looks up the best opening for a rack. See file doc."""
+
+    def __init__(self, records, flags=0, mapped=None):
+        """
+        Takes the TABLE_SIZE records as a bytes-like object, the flags
+        (EQUITY_FLAG if they are ranked by equity) and the mmap they live
+        in, if any, so it can be closed.
+        """
+        if len(records) != RECORD.size * TABLE_SIZE:
+            raise ValueError("An opening table needs {} records".format(
+                TABLE_SIZE))
+        self.__records = records
+        self.__flags = flags
+        self.__mapped = mapped
+
+    @classmethod
+    def load(cls, filename=DEFAULT_FILENAME):
+        """
+        Returns the table in the file, mapped into memory. Raises
+        ValueError if the file isn't an opening table of the right size.
+        """
+        with open(filename, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rack_size, entries, flags = HEADER.unpack_from(mapped)
+        if (magic != MAGIC or rack_size != RACK_SIZE or
+                entries != TABLE_SIZE or
+                len(mapped) != HEADER.size + RECORD.size * entries):
+            mapped.close()
+            raise ValueError("{} is not an opening table".format(filename))
+        return cls(memoryview(mapped)[HEADER.size:], flags, mapped)
+
+    def save(self, filename=DEFAULT_FILENAME):
+        """Writes the table to the file (see load)."""
+        temporary = "{}.{}.tmp".format(filename, os.getpid())
+        with open(temporary, "wb") as file:
+            file.write(HEADER.pack(MAGIC, RACK_SIZE, TABLE_SIZE,
+                                   self.__flags))
+            file.write(self.__records)
+        os.replace(temporary, filename)
+
+    def close(self):
+        """Unmaps the file, if the table was loaded from one."""
+        if self.__mapped is not None:
+            self.__records.release()
+            self.__mapped.close()
+            self.__mapped = None
+
+    def is_equity_table(self):
+        """Returns True if openings are ranked by equity, not score."""
+        return bool(self.__flags & EQUITY_FLAG)
+
+    def lookup(self, rack):
+        """
+        Returns (Move, score, equity) of the best opening for the rack, a
+        string of seven tiles like "AEINST?", or None if there is none.
+        """
+        equity, score, column, word = RECORD.unpack_from(
+            self.__records, RECORD.size * rank_rack(rack))
+        word = word.rstrip(b'\0').decode("ascii")
+        if not word:
+            return None
+        return (Move(word, Coordinate(column, ROW, HORIZONTAL)), score,
+                equity)
+
+
+# the word index and LeaveTable each worker process uses
+worker_word_index = None
+worker_leave_table = None
+
+
+def initialize_worker(word_index, leave_file):
+    """Sets the word index and maps the leave table in a worker process."""
+    global worker_word_index, worker_leave_table
+    worker_word_index = word_index
+    if leave_file is not None:
+        worker_leave_table = leaves_module.LeaveTable.load(leave_file)
+
+
+def build_part(first):
+    """
+    Works out the records of every rack starting with the tile numbers
+    first, in a worker process, and returns their ranks as an array's
+    bytes and the records packed one after another.
+    """
+    ranks = array('I')
+    records = bytearray()
+    for indices in all_racks(first):
+        best = best_opening(indices, worker_word_index, worker_leave_table)
+        if best is not None:
+            equity, score, column, word = best
+            ranks.append(rank_indices(indices))
+            records += RECORD.pack(equity, score, column,
+                                   word.encode("ascii"))
+    return ranks.tobytes(), bytes(records)
+
+
+def build_table(word_list=lexicon_module.DEFAULT_WORD_LIST, leave_file=None,
+                processes=None, output=None):
+    """
+    Returns an OpeningTable of the best opening for every rack, worked out
+    across a pool of processes (processes=0 works in this process). The
+    openings are ranked by equity with the leave table in leave_file, or
+    by score if it's None. Progress is printed to output, if given.
+    """
+    records = bytearray(RECORD.size * TABLE_SIZE)
+    # indexed once here and shared with the forked workers
+    words = lexicon_module.get_lexicon(word_list).get_words()
+    arguments = (make_word_index(words), leave_file)
+    firsts = [pair for pair in combinations_with_replacement(
+        range(NUMBER_OF_TILE_TYPES), 2)
+        if pair[0] != pair[1] or FULL_BAG_COUNTS[pair[0]] > 1]
+
+    def store(part):
+        ranks, packed = part
+        ranks = array('I', ranks)
+        size = RECORD.size
+        for number, rank in enumerate(ranks):
+            records[rank * size:(rank + 1) * size] = \
+                packed[number * size:(number + 1) * size]
+
+    start = time.perf_counter()
+    if processes == 0:
+        initialize_worker(*arguments)
+        parts_built = map(build_part, firsts)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(processes,
+                                   multiprocessing.get_context("fork"),
+                                   initialize_worker, arguments)
+        parts_built = pool.map(build_part, firsts)
+    try:
+        for done, part in enumerate(parts_built, 1):
+            store(part)
+            if output is not None and done % 27 == 0:
+                print("{}/{} parts in {:.0f}s".format(
+                    done, len(firsts), time.perf_counter() - start),
+                    file=output)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return OpeningTable(records, EQUITY_FLAG if leave_file else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build opening tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build the opening table")
+    build.add_argument("table", nargs="?", default=DEFAULT_FILENAME)
+    build.add_argument("--leaves", help="rank by equity with this table")
+    build.add_argument("--processes", type=int, default=None)
+    build.add_argument("--word-list",
+                       default=lexicon_module.DEFAULT_WORD_LIST)
+    lookup = commands.add_parser("lookup", help="look up openings")
+    lookup.add_argument("racks", nargs="+")
+    lookup.add_argument("--table", default=DEFAULT_FILENAME)
+    arguments = parser.parse_args()
+
+    if arguments.command == "build":
+        if arguments.leaves:
+            leaves_module.load_leave_table(arguments.leaves).close()
+        start = time.perf_counter()
+        table = build_table(arguments.word_list, arguments.leaves,
+                            arguments.processes, sys.stderr)
+        table.save(arguments.table)
+        print("Built {} in {:.0f}s".format(arguments.table,
+                                           time.perf_counter() - start),
+              file=sys.stderr)
+    else:
+        table = OpeningTable.load(arguments.table)
+        for rack in arguments.racks:
+            found = table.lookup(rack)
+            if found is None:
+                print("{}: no opening".format(rack.upper()))
+            else:
+                move, score, equity = found
+                print("{}: {} {} ({:.2f})".format(rack.upper(), move, score,
+                                                  equity))
+        table.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+This file reads positions saved as Quackle text dumps, like test-board.txt:
+
+    Players: New Player 1 (score 151), Quackle (score 123)
+
+       A B C D E F G H I J K L M N O
+       ------------------------------
+     1|=     '   H O S       '     =|
+     ...
+    15|=     '       =       '     =|
+       ------------------------------
+
+    Unseen: AAAAABCCDEEEEEFFGGGIIIIIIJLMMNNOOOOOOORRRRTTTTUUUVVWWXYY?? (58)
+
+    New Player 1 to play with EELPRST
+
+Every square of the grid takes two characters. A capital letter is a tile,
+a lowercase letter a blank played as that letter, and anything else (' '
+or the bonus square markers = - ' ") an empty square. read_position turns
+that into a Position holding a Board, the rack and the unseen tiles.
+
+Run as a script, it analyzes every position in a directory (or the files
+given) across a pool of processes, finding and scoring every move, and
+writes one line of JSON per position with the top moves by equity (see
+leaves) to standard output or a file:
+
+    python quackle.py positions/ --top 5 --output results.jsonl
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from anchormovefinder import AnchorMoveFinder
+from board import Board, BOARD_SIZE
+from coordinate import Coordinate, HORIZONTAL
+from tile import Tile
+import leaves as leaves_module
+import lexicon as lexicon_module
+
+
+GRID_LINE = re.compile(r"^\s*(\d+)\|(.*)\|\s*$")
+PLAYERS_LINE = re.compile(r"^Players:\s*(.*)$")
+PLAYER = re.compile(r"^(.*?)\s*\(score (-?\d+)\)$")
+UNSEEN_LINE = re.compile(r"^Unseen:\s*([A-Z?]*)")
+TO_PLAY_LINE = re.compile(r"^(.*) to play with ([A-Z?]*)\s*$")
+
+
+class Position:
+    """A Scrabble position read from a Quackle text dump."""
+
+    def __init__(self, board, rack, unseen, players, player_to_move):
+        self.__board = board
+        self.__rack = rack
+        self.__unseen = unseen
+        self.__players = players
+        self.__player_to_move = player_to_move
+
+    def get_board(self):
+        return self.__board
+
+    def get_rack(self):
+        """Returns the rack of the player to move, like "EELPRST"."""
+        return self.__rack
+
+    def get_unseen(self):
+        """Returns the tiles the player to move can't see, like "AAB??"."""
+        return self.__unseen
+
+    def get_players(self):
+        """Returns a list of (name, score) for each player."""
+        return self.__players
+
+    def get_player_to_move(self):
+        return self.__player_to_move
+
+    def get_score(self, name):
+        """Returns the score of the named player."""
+        for player, score in self.__players:
+            if player == name:
+                return score
+        raise KeyError(name)
+
+
+def parse_grid_row(board, row, squares):
+    """Puts the tiles in one grid row (the text between the bars) on board."""
+    for col in range(min(BOARD_SIZE, (len(squares) + 1) // 2)):
+        letter = squares[2 * col]
+        if 'A' <= letter <= 'Z':
+            tile = Tile(letter)
+        elif 'a' <= letter <= 'z':
+            tile = Tile('?')
+            tile.set_face(letter.upper())
+        else:
+            continue
+        board.add_tile(tile, Coordinate(col, row, HORIZONTAL))
+
+
+def parse_position(text):
+    """
+    Returns the Position in the text of a Quackle dump. Raises ValueError
+    if the text has no rack or its grid rows aren't labeled 1 to
+    BOARD_SIZE in order.
+    """
+    board = Board()
+    rows = 0
+    rack = None
+    unseen = ""
+    players = []
+    player_to_move = None
+    for line in text.splitlines():
+        match = GRID_LINE.match(line)
+        if match:
+            label = int(match.group(1))
+            if label != rows + 1:  # rows go 1 to BOARD_SIZE, in order
+                raise ValueError("Expected grid row {}, found row {}".format(
+                    rows + 1, label))
+            if label > BOARD_SIZE:
+                raise ValueError("Row {} is off the board".format(label))
+            parse_grid_row(board, rows, match.group(2))
+            rows += 1
+            continue
+        line = line.strip()
+        match = PLAYERS_LINE.match(line)
+        if match:
+            for player in match.group(1).split(','):
+                player_match = PLAYER.match(player.strip())
+                if player_match:
+                    players.append((player_match.group(1),
+                                    int(player_match.group(2))))
+            continue
+        match = UNSEEN_LINE.match(line)
+        if match:
+            unseen = match.group(1)
+            continue
+        match = TO_PLAY_LINE.match(line)
+        if match:
+            player_to_move, rack = match.group(1), match.group(2)
+
+    if rows != BOARD_SIZE:
+        raise ValueError("Expected {} grid rows, found {}".format(
+            BOARD_SIZE, rows))
+    if rack is None:
+        raise ValueError("No rack to play with")
+    return Position(board, rack, unseen, players, player_to_move)
+
+
+def read_position(filename):
+    """Returns the Position in a Quackle dump file."""
+    with open(filename) as file:
+        return parse_position(file.read())
+
+
+# the MoveFinder and LeaveTable each worker process uses
+worker_move_finder = None
+worker_leave_table = None
+
+
+def initialize_worker(word_list, leave_file):
+    """Loads the lexicon and maps the leave table in a worker process."""
+    global worker_move_finder, worker_leave_table
+    worker_move_finder = AnchorMoveFinder(
+        lexicon_module.get_lexicon(word_list))
+    worker_leave_table = leaves_module.LeaveTable.load(leave_file)
+
+
+def analyze_position(filename, top=10):
+    """
+    Finds and scores every move in the position in the file, in a worker
+    process, and returns a dictionary of the results ready for JSON.
+    """
+    start = time.perf_counter()
+    try:
+        position = read_position(filename)
+    except (OSError, ValueError) as error:
+        return {"file": filename, "error": str(error)}
+    rack = position.get_rack()
+    count, best = best_moves(position.get_board(), rack, top)
+    return {
+        "file": filename,
+        "player": position.get_player_to_move(),
+        "rack": rack,
+        "unseen": len(position.get_unseen()),
+        "moves": count,
+        "best": best,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def best_moves(board, rack, top=10):
+    """
+    Finds every move for the rack on the board in a worker process and
+    returns how many there are and a list of the top ones by equity, each
+    a dictionary of the "move", its "score" and its "equity".
+    """
+    moves = worker_move_finder.find_all_moves(rack, board)
+    rated = [(leaves_module.static_equity(board, move, rack,
+                                          worker_leave_table),
+              board.score_move(move, False), str(move))
+             for move in moves]
+    rated.sort(reverse=True)
+    return len(moves), [{"move": move, "score": score,
+                         "equity": round(equity, 2)}
+                        for equity, score, move in rated[:top]]
+
+
+def position_files(paths):
+    """Yields every file in the given files and directories, sorted."""
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.scandir(path), key=lambda e: e.name):
+                if entry.is_file():
+                    yield entry.path
+        else:
+            yield path
+
+
+def analyze_positions(paths, output,
+                      word_list=lexicon_module.DEFAULT_WORD_LIST,
+                      leave_file=leaves_module.DEFAULT_FILENAME,
+                      processes=None, top=10, chunk_size=8):
+    """
+    Analyzes every position file in paths (see position_files) across a
+    pool of processes, writing each result to the file output as a line of
+    JSON in the same order as the files. Returns how many were analyzed.
+    """
+    leaves_module.load_leave_table(leave_file).close()  # make it if needed
+    count = 0
+    with ProcessPoolExecutor(processes, initializer=initialize_worker,
+                             initargs=(word_list, leave_file)) as pool:
+        filenames = position_files(paths)
+        for result in pool.map(analyze_position, filenames, repeat(top),
+                               chunksize=chunk_size):
+            output.write(json.dumps(result) + "\n")
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the best moves in Quackle position dumps.")
+    parser.add_argument("paths", nargs="+",
+                        help="position files or directories of them")
+    parser.add_argument("--output", help="JSON lines file (default stdout)")
+    parser.add_argument("--top", type=int, default=10,
+                        help="how many moves to list for each position")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--word-list",
+                        default=lexicon_module.DEFAULT_WORD_LIST)
+    parser.add_argument("--leaves", default=leaves_module.DEFAULT_FILENAME)
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    if arguments.output is None:
+        count = analyze_positions(arguments.paths, sys.stdout,
+                                  arguments.word_list, arguments.leaves,
+                                  arguments.processes, arguments.top)
+    else:
+        with open(arguments.output, "w") as output:
+            count = analyze_positions(arguments.paths, output,
+                                      arguments.word_list, arguments.leaves,
+                                      arguments.processes, arguments.top)
+    elapsed = time.perf_counter() - start
+    print("Analyzed {} positions in {:.2f}s ({:.1f}/s)".format(
+        count, elapsed, count / elapsed if elapsed else 0.0),
+        file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+This file provides the QueryCache class and the cached_query decorator,
+which remember the results of word queries (anagrams, subanagrams, hooks,
+patterns) so that asking the same thing again is a dictionary lookup.
+
+Queries are cached under a normalized key, so "TAE" and "EAT" (or "C**R"
+and "C*R") share an entry, and a rack's subanagrams come back in the order
+they were found for the first rack with those letters.
+
+Each Lexicon has its own QueryCache, kept with Lexicon.get_cache, so when
+the lexicon's words change its cache goes away with everything else
+derived from them. A QueryCache holds at most max_entries results and,
+if max_bytes is set, results taking up at most about that much memory,
+and drops the least recently used results first.
+
+Only the outermost query is cached: the anagram of "AE?" is, but not the
+26 anagrams without a blank it is made from. The limits for new caches are
+set with set_limits, and statistics(lexicon) says how well a cache is doing.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import lexicon as lexicon_module
+
+
+MAX_ENTRIES = 10000
+MAX_BYTES = None  # no limit
+
+
+def set_limits(max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+    """
+    Sets the limits of every QueryCache made from now on and of those of
+    the lexicons loaded with get_lexicon, evicting results as needed.
+    """
+    global MAX_ENTRIES, MAX_BYTES
+    MAX_ENTRIES = max_entries
+    MAX_BYTES = max_bytes
+    for lexicon in lexicon_module.loaded_lexicons.values():
+        get_query_cache(lexicon).set_limits(max_entries, max_bytes)
+
+
+def result_size(result):
+    """Returns about how many bytes a list of words takes up."""
+    return sys.getsizeof(result) + sum(sys.getsizeof(word) for word in result)
+
+
+class QueryCache:
+    """A class that caches query results with LRU eviction."""
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        """
+        Creates a cache of at most max_entries results of at most max_bytes
+        (None for no limit) in total; by default, the module limits.
+        """
+        self.__entries = OrderedDict()  # key -> (result, size)
+        self.__max_entries = MAX_ENTRIES if max_entries is None \
+            else max_entries
+        self.__max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the result cached under key, or None."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        """Caches result under key, making room for it if needed."""
+        size = result_size(result)
+        with self.__lock:
+            old = self.__entries.pop(key, None)
+            if old is not None:
+                self.__bytes -= old[1]
+            self.__entries[key] = (result, size)
+            self.__bytes += size
+            self.__evict()
+
+    def __evict(self):
+        """Drops the least recently used results until within the limits."""
+        entries = self.__entries
+        while entries and (
+                len(entries) > self.__max_entries or
+                (self.__max_bytes is not None and
+                 self.__bytes > self.__max_bytes)):
+            key, (result, size) = entries.popitem(last=False)
+            self.__bytes -= size
+            self.__evictions += 1
+
+    def set_limits(self, max_entries, max_bytes):
+        with self.__lock:
+            self.__max_entries = max_entries
+            self.__max_bytes = max_bytes
+            self.__evict()
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+
+    def statistics(self):
+        """Returns a dictionary of hits, misses, evictions and the size."""
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            return {
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "hit_rate": self.__hits / lookups if lookups else 0.0,
+                "evictions": self.__evictions,
+                "entries": len(self.__entries),
+                "bytes": self.__bytes,
+                "max_entries": self.__max_entries,
+                "max_bytes": self.__max_bytes,
+            }
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+def get_query_cache(lexicon=None):
+    """Returns the QueryCache of the Lexicon (by default, the default one)."""
+    return lexicon_module.choose_lexicon(lexicon).get_cache(
+        "query cache", QueryCache)
+
+
+def statistics(lexicon=None):
+    """Returns the statistics of the Lexicon's QueryCache."""
+    return get_query_cache(lexicon).statistics()
+
+
+def clear(lexicon=None):
+    get_query_cache(lexicon).clear()
+
+
+# how deep in cached queries each thread is, so only the outermost caches
+depth = threading.local()
+
+
+def cached_query(*normalizers):
+    """
+    A decorator that caches a query function taking one query argument per
+    normalizer and then the lexicon (None for the default one), and
+    returning a list. Results are cached under the function's name and the
+    normalized arguments, and callers always get their own copy of the list.
+    """
+    count = len(normalizers)
+
+    def decorator(function):
+        name = function.__name__
+
+        @wraps(function)
+        def wrapper(*arguments, lexicon=None):
+            if len(arguments) > count:
+                lexicon = arguments[count]
+            query = arguments[:count]
+            if getattr(depth, "level", 0):
+                return function(*query, lexicon)
+            cache = get_query_cache(lexicon)
+            key = (name,) + tuple(normalize(argument) for normalize, argument
+                                  in zip(normalizers, query))
+            result = cache.get(key)
+            if result is None:
+                depth.level = 1
+                try:
+                    result = function(*query, lexicon)
+                finally:
+                    depth.level = 0
+                cache.put(key, result)
+            return list(result)
+        return wrapper
+    return decorator
+
+
+def sorted_letters(tiles):
+    """Normalizes a rack: "TEA" and "EAT" are both "AET"."""
+    return ''.join(sorted(tiles))
+
+
+def canonical_pattern(pattern):
+    """Normalizes a pattern: runs of '*' mean the same as one '*'."""
+    while "**" in pattern:
+        pattern = pattern.replace("**", "*")
+    return pattern
+
+
+def exact(query):
+    """Leaves a query as it is, for queries whose results depend on case."""
+    return query
@@ -0,0 +1,445 @@
+"""
+This file provides an asyncio HTTP server for word queries and move
+analysis, which keeps the lexicon and the query caches (see querycache)
+loaded between requests. Every endpoint answers with JSON:
+
+    GET  /anagram?rack=AEINRST          every anagram of the rack
+    GET  /pattern?pattern=C%3FR*S       every match of the pattern
+    GET  /hooks?word=RATE               the front and back hooks
+    GET  /valid?word=QI&word=ZZZ        whether each word is valid
+    POST /score?move=PORt(MANTEaU)X&coord=8D
+                                        the score of the move, or why it's
+                                        illegal, on the board in the body
+    POST /best-moves?top=10             the best moves by equity (see
+                                        leaves) in the position in the body
+
+The POST bodies are Quackle text dumps (see quackle), and /best-moves uses
+the rack in the dump unless one is given with rack=.
+
+Requests arriving together are batched: every endpoint has a Batcher that
+collects the queries made while the event loop is busy and answers them
+with one call once it's free, working out each distinct query once, so a
+burst of requests for the same popular rack costs one lookup and a burst
+of /score requests on the same board parses the board once. Finding moves
+takes far longer than anything else, so /best-moves is sent to a pool of
+worker processes and the event loop goes on answering other requests.
+
+Run it as a script and query it with any HTTP client:
+
+    python server.py --port 8000
+    curl 'http://127.0.0.1:8000/anagram?rack=AEINRST'
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from board import RACK_SIZE
+from constants import ALPHABET_WITH_Q_MARK
+from move import Move
+from querycache import sorted_letters, canonical_pattern
+import leaves as leaves_module
+import lexicon as lexicon_module
+import quackle
+import querycache
+import wordtools
+
+
+DEFAULT_HOST = "127.0.0.1"  # loopback only
+DEFAULT_PORT = 8000
+MAX_BODY = 1 << 20  # bytes
+MAX_BATCH = 512  # queries answered in one call
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    """An error in a request, answered with the given HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Batcher:
+    """
+    A class that collects the queries made to it while the event loop is
+    busy and answers all of them with one call of an async function, which
+    takes a list of distinct queries and returns a list of their results.
+    A result that is an exception is raised for its own query only, so one
+    bad query doesn't fail the others in its batch.
+    """
+
+    def __init__(self, function, max_size=MAX_BATCH):
+        self.__function = function
+        self.__max_size = max_size
+        self.__pending = {}  # query -> Future of its result
+        self.__scheduled = False
+        self.__batches = 0
+        self.__queries = 0
+        self.__distinct = 0
+        self.__tasks = set()  # the running batches, kept from the collector
+
+    async def submit(self, query):
+        """Returns the result for the query (a hashable value)."""
+        self.__queries += 1
+        future = self.__pending.get(query)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.__pending[query] = future
+            if len(self.__pending) >= self.__max_size:
+                self.__flush()
+            elif not self.__scheduled:
+                self.__scheduled = True
+                loop.call_soon(self.__flush)
+        return await asyncio.shield(future)
+
+    def __flush(self):
+        """Starts answering every pending query."""
+        self.__scheduled = False
+        if not self.__pending:
+            return
+        pending, self.__pending = self.__pending, {}
+        self.__batches += 1
+        self.__distinct += len(pending)
+        task = asyncio.ensure_future(self.__answer(pending))
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+
+    async def __answer(self, pending):
+        queries = list(pending)
+        try:
+            results = await self.__function(queries)
+        except Exception as error:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for query, result in zip(queries, results):
+            future = pending[query]
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def statistics(self):
+        """Returns a dictionary of how many queries and batches there were."""
+        return {"queries": self.__queries, "distinct": self.__distinct,
+                "batches": self.__batches}
+
+
+def answer_each(function, queries):
+    """
+    Returns a list of function(query) for each query, with a RequestError
+    in place of the result of a bad query (one that raises ValueError or
+    re.error) and the exception raised in place of the result of any query
+    that fails some other way (see Batcher).
+    """
+    results = []
+    for query in queries:
+        try:
+            results.append(function(query))
+        except (ValueError, re.error) as error:
+            results.append(RequestError("bad query {}: {}".format(query,
+                                                                  error)))
+        except Exception as error:
+            results.append(error)
+    return results
+
+
+def check_tiles(tiles, most=None):
+    """
+    Raises ValueError if the string has anything but letters and blanks
+    ('?') in it, or more than most tiles.
+    """
+    for tile in tiles:
+        if tile not in ALPHABET_WITH_Q_MARK:
+            raise ValueError("bad tile {} in {}".format(tile, tiles))
+    if most is not None and len(tiles) > most:
+        raise ValueError("more than {} tiles in {}".format(most, tiles))
+
+
+def analyze_text(text, rack, top):
+    """
+    Returns the number of moves and the best ones (see quackle.best_moves)
+    in the Quackle dump text, in a worker process, with the rack in the
+    dump if rack is None. Raises ValueError for a bad dump or rack.
+    """
+    position = quackle.parse_position(text)
+    if rack is None:
+        rack = position.get_rack()
+    check_tiles(rack, RACK_SIZE)
+    count, best = quackle.best_moves(position.get_board(), rack, top)
+    return {"rack": rack, "moves": count, "best": best}
+
+
+class Server:
+    """The word query and move analysis server."""
+
+    def __init__(self, word_list=lexicon_module.DEFAULT_WORD_LIST,
+                 leave_file=leaves_module.DEFAULT_FILENAME, processes=None):
+        """
+        Loads the lexicon and starts processes worker processes for finding
+        moves (processes=0 finds them in a thread of this process instead).
+        """
+        self.__lexicon = lexicon_module.get_lexicon(word_list)
+        leaves_module.load_leave_table(leave_file).close()  # make it if needed
+        if processes == 0:
+            quackle.initialize_worker(word_list, leave_file)
+            self.__pool = None
+        else:
+            # workers forked from a running server would hold copies of its
+            # sockets, keeping closed connections open, so they're spawned
+            self.__pool = ProcessPoolExecutor(
+                processes, multiprocessing.get_context("spawn"),
+                quackle.initialize_worker, (word_list, leave_file))
+        self.__batchers = {
+            "anagram": Batcher(self.__anagrams),
+            "pattern": Batcher(self.__patterns),
+            "hooks": Batcher(self.__hooks),
+            "valid": Batcher(self.__validities),
+            "score": Batcher(self.__scores),
+            "best-moves": Batcher(self.__best_moves),
+        }
+        self.__requests = 0
+
+    def get_lexicon(self):
+        return self.__lexicon
+
+    def close(self):
+        """Shuts the worker processes down."""
+        if self.__pool is not None:
+            self.__pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    async def __anagrams(self, racks):
+        return answer_each(lambda rack: wordtools.anagram(
+            rack, self.__lexicon), racks)
+
+    async def __patterns(self, patterns):
+        return answer_each(lambda pattern: wordtools.pattern_match(
+            pattern, self.__lexicon), patterns)
+
+    async def __hooks(self, words):
+        return answer_each(lambda word: {
+            "front": wordtools.front_hooks(word, self.__lexicon),
+            "back": wordtools.back_hooks(word, self.__lexicon)}, words)
+
+    async def __validities(self, words):
+        return answer_each(self.__lexicon.check_validity, words)
+
+    async def __scores(self, queries):
+        """Scores (text, move, coord) queries, reading each board once."""
+        boards = {}
+
+        def score(query):
+            text, word, coord = query
+            if text not in boards:
+                try:
+                    boards[text] = quackle.parse_position(text).get_board()
+                except ValueError as error:
+                    boards[text] = error
+            board = boards[text]
+            if isinstance(board, ValueError):
+                raise RequestError(str(board))
+            try:
+                move = Move(word, coord)
+            except Exception:
+                raise RequestError("bad move {} at {}".format(word, coord))
+            reason = board.check_move(move, self.__lexicon)
+            if reason is None:
+                return {"move": str(move), "legal": True,
+                        "score": board.score_move(move)}
+            return {"move": str(move), "legal": False, "reason": reason}
+
+        return answer_each(score, queries)
+
+    async def __best_moves(self, queries):
+        """Finds the best moves for (text, rack, top) queries in the pool."""
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(self.__pool, analyze_text, *query)
+                   for query in queries]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        return [RequestError(str(result)) if isinstance(result, ValueError)
+                else result for result in results]
+
+    def statistics(self):
+        """Returns the request, batching and query cache statistics."""
+        return {
+            "requests": self.__requests,
+            "batches": {name: batcher.statistics()
+                        for name, batcher in self.__batchers.items()},
+            "cache": querycache.statistics(self.__lexicon),
+        }
+
+    async def respond(self, method, target, body):
+        """
+        Returns the result of one request as a value ready for JSON. Raises
+        RequestError for a bad request.
+        """
+        self.__requests += 1
+        parts = urlsplit(target)
+        endpoint = parts.path.strip('/')
+        parameters = parse_qs(parts.query)
+
+        def parameter(name, default=None):
+            values = parameters.get(name)
+            if not values:
+                if default is None:
+                    raise RequestError("missing parameter " + name)
+                return default
+            return values[0]
+
+        if endpoint == "statistics":
+            return self.statistics()
+        if endpoint not in self.__batchers:
+            raise RequestError("no endpoint " + endpoint, 404)
+        batcher = self.__batchers[endpoint]
+        needs_body = endpoint in ("score", "best-moves")
+        if method != ("POST" if needs_body else "GET"):
+            raise RequestError("use " + ("POST" if needs_body else "GET") +
+                               " for " + endpoint, 405)
+
+        if endpoint == "anagram":
+            rack = parameter("rack").upper()
+            try:
+                check_tiles(rack)
+            except ValueError as error:
+                raise RequestError(str(error))
+            return await batcher.submit(sorted_letters(rack))
+        if endpoint == "pattern":
+            return await batcher.submit(canonical_pattern(
+                parameter("pattern").upper()))
+        if endpoint == "hooks":
+            return await batcher.submit(parameter("word").upper())
+        if endpoint == "valid":
+            words = parameters.get("word")
+            if not words:
+                raise RequestError("missing parameter word")
+            results = await asyncio.gather(*(batcher.submit(word)
+                                             for word in words))
+            return dict(zip(words, results))
+
+        text = body.decode("utf-8", "replace")
+        if endpoint == "score":
+            return await batcher.submit((text, parameter("move"),
+                                         parameter("coord")))
+        try:
+            top = int(parameter("top", "10"))
+        except ValueError:
+            raise RequestError("top must be a number")
+        rack = parameters.get("rack")
+        return await batcher.submit(
+            (text, rack[0].upper() if rack else None, top))
+
+    async def handle_connection(self, reader, writer):
+        """Answers the HTTP/1.1 requests on one connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = \
+                        request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:  # so there's no telling where the body ends
+                    await self.__send(writer, 400,
+                                      {"error": "bad Content-Length"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self.__send(writer, 413, {"error": "body too big"},
+                                      False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get("connection", "").lower() !=
+                              "close" and version == "HTTP/1.1")
+
+                try:
+                    status, result = 200, await self.respond(method, target,
+                                                             body)
+                except RequestError as error:
+                    status, result = error.status, {"error": str(error)}
+                except Exception as error:
+                    status, result = 500, {"error": repr(error)}
+                await self.__send(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __send(writer, status, result, keep_alive):
+        """Writes one JSON response."""
+        body = json.dumps(result).encode()
+        writer.write("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\n"
+                     "Content-Length: {}\r\nConnection: {}\r\n\r\n".format(
+                         status, REASONS[status], len(body),
+                         "keep-alive" if keep_alive else "close").encode() +
+                     body)
+        await writer.drain()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Starts listening and returns the asyncio Server."""
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+async def serve(host, port, word_list, leave_file, processes):
+    with Server(word_list, leave_file, processes) as server:
+        listener = await server.start(host, port)
+        print("Listening on http://{}:{}/".format(host, port),
+              file=sys.stderr)
+        async with listener:
+            await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve word queries and move analysis over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes for finding moves")
+    parser.add_argument("--word-list",
+                        default=lexicon_module.DEFAULT_WORD_LIST)
+    parser.add_argument("--leaves", default=leaves_module.DEFAULT_FILENAME)
+    arguments = parser.parse_args()
+    try:
+        asyncio.run(serve(arguments.host, arguments.port,
+                          arguments.word_list, arguments.leaves,
+                          arguments.processes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
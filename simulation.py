@@ -0,0 +1,311 @@
+"""
+This file provides the Simulator class, which evaluates candidate moves by
+Monte Carlo simulation. For every candidate, it plays the move, gives the
+opponent a random rack drawn from the unseen tiles, refills the player's
+rack from what's left, and then lets both players play their top scoring
+move for a few turns (plies). The equity of one iteration is the score of
+the candidate plus the scores of the player's later moves minus the scores
+of the opponent's, and a candidate's equity is the mean over all its
+iterations.
+
+Iterations are seeded from the Simulator's seed and the iteration number
+alone, so every candidate is tried against exactly the same racks (which
+makes the comparison between them much less noisy) and a simulation gives
+the same result every time no matter how many processes run it.
+
+Simulations run in rounds across a pool of processes. After every round,
+any candidate whose mean is clearly below the best one's (by more than
+prune_margin standard errors of both) stops being simulated.
+"""
+
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from anchormovefinder import AnchorMoveFinder, rack_string
+from bag import Bag, NUMBER_OF_TILE_TYPES, Rack
+import lexicon as lexicon_module
+
+
+PASS = None  # a candidate that plays no tiles
+
+
+def tiles_played(move):
+    """Returns the rack letters ('?' for blanks) the move uses."""
+    if move is PASS:
+        return ""
+    return ''.join('?' if tile.is_blank() else str(tile)
+                   for tile in move.get_just_played_tiles()
+                   if tile is not None)
+
+
+def best_move(move_finder, board, rack):
+    """Returns the top scoring (score, Move) with the rack, or (0, PASS)."""
+    best = (0, PASS)
+    for move in move_finder.find_all_moves(rack, board):
+        score = board.score_move(move, False)
+        if best[1] is PASS or score > best[0]:
+            best = (score, move)
+    return best
+
+
+def iteration_random(seed, iteration):
+    """Returns the random number generator for one iteration."""
+    return random.Random(seed * 1000003 + iteration)
+
+
+def make_scratch():
+    """
+    Returns a new (Bag, [Rack, Rack]) for simulate_iteration to play
+    iterations with, so that it doesn't make new ones every iteration.
+    """
+    return Bag([0] * NUMBER_OF_TILE_TYPES), [Rack(), Rack()]
+
+
+def simulate_iteration(move_finder, board, rack, unseen, move, plies, seed,
+                       iteration, opponent_racks=None, scratch=None):
+    """
+    Plays one iteration for the candidate move (see the file doc) and
+    returns its equity. rack is the player's Rack and unseen the Bag of
+    tiles they can't see; neither is changed, and the board is left as it
+    was. If opponent_racks is a RackDistribution (see inference), the
+    opponent's rack starts with a leave drawn from it. scratch is what
+    make_scratch returns, reset and reused here (by default, a new one).
+    """
+    generator = iteration_random(seed, iteration)
+    bag, racks = scratch if scratch is not None else make_scratch()
+    bag.copy_from(unseen)
+    racks[0].copy_from(rack)
+    racks[1].set_letters("")
+    racks[0].remove_letters(tiles_played(move))
+    # the opponent's rack comes out of the bag before the player refills
+    if opponent_racks is not None:
+        opponent_racks.draw_into(bag, racks[1], generator)
+    bag.fill(racks[1], generator)
+
+    made = 0
+    if move is PASS:
+        equity = 0
+    else:
+        equity = board.make_move(move)
+        made += 1
+
+    try:
+        player = 0  # refill the player, then the opponent moves
+        for ply in range(plies):
+            bag.fill(racks[player], generator)
+
+            player = 1 - player
+            if racks[player].is_empty():
+                break  # someone went out
+            score, reply = best_move(move_finder, board, str(racks[player]))
+            if reply is not PASS:
+                board.make_move(reply)
+                made += 1
+                racks[player].remove_letters(tiles_played(reply))
+            if player == 0:
+                equity += score
+            else:
+                equity -= score
+    finally:
+        for i in range(made):
+            board.unmake_move()
+
+    return equity
+
+
+# the MoveFinder and scratch (see make_scratch) each worker process uses,
+# made by initialize_worker
+worker_move_finder = None
+worker_scratch = None
+
+
+def initialize_worker(word_list):
+    """Loads the lexicon in a worker process (from its cache)."""
+    global worker_move_finder, worker_scratch
+    worker_move_finder = AnchorMoveFinder(
+        lexicon_module.get_lexicon(word_list))
+    worker_scratch = make_scratch()
+
+
+def run_iterations(board, rack, unseen, move, plies, seed, iterations,
+                   opponent_racks=None):
+    """Runs the given iteration numbers in a worker; returns the equities."""
+    return [simulate_iteration(worker_move_finder, board, rack, unseen, move,
+                               plies, seed, iteration, opponent_racks,
+                               worker_scratch)
+            for iteration in iterations]
+
+
+class CandidateResult:
+    """The running statistics of one candidate move in a simulation."""
+
+    def __init__(self, move, score):
+        self.__move = move
+        self.__score = score
+        self.__count = 0
+        self.__mean = 0.0
+        self.__squares = 0.0  # sum of squared differences from the mean
+        self.__pruned = False
+
+    def add(self, equity):
+        """Adds the equity of one iteration (Welford's method)."""
+        self.__count += 1
+        difference = equity - self.__mean
+        self.__mean += difference / self.__count
+        self.__squares += difference * (equity - self.__mean)
+
+    def prune(self):
+        """Marks the candidate as no longer worth simulating."""
+        self.__pruned = True
+
+    def get_move(self):
+        return self.__move
+
+    def get_score(self):
+        """Returns the score of the candidate itself."""
+        return self.__score
+
+    def get_iterations(self):
+        return self.__count
+
+    def get_mean(self):
+        """Returns the mean equity over every iteration so far."""
+        return self.__mean
+
+    def get_stdev(self):
+        """Returns the sample standard deviation of the equities."""
+        if self.__count < 2:
+            return 0.0
+        return math.sqrt(self.__squares / (self.__count - 1))
+
+    def get_standard_error(self):
+        """Returns the standard error of the mean."""
+        if self.__count < 2:
+            return float("inf")
+        return self.get_stdev() / math.sqrt(self.__count)
+
+    def is_pruned(self):
+        return self.__pruned
+
+    def __str__(self):
+        move = "pass" if self.__move is PASS else str(self.__move)
+        return "{} {:+.2f} (sd {:.2f}, {} iterations{})".format(
+            move, self.__mean, self.get_stdev(), self.__count,
+            ", pruned" if self.__pruned else "")
+
+    def __repr__(self):
+        return str(self)
+
+
+class Simulator:
+    """
+    A class that ranks candidate moves by simulation. Use it as a context
+    manager, or call close, to shut its processes down.
+    """
+
+    def __init__(self, word_list=lexicon_module.DEFAULT_WORD_LIST, plies=2,
+                 processes=None, seed=0, round_size=16, prune_margin=3.0):
+        """
+        word_list is the word list every process loads its Lexicon from,
+        plies is how many turns are played after the candidate, processes
+        is the number of worker processes (None for one per CPU, 0 to run
+        everything in this process), round_size is how many iterations each
+        candidate gets between pruning checks and prune_margin is how many
+        standard errors a candidate must be behind the best to be pruned.
+        """
+        self.__word_list = word_list
+        self.__plies = plies
+        self.__seed = seed
+        self.__round_size = round_size
+        self.__prune_margin = prune_margin
+        self.__move_finder = AnchorMoveFinder(
+            lexicon_module.get_lexicon(word_list))
+        self.__scratch = make_scratch()
+        if processes == 0:
+            self.__pool = None
+        else:
+            self.__pool = ProcessPoolExecutor(
+                processes, initializer=initialize_worker,
+                initargs=(word_list,))
+
+    def close(self):
+        """Shuts the worker processes down."""
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def candidates(self, board, rack, count=10):
+        """Returns the count top scoring moves with the rack, and a pass."""
+        moves = self.__move_finder.find_all_moves(rack, board)
+        moves.sort(key=lambda move: board.score_move(move, False),
+                   reverse=True)
+        return moves[:count] + [PASS]
+
+    def simulate(self, board, rack, unseen, candidates=None, iterations=200,
+                 opponent_racks=None):
+        """
+        Simulates every candidate move (PASS for passing; by default the
+        top scoring moves) up to iterations times, for the player holding
+        rack (see rack_string) when the tiles in unseen (a string like the
+        "Unseen:" line of a Quackle position, which includes the opponent's
+        rack) are not on the board. opponent_racks is an optional
+        RackDistribution of what the opponent kept (see inference). Returns
+        a list of CandidateResults, best mean equity first.
+        """
+        rack = rack_string(rack)
+        unseen = rack_string(unseen)
+        if candidates is None:
+            candidates = self.candidates(board, rack)
+        rack = Rack(rack)
+        unseen = Bag.from_string(unseen)
+
+        results = [CandidateResult(move, 0 if move is PASS
+                                   else board.score_move(move))
+                   for move in candidates]
+
+        done = 0
+        while done < iterations:
+            alive = [result for result in results if not result.is_pruned()]
+            if len(alive) < 2 and done > 0:
+                break
+            batch = range(done, min(done + self.__round_size, iterations))
+
+            if self.__pool is None:
+                for result in alive:
+                    for iteration in batch:
+                        result.add(simulate_iteration(
+                            self.__move_finder, board, rack, unseen,
+                            result.get_move(), self.__plies, self.__seed,
+                            iteration, opponent_racks, self.__scratch))
+            else:
+                futures = [(result, self.__pool.submit(
+                    run_iterations, board, rack, unseen, result.get_move(),
+                    self.__plies, self.__seed, list(batch), opponent_racks))
+                    for result in alive]
+                for result, future in futures:
+                    for equity in future.result():
+                        result.add(equity)
+
+            done = batch.stop
+            self.__prune(alive)
+
+        results.sort(key=lambda result: result.get_mean(), reverse=True)
+        return results
+
+    def __prune(self, alive):
+        """Prunes every candidate that is clearly worse than the best."""
+        best = max(alive, key=lambda result: result.get_mean())
+        for result in alive:
+            if result is best:
+                continue
+            margin = self.__prune_margin * math.hypot(
+                result.get_standard_error(), best.get_standard_error())
+            if result.get_mean() + margin < best.get_mean():
+                result.prune()
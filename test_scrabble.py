@@ -1,53 +1,836 @@
 """
 This file defines some convenience functions that may be moved to the board
 file or some other file and provides a harness for testing Scrabble.
-Intended to be run as a file in the interpreter
+Intended to be run as a file in the interpreter, or with pytest, which
+runs the test_ functions.
 """
 
 from board import *
 from constants import *
 from coordinate import *
 from move import Move
-import squarebysquaremovefinder
 from tile import *
 
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+from itertools import combinations_with_replacement
 
+from anchormovefinder import AnchorMoveFinder
+from bag import (Bag, FULL_BAG_COUNTS, NUMBER_OF_TILE_TYPES, Rack, TILE_INDEX,
+                 rack_after_move, rack_value)
+from dawg import Dawg
+from endgame import EndgameSolver
+from inference import RackInferrer
+from simulation import Simulator
+import benchmark
+import bulk_anagram
+import consistency
+import exchange
+import game
+import gcg
+import instrument
+import layout as layout_module
+import leaves
+import lexicon as lexicon_module
+import openings
+import quackle
+import querycache
+import server as server_module
+import wordtools
 
 
 def play_word(board, wordstring, wordcoord="8H"):
     """Convenience function that takes a given Board, a given string that is
-    the word to play, and a string for the coordinate, and returns the score."""
+    the word to play, and a string for the coordinate, and returns the
+    score."""
     move = Move(wordstring, wordcoord)
     score = board.play_move(move)
     print("{} was played for {} points".format(move, score))
 
-b = Board()
-c = Coordinate.initialize_from_string("9G")
-init = Coordinate.initialize_from_string
-
-test_board = 0
-test_move_finder = 1
-
-if test_board:
-    play_word(b, "HARPING")
-    play_word(b, "ZAX", "9G")
-    play_word(b, "SEQUINS", "10H")
-    play_word(b, "GARNETS", "11C")
-    play_word(b, "(N)ATURE", "M10")
-
-    print("The board after these plays:\n")
-    print(b)
-
-if test_move_finder:
-    s = squarebysquaremovefinder
-    play_word(b, "MANTEAU", "H8")
-    word = "PORTMANTEAUX"
-    row = (
-            [[Tile(x) for x in word]] * 7 +
-            [Tile(x) for x in "MANTEAU"] +
-            [[Tile(x) for x in word]] * 1
-            )
-    index = 7
-    col = 3
-    print('\n'.join([str(x) for x in row]))
-    print(s.create_move(word, index, col, row, b))
+
+def write_words(directory, words):
+    """Writes a word list file in the directory and returns its name."""
+    filename = os.path.join(directory, "words.txt")
+    with open(filename, "w") as file:
+        file.write("\n".join(words) + "\n")
+    return filename
+
+
+def test_lexicon():
+    lexicon = lexicon_module.Lexicon(["cat", "ACT", "CART", "AT"])
+    assert len(lexicon) == 4
+    assert "CAT" in lexicon and lexicon.check_validity("act")
+    assert sorted(lexicon.anagram_without_blanks("TCA")) == ["ACT", "CAT"]
+    assert lexicon.front_hooks("AT") == "C"
+    assert lexicon.back_hooks("CAR") == "T"
+    assert "CART" in lexicon.get_dawg()
+
+
+def test_cached_lexicon():
+    with tempfile.TemporaryDirectory() as directory:
+        word_list = write_words(directory, ["CAT", "ACT", "DOG"])
+        compiled = lexicon_module.load_lexicon(word_list)
+        cached = lexicon_module.cache_filename(word_list,
+                                               compiled.get_source_hash())
+        assert os.path.exists(cached)
+        loaded = lexicon_module.load_lexicon(word_list)
+        assert loaded.get_words() == compiled.get_words()
+
+        write_words(directory, ["CAT", "DOG"])  # a new version
+        changed = lexicon_module.load_lexicon(word_list)
+        assert "ACT" not in changed
+        assert not os.path.exists(cached)  # the old cache is gone
+
+
+def test_dawg_add_and_remove():
+    lexicon = lexicon_module.load_lexicon("OWL2.txt")
+    words = sorted(lexicon.get_words())[:3000]
+    generator = random.Random(0)
+    added = generator.sample(words, 300)
+    removed = generator.sample(words, 300)
+
+    dawg = Dawg.from_words(sorted(set(words) - set(added)))
+    for word in added:
+        dawg.add(word)
+    for word in removed:
+        dawg.remove(word)
+    fresh = Dawg.from_words(sorted(set(words) - set(removed)))
+    assert list(dawg.words()) == list(fresh.words())
+    assert len(dawg) == len(fresh)
+
+
+def test_update_lexicon():
+    with tempfile.TemporaryDirectory() as directory:
+        word_list = write_words(directory, ["CAT", "ACT", "DOG"])
+        lexicon = lexicon_module.update_lexicon(word_list, added=["TAC"],
+                                                removed=["DOG", "COW"])
+        assert sorted(lexicon.anagram_without_blanks("CAT")) == \
+            ["ACT", "CAT", "TAC"]
+        assert "DOG" not in lexicon and "DOG" not in lexicon.get_dawg()
+        assert lexicon.get_revision() == 1
+        reloaded = lexicon_module.load_lexicon(word_list)
+        assert reloaded.get_words() == {"CAT", "ACT", "TAC"}
+
+
+def test_shared_lexicons():
+    with tempfile.TemporaryDirectory() as directory:
+        word_list = write_words(directory, ["CAT", "ACT", "CATS"])
+        small = lexicon_module.get_lexicon(word_list)
+        assert lexicon_module.get_lexicon(word_list) is small
+        assert small is not lexicon_module.get_default_lexicon()
+        assert sorted(wordtools.anagram("TCA", small)) == ["ACT", "CAT"]
+        assert wordtools.back_hooks("CAT", small) == ["CATS"]
+        assert len(wordtools.anagram("AEINRST")) > 1  # the default lexicon
+
+
+def test_zobrist_hash():
+    b = Board()
+    assert b.zobrist_hash() == 0
+    b.add_move(Move("HARPING", "8H"))
+    b.add_move(Move("ZA", "9G"))
+    other = Board()
+    other.add_move(Move("ZA", "9G"))
+    other.add_move(Move("HARPING", "8H"))
+    assert b.zobrist_hash() == other.zobrist_hash() != 0
+    b.remove_move(Move("ZA", "9G"))
+    b.remove_move(Move("HARPING", "8H"))
+    assert b.zobrist_hash() == 0
+
+
+def harping_board():
+    """Returns a Board with HARPING played across the center."""
+    b = Board()
+    b.add_move(Move("HARPING", "8H"))
+    return b
+
+
+def test_score_move():
+    assert Board().score_move(Move("HARPING", "8H")) == 78  # with a bingo
+    b = harping_board()
+    across = Move("ZA", "9G")  # on a double letter square
+    assert b.count_move(across) == 21
+    assert b.score_move(across) == 26  # and HA down
+    down = Move("(G)OD", "N8")  # on a triple letter square
+    assert b.count_move(down) == 9
+    assert b.score_move(down) == 9
+
+
+def test_make_and_unmake_move():
+    b = harping_board()
+    lexicon = lexicon_module.get_default_lexicon()
+    for index in range(15):
+        b.get_cross_checks(lexicon, HORIZONTAL, index)
+        b.get_cross_checks(lexicon, VERTICAL, index)
+    before = str(b)
+    hash_before = b.zobrist_hash()
+    caches = {(direction, index): b.get_line_cache(direction, index)
+              for direction in (HORIZONTAL, VERTICAL) for index in range(15)}
+
+    for move in (Move("ZA", "9G"), Move("(G)OD", "N8")):
+        assert b.make_move(move) == harping_board().score_move(move)
+        assert b.zobrist_hash() != hash_before
+        b.unmake_move()
+        assert str(b) == before
+        assert b.zobrist_hash() == hash_before
+        assert all(b.get_line_cache(direction, index) is cache
+                   for (direction, index), cache in caches.items())
+    assert b.get_undo_depth() == 0
+
+
+def test_anchor_move_finder():
+    finder = AnchorMoveFinder(lexicon_module.get_default_lexicon())
+    moves = [str(move) for move in finder.find_all_moves("RE", Board())]
+    assert sorted(moves) == ["8G ER", "8G RE", "8H ER", "8H RE",
+                             "H7 ER", "H7 RE", "H8 ER", "H8 RE"]
+    moves = finder.find_all_moves("S", harping_board())
+    assert "8H (HARPING)S" in [str(move) for move in moves]
+
+
+def test_endgame():
+    # HARPINGS goes out for 42, plus twice the 20 points of QZ
+    solver = EndgameSolver(AnchorMoveFinder(
+        lexicon_module.get_default_lexicon()))
+    result = solver.solve(harping_board(), "S", "QZ", time_limit=None)
+    assert result.is_exact()
+    assert result.get_value() == 82
+    assert str(result.get_best_move()) == "8H (HARPING)S"
+
+
+def test_simulation():
+    b = harping_board()
+    hash_before = b.zobrist_hash()
+    candidates = [Move("ZA", "9G"), Move("(G)OD", "N8")]
+    unseen = "AAEEIILNORSTTUDGBCMPQ"
+    runs = []
+    for i in range(2):
+        with Simulator(plies=1, processes=0, seed=1) as simulator:
+            results = simulator.simulate(b, "ADEORZ", unseen, candidates,
+                                         iterations=6)
+        runs.append([(str(result.get_move()), result.get_mean())
+                     for result in results])
+    assert runs[0] == runs[1]  # the same seed gives the same result
+    assert sorted(move for move, mean in runs[0]) == ["9G ZA", "N8 (G)OD"]
+    assert runs[0][0][1] >= runs[0][1][1]
+    assert b.zobrist_hash() == hash_before
+
+
+def test_bag_draw_and_put_back():
+    bag = Bag()
+    generator = random.Random(0)
+    total = sum(FULL_BAG_COUNTS)
+    drawn = [bag.draw(generator) for i in range(10)]
+    assert len(bag) == total - 10
+    for index in set(drawn):
+        assert bag.get_counts()[index] == \
+            FULL_BAG_COUNTS[index] - drawn.count(index)
+    for index in drawn:
+        bag.put_back(index)
+    assert len(bag) == total
+    assert bag.get_counts() == list(FULL_BAG_COUNTS)
+
+
+def test_rack():
+    rack = Rack("SATIRE?")
+    rack.remove_letters("S?")
+    assert str(rack) == "AEIRT" and len(rack) == 5
+    bag = Bag.from_string("AB")
+    bag.fill(rack, random.Random(0))
+    assert len(rack) == 7 and len(bag) == 0
+    assert "B" in rack
+
+
+def test_leave_ranks():
+    # every leave of each size ranks to exactly its part of the table
+    for size in range(5):
+        ranks = [leaves.rank_indices(indices) for indices in
+                 combinations_with_replacement(range(27), size)]
+        assert sorted(ranks) == list(range(leaves.SIZE_OFFSETS[size],
+                                           leaves.SIZE_OFFSETS[size + 1]))
+    size = leaves.MAX_LEAVE_SIZE
+    assert leaves.rank_indices((0,) * size) == leaves.SIZE_OFFSETS[size]
+    assert leaves.rank_indices((26,) * size) == leaves.TABLE_SIZE - 1
+    assert leaves.rank_letters("SE") == leaves.rank_letters("ES")
+
+
+def test_infer_leave():
+    # the opponent played HARP from HARP plus three of EQSZ
+    with RackInferrer(processes=0) as inferrer:
+        racks = inferrer.infer(Board(), Move("HARP", "8H"), "EQSZ")
+    assert sorted(racks.get_leaves()) == ["EQS", "EQZ", "ESZ", "QSZ"]
+    assert abs(sum(racks.get_probabilities()) - 1) < 1e-9
+
+
+def read_test_board():
+    """Returns the Board in test-board.txt."""
+    return quackle.read_position("test-board.txt").get_board()
+
+
+def test_parse_position():
+    position = quackle.read_position("test-board.txt")
+    assert position.get_players() == [("New Player 1", 151),
+                                      ("Quackle", 123)]
+    assert position.get_player_to_move() == "New Player 1"
+    assert position.get_rack() == "EELPRST"
+    assert len(position.get_unseen()) == 58
+    b = position.get_board()
+    assert str(b.get_tile(Coordinate.initialize_from_string("8E"))) == "D"
+    assert b.get_tile(Coordinate.initialize_from_string("15O")) is None
+
+
+def test_score_test_board():
+    b = read_test_board()
+    across = Move("STEEP(ED)", "5A")  # E5 is a double word square
+    assert b.count_move(across) == 20
+    assert b.score_move(across) == 34  # and PEND down
+    down = Move("TR(END)", "E4")
+    assert b.count_move(down) == 12
+    assert b.score_move(down) == 27  # and THIS and RED across
+
+
+def test_analyze_positions():
+    output = io.StringIO()
+    count = quackle.analyze_positions(["test-board.txt", "test-board2.txt"],
+                                      output, processes=1, top=3)
+    assert count == 2
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [result["rack"] for result in results] == ["EELPRST", "CDDILOP"]
+    best = results[0]["best"]
+    assert len(best) == 3
+    assert best[0]["move"] == "E1 RESPL(END)E(N)T"
+    assert best[0]["equity"] >= best[1]["equity"] >= best[2]["equity"]
+
+
+GAME = """#player1 alice Alice
+#player2 bob Bob
+>alice: AGHINPR 8H HARPING +78 78
+>bob: ADEORZ? 9G ZA +26 26
+>alice: DGOQSTU N8 .OD +9 87
+>bob: DEORXY? H8 ..X +13 39
+>bob: DEORXY? -- -13 26
+>alice: DGQSTUU -  +0 87
+"""
+
+
+def test_replay_gcg():
+    players = {}
+    scores = [score for board, turn, move, score in
+              gcg.replay(GAME.splitlines(), players)]
+    assert players == {"alice": "Alice", "bob": "Bob"}
+    assert scores == [78, 26, 9, 13, None, None]
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "game.gcg"), "w") as file:
+            file.write(GAME)
+        summaries = list(gcg.check_games([directory], processes=0))
+    assert len(summaries) == 1
+    assert summaries[0]["mismatches"] == []
+    assert summaries[0]["moves"] == 4 and summaries[0]["bingos"] == 1
+    assert gcg.aggregate(summaries)["points"] == 126
+
+
+def test_self_play():
+    reports = [game.play_games("greedy", "equity", games=1, seed=3,
+                               processes=0) for i in range(2)]
+    for report in reports:
+        assert report["games"] == 1 and report["moves"] > 0
+        assert sum(statistics["games"] for statistics in
+                   report["strategies"].values()) == 2
+    assert reports[0]["strategies"] == reports[1]["strategies"]
+
+
+def test_check_move():
+    b = read_test_board()
+    lexicon = lexicon_module.get_default_lexicon()
+    reasons = {
+        ("PESTLE", "1K"): "runs off the board",
+        ("(HOS)", "1F"): "plays no tiles",
+        ("(E)ST", "1A"): "no tile on the board at 1A",
+        ("(T)O", "1F"): "H is on the board, not T",
+        ("TO", "1F"): "a tile is already at 1F",
+        ("PEST", "13A"): "does not touch any tile on the board",
+        ("PEST", "11A"): "bad cross word with E",
+        ("STEEP(ED)", "5A"): None,
+        ("TR(END)", "E4"): None,
+    }
+    for (word, coordinate), reason in reasons.items():
+        assert b.check_move(Move(word, coordinate), lexicon) == reason
+
+    empty = Board()
+    reasons = {
+        ("PEST", "1A"): "the first move must cover the center square",
+        ("A", "8H"): "makes no word of two letters or more",
+        ("QQ", "8H"): "QQ is not a word",
+        ("PEST", "8H"): None,
+    }
+    for (word, coordinate), reason in reasons.items():
+        assert empty.check_move(Move(word, coordinate), lexicon) == reason
+
+
+def test_find_placements():
+    finder = AnchorMoveFinder(lexicon_module.get_default_lexicon())
+    b = harping_board()
+    lexicon = lexicon_module.get_default_lexicon()
+    placements = finder.find_placements("za", b)
+    scores = [score for score, move in placements]
+    assert scores == sorted(scores, reverse=True)
+    assert (26, "9G ZA") in [(score, str(move))
+                             for score, move in placements]
+    for score, move in placements:
+        assert b.check_move(move, lexicon) is None
+        assert b.score_move(move) == score
+    # with a blank for the Z, the best place scores less
+    assert finder.find_placements("ZA", b, "A?")[0][0] < scores[0]
+    assert finder.find_placements("ZA", b, "QI") == []
+    assert finder.find_placements("AZZ", b) == []
+
+
+def test_compare_benchmarks():
+    baseline = {"results": {"anagram": {"median": 0.002},
+                            "hooks": {"median": 0.001},
+                            "removed": {"median": 0.5},
+                            "new": {"median": 0.0}}}
+    report = {"results": {"anagram": {"median": 0.003},
+                          "hooks": {"median": 0.00105},
+                          "new": {"median": 0.1}}}
+    comparison = {name: (round(ratio, 2), regressed) for name, ratio,
+                  regressed in benchmark.compare(report, baseline, 0.1)}
+    assert comparison == {"anagram": (1.5, True), "hooks": (1.05, False)}
+    assert benchmark.format_seconds(0.0025) == "2.5ms"
+
+
+def test_profile():
+    finder = AnchorMoveFinder(lexicon_module.get_default_lexicon())
+    b = harping_board()
+    assert not instrument.enabled
+    with instrument.profile() as recorded:
+        moves = finder.find_all_moves("ZADEORS", b)
+        b.score_move(moves[0])
+    assert not instrument.enabled
+    counters = recorded["counters"]
+    assert counters["anchormovefinder.moves"] == len(moves)
+    assert counters["anchormovefinder.anchors"] > 0
+    assert counters["board.score_move"] >= 1
+    timer = recorded["timers"]["anchormovefinder.find_all_moves"]
+    assert timer["calls"] == 1
+    assert 0 < timer["seconds"] <= recorded["seconds"]
+
+    # nothing is recorded with instrumentation off
+    before = instrument.snapshot()
+    finder.find_all_moves("ZADEORS", b)
+    assert instrument.snapshot() == before
+
+
+def test_query_cache_eviction():
+    cache = querycache.QueryCache(max_entries=2)
+    cache.put("a", ["AA"])
+    cache.put("b", ["BA"])
+    assert cache.get("a") == ["AA"]  # "b" is now least recently used
+    cache.put("c", ["CH"])
+    assert cache.get("b") is None
+    assert cache.get("a") == ["AA"] and cache.get("c") == ["CH"]
+    statistics = cache.statistics()
+    assert (statistics["hits"], statistics["misses"],
+            statistics["evictions"], statistics["entries"]) == (3, 1, 1, 2)
+
+    size = querycache.result_size(["AA"])
+    cache = querycache.QueryCache(max_entries=10, max_bytes=2 * size)
+    for key in "abc":
+        cache.put(key, [key.upper() * 2])
+    assert len(cache) == 2 and cache.get("a") is None
+    assert cache.statistics()["bytes"] == 2 * size
+    cache.set_limits(10, size)
+    assert len(cache) == 1 and cache.get("c") == ["CC"]
+
+
+def test_query_cache_invalidation():
+    small = lexicon_module.Lexicon(["CAT", "ACT"])
+    assert wordtools.anagram("TAC", small) == ["ACT", "CAT"]
+    assert wordtools.anagram("CTA", small) == ["ACT", "CAT"]
+    assert querycache.statistics(small)["hits"] == 1
+    small.apply_delta(added=["TAC"])
+    assert querycache.statistics(small)["entries"] == 0
+    assert wordtools.anagram("TAC", small) == ["ACT", "CAT", "TAC"]
+
+
+async def http_request(port, request):
+    """Sends the raw request to the server and returns (status, JSON)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def query_server(*requests):
+    """
+    Starts a Server on a loopback port and returns the (status, JSON) of
+    each raw request, all sent at once.
+    """
+    async def run():
+        with server_module.Server(processes=0) as server:
+            listener = await server.start("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                return await asyncio.gather(*(http_request(port, request)
+                                              for request in requests))
+    return asyncio.run(run())
+
+
+def get(target):
+    return "GET {} HTTP/1.1\r\nConnection: close\r\n\r\n".format(
+        target).encode()
+
+
+def test_server():
+    with open("test-board.txt", "rb") as file:
+        text = file.read()
+    score = ("POST /score?move=STEEP(ED)&coord=5A HTTP/1.1\r\n"
+             "Content-Length: {}\r\nConnection: close\r\n\r\n".format(
+                 len(text)).encode() + text)
+    responses = query_server(get("/anagram?rack=TCA"),
+                             get("/anagram?rack=ACT"),
+                             get("/hooks?word=AT"),
+                             get("/valid?word=QI&word=QZ"),
+                             get("/nothing"), score)
+    assert responses == [
+        (200, ["ACT", "CAT"]),
+        (200, ["ACT", "CAT"]),
+        (200, wordtools_hooks("AT")),
+        (200, {"QI": True, "QZ": False}),
+        (404, {"error": "no endpoint nothing"}),
+        (200, {"move": "5A STEEP(ED)", "legal": True, "score": 34}),
+    ]
+
+
+def wordtools_hooks(word):
+    lexicon = lexicon_module.get_default_lexicon()
+    return {"front": wordtools.front_hooks(word, lexicon),
+            "back": wordtools.back_hooks(word, lexicon)}
+
+
+def test_anagram_racks():
+    lexicon = lexicon_module.get_default_lexicon()
+    racks = ["AEINRST", "tsaeinr", "QZ", "AEINR??", "CAT?"]
+    results = list(bulk_anagram.anagram_racks(racks, lexicon,
+                                              chunk_size=2))
+    assert [rack for rack, words in results] == racks
+    for rack, words in results:
+        assert words == sorted(set(wordtools.anagram(rack.upper(), lexicon)))
+    assert results[0][1] == results[1][1] and results[2][1] == []
+    try:
+        list(bulk_anagram.anagram_racks(["CAT1"], lexicon))
+        assert False, "anagram_racks should refuse a bad tile"
+    except ValueError:
+        pass
+
+
+def test_opening_ranks():
+    # racks of the first few tile types rank to the start of the table
+    ranks = [openings.rank_indices(indices) for indices in
+             combinations_with_replacement(range(6), openings.RACK_SIZE)]
+    assert sorted(ranks) == list(range(len(ranks)))
+    assert openings.rank_indices((NUMBER_OF_TILE_TYPES - 1,) *
+                                 openings.RACK_SIZE) == \
+        openings.TABLE_SIZE - 1
+
+
+def test_best_opening():
+    words = ["QI", "ZA", "ZAX", "AX", "XI", "AXE", "ZEE", "QAT"]
+    word_index = openings.make_word_index(words)
+    finder = AnchorMoveFinder(lexicon_module.Lexicon(words))
+    for rack in ("QIZAXEE", "AEEIQX?", "BBCCDDF"):
+        indices = sorted(TILE_INDEX[letter] for letter in rack)
+        best = openings.best_opening(indices, word_index)
+        moves = finder.find_all_moves(rack, Board())
+        if not moves:
+            assert best is None
+            continue
+        top = max(Board().score_move(move) for move in moves)
+        equity, score, column, word = best
+        assert equity == score == top
+        move = Move(word, Coordinate(column, 7, HORIZONTAL))
+        assert Board().score_move(move) == top
+
+
+def test_layout_scoring():
+    corner = layout_module.SYMBOLS['~']
+    quadrant = [[layout_module.SYMBOLS['.']] * 9 for row in range(9)]
+    quadrant[0][0] = corner
+    quadrant[8][8] = layout_module.SYMBOLS['-']
+    big = layout_module.BoardLayout("big", layout_module.mirrored(quadrant))
+    assert big.get_size() == 17 and big.get_center() == 8
+    assert big.get_bonus(16, 16) == corner
+    assert layout_module.parse_layout(big.to_text(), "big") == big
+
+    b = Board(big)
+    assert b.score_move(Move("ZA", "17P", 17)) == 44  # A on the corner
+    assert b.score_move(Move("ZA", "Q16", 17)) == 44
+    assert b.score_move(Move("CAT", "9H", 17)) == 10  # T on the center
+    b.play_move(Move("CAT", "9H", 17))
+    assert str(b.get_tile(Coordinate.initialize_from_string("9J", 17))) == \
+        "T"
+
+    standard = layout_module.get_layout("standard")
+    assert standard == layout_module.STANDARD
+    assert [list(row) for row in standard.get_bonuses()] == \
+        [list(row) for row in BOARD_LAYOUT]
+    try:
+        layout_module.parse_layout("..\n..\n")
+        assert False, "an even layout has no center square"
+    except ValueError:
+        pass
+
+
+def test_consistency():
+    report = consistency.check_consistency(
+        "anchormovefinder.AnchorMoveFinder", positions=2, processes=0,
+        max_turns=3)
+    assert report["positions"] == 2 and report["moves"] > 0
+    assert report["mismatched"] == []
+    try:
+        consistency.check_consistency("anchormovefinder.Nothing")
+        assert False, "check_consistency should refuse a missing finder"
+    except ValueError:
+        pass
+
+
+def test_evaluate_exchanges():
+    table = leaves.load_leave_table()
+    rack = "UUUVVWW"
+    unseen = list(FULL_BAG_COUNTS)
+    for letter in rack:
+        unseen[TILE_INDEX[letter]] -= 1
+
+    options = exchange.evaluate_exchanges(rack, unseen, table)
+    assert len(options) == 4 * 3 * 3  # every distinct keep, passing too
+    equities = [option.get_equity() for option in options]
+    assert equities == sorted(equities, reverse=True)
+    assert not options[0].is_pass()
+    assert exchange.best_exchange(rack, unseen, table).get_keep() == \
+        options[0].get_keep()
+    assert list(map(repr, exchange.evaluate_exchanges(
+        rack, unseen, table))) == list(map(repr, options))
+
+    passing = exchange.evaluate_exchanges(rack, unseen, table,
+                                          can_exchange=False)
+    assert len(passing) == 1 and passing[0].is_pass()
+    assert passing[0].get_keep() == rack
+    assert exchange.best_exchange(rack, "AEIOUAEIOUAE", table) is None
+
+
+def test_apply_diff():
+    b = read_test_board()
+    for start in (Board(), read_test_board()):
+        start.add_move(Move("PEST", "13A"))
+        start.apply_delta(start.diff(b))
+        assert start == b
+        assert str(start) == str(b)
+        assert start.zobrist_hash() == b.zobrist_hash()
+
+
+def test_change_tiles_with_moves_to_unmake():
+    b = harping_board()
+    b.make_move(Move("ZA", "9G"))
+    try:
+        b.add_tile(Tile('A'), Coordinate.initialize_from_string("15A"))
+        assert False, "add_tile should refuse"
+    except ValueError:
+        pass
+    b.unmake_move()
+    b.add_tile(Tile('A'), Coordinate.initialize_from_string("15A"))
+
+
+def test_score_move_checks_fit():
+    b = Board()
+    b.add_move(Move("MANTEAU", "H8"))
+    for move in (Move("ZZZ", "H8"), Move("ZZZ", "8N"), Move("(Z)A", "8A"),
+                 Move("MANTEAUS", "H8")):
+        try:
+            b.score_move(move)
+            assert False, "score_move should refuse {}".format(move)
+        except ValueError:
+            pass
+    assert b.score_move(Move("MANTEAU", "H8")) == 70  # already on the board
+    assert b.score_move(Move("(MANTEAU)S", "H8")) == 30  # S on 15H
+
+
+def test_endgame_reuses_table():
+    solver = EndgameSolver(AnchorMoveFinder(
+        lexicon_module.get_default_lexicon()))
+    for i in range(2):  # the second search is answered from the table
+        result = solver.solve(harping_board(), "S", "QZ", time_limit=None,
+                              max_depth=1)
+        assert not result.is_exact()
+        assert result.get_value() == 82
+
+
+def test_rack_copy_from():
+    rack = Rack("AB")
+    rack.copy_from(Rack("QUIZ"))
+    assert str(rack) == "IQUZ" and len(rack) == 4
+    assert rack == Rack("ZIQU")
+
+
+def test_server_bad_content_length():
+    for length in ("x", "-5"):
+        request = ("POST /score?move=PEST&coord=8H HTTP/1.1\r\n"
+                   "Content-Length: {}\r\n\r\n".format(length)).encode()
+        assert query_server(request) == [(400,
+                                          {"error": "bad Content-Length"})]
+
+
+def test_batcher_fails_only_bad_queries():
+    async def halve(numbers):
+        return [number // 2 if number % 2 == 0 else ValueError(number)
+                for number in numbers]
+
+    async def run():
+        batcher = server_module.Batcher(halve)
+        even = asyncio.ensure_future(batcher.submit(4))
+        odd = asyncio.ensure_future(batcher.submit(3))
+        await asyncio.wait([even, odd])
+        return even.result(), odd.exception(), batcher.statistics()
+
+    even, error, statistics = asyncio.run(run())
+    assert statistics["batches"] == 1
+    assert even == 2 and isinstance(error, ValueError)
+
+
+def test_server_bad_queries():
+    with open("test-board.txt", "rb") as file:
+        text = file.read()
+    best_moves = ("POST /best-moves?rack=AB1 HTTP/1.1\r\nContent-Length: "
+                  "{}\r\nConnection: close\r\n\r\n".format(
+                      len(text)).encode() + text)
+    responses = query_server(get("/pattern?pattern=C%3FR*S"),
+                             get("/pattern?pattern=C(R"),
+                             get("/anagram?rack=C1T"), best_moves)
+    assert responses[0] == (200, wordtools.pattern_match("C?R*S"))
+    assert [status for status, result in responses] == [200, 400, 400, 400]
+
+
+class PhonyMoveFinder(AnchorMoveFinder):
+    """An AnchorMoveFinder that finds as many phonies as moves."""
+
+    def find_all_moves(self, tiles, board):
+        moves = super().find_all_moves(tiles, board)
+        return moves + [Move("QQ", "8H")] * len(moves)
+
+
+def test_positions_have_legal_moves_only():
+    finder = PhonyMoveFinder(lexicon_module.get_default_lexicon())
+    for number in range(4):
+        b, rack = consistency.random_position(finder, 0, number, 4)
+        letters = [str(b.get_tile(Coordinate(col, row, HORIZONTAL)))
+                   for row in range(b.get_size())
+                   for col in range(b.get_size())]
+        assert letters.count("Q") <= 1
+
+
+
+def test_get_layout_from_file():
+    assert list(layout_module.LAYOUTS) == ["standard"]
+    text = "~.~\n.-.\n~.=\n"
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "tiny.txt")
+        with open(filename, "w") as file:
+            file.write(text)
+        tiny = layout_module.get_layout(filename)
+    assert tiny.get_name() == filename and tiny.to_text() == text
+    b = Board(tiny)
+    assert b.get_row_tiles(2) == [None] * 3
+    assert b.score_move(Move("ZA", "3B", 3)) == 33  # A on the =
+
+
+def test_rack_after_move():
+    move = Move("ZeBRAS", "8H")  # the E is a blank
+    assert rack_after_move("ABRSZ?X", move) == "X"
+    assert rack_value("ABRSZ?X") == 1 + 3 + 1 + 1 + 10 + 0 + 8
+
+
+def test_endgame_horizon_estimate():
+    # one turn deep, each move is valued as if the game ended after it
+    finder = AnchorMoveFinder(lexicon_module.get_default_lexicon())
+    b = harping_board()
+    best = None
+    for move in finder.find_all_moves("QZ", b):
+        left = rack_after_move("QZ", move)
+        value = b.score_move(move) + (2 * rack_value("S") if not left else
+                                      rack_value("S") - rack_value(left))
+        if best is None or value > best:
+            best = value
+    result = EndgameSolver(finder).solve(b, "QZ", "S", time_limit=None,
+                                         max_depth=1)
+    assert not result.is_exact()
+    assert result.get_value() == best
+
+
+def test_parse_position_rows():
+    with open("test-board.txt") as file:
+        lines = file.read().splitlines()
+    rows = [index for index, line in enumerate(lines)
+            if quackle.GRID_LINE.match(line)]
+    repeated = list(lines)
+    repeated[rows[3]] = lines[rows[2]]  # row 3 twice and no row 4
+    missing = lines[:rows[5]] + lines[rows[5] + 1:]
+    extra = lines[:rows[-1] + 1] + [lines[rows[-1]].replace("15|", "16|")] \
+        + lines[rows[-1] + 1:]
+    for changed in (repeated, missing, extra):
+        try:
+            quackle.parse_position("\n".join(changed))
+            assert False, "parse_position should refuse the grid"
+        except ValueError:
+            pass
+
+def test_equity_strategy_values_moves_like_exchanges():
+    table = leaves.load_leave_table()
+    strategy = game.EquityStrategy(
+        AnchorMoveFinder(lexicon_module.get_default_lexicon()), table)
+    rack = "AAAOORS"
+    unseen = list(FULL_BAG_COUNTS)
+    for letter in rack:
+        unseen[TILE_INDEX[letter]] -= 1
+
+    kept_equity = {''.join(sorted(option.get_keep())): option.get_equity()
+                   for option in exchange.evaluate_exchanges(rack, unseen,
+                                                             table)}
+    board = Board()
+    # 8H OAR is worth less than the best exchange with its leave looked up
+    # in the table, but more once it's valued like the exchanges are
+    move = strategy.choose_move(board, rack, unseen)
+    assert not isinstance(move, exchange.ExchangeOption)
+    leave = ''.join(sorted(rack_after_move(rack, move)))
+    best = exchange.best_exchange(rack, unseen, table)
+    assert board.score_move(move) + table.value(leave) < best.get_equity()
+    assert board.score_move(move) + kept_equity[leave] > best.get_equity()
+
+
+
+if __name__ == "__main__":
+    b = Board()
+    c = Coordinate.initialize_from_string("9G")
+    init = Coordinate.initialize_from_string
+
+    test_board = 1
+    test_move_finder = 1
+
+    if test_board:
+        play_word(b, "HARPING")
+        play_word(b, "ZAX", "9G")
+        play_word(b, "SEQUINS", "10H")
+        play_word(b, "GARNETS", "11C")
+        play_word(b, "(N)ATURE", "M10")
+
+        print("The board after these plays:\n")
+        print(b)
+
+    if test_move_finder:
+        s = AnchorMoveFinder(lexicon_module.get_default_lexicon())
+        for move in s.find_all_moves("PORTX??", b)[:20]:
+            print(move.get_coord(), move, b.score_move(move))
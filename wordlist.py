@@ -3,28 +3,29 @@ This file provides an easy interface to a list of dictionary words and
 a tool for searching the dictionary with a regex and checking a word
 for inclusion in the dictionary. Note that because of copyright issues,
 the OWL2 is used.
-"""
 
-import os
-from re import findall
+The words come from a compiled Lexicon (see lexicon). Every function takes
+the Lexicon to use as an optional last argument; without it, the default
+lexicon (the OWL2) is used.
+"""
 
+import instrument
+import lexicon as lexicon_module
 
-FILENAME = "OWL2.txt"
 
-dictionary = open(FILENAME)
+FILENAME = lexicon_module.DEFAULT_WORD_LIST
 
-wordlist = []
-for word in dictionary:
-    wordlist.append(word.strip())
+wordlist = sorted(lexicon_module.get_lexicon(FILENAME).get_words())
 
 
-def check_validity(word):
-    return word.upper() in wordlist
+def check_validity(word, lexicon=None):
+    if instrument.enabled:
+        instrument.count("wordlist.check_validity")
+    return lexicon_module.choose_lexicon(lexicon).check_validity(word)
 
-dictionary.seek(0)
-dict_string = dictionary.read()
 
-def regex_search(regexp):
+@instrument.timed("wordlist.regex_search")
+def regex_search(regexp, lexicon=None):
     """Searches the dictionary for a particular regular
     expression, whole words only"""
-    return [w.strip() for w in findall('\n' + regexp + '\n', dict_string)]
+    return lexicon_module.choose_lexicon(lexicon).regex_search(regexp)
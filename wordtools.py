@@ -1,10 +1,21 @@
 """
 This class provides functions to work with strings that are oriented
 towards Scrabble: hooks, subanagrams, pattern matches, etc.
+
+Every function takes the Lexicon to search as an optional last argument
+(see lexicon); without it, the default lexicon (the OWL2) is used.
+
+The query functions remember their results for each lexicon (see
+querycache), so asking for the anagrams of a popular rack or the matches
+of a popular pattern again is a dictionary lookup.
 """
 
 import base_anagram
+import instrument
+import lexicon as lexicon_module
 import wordlist
+from querycache import cached_query, canonical_pattern, exact, \
+    sorted_letters
 from constants import ALPHABET
 
 
@@ -21,81 +32,97 @@ def powerset(lst):
         result.extend([subset + [x] for subset in result])
     return result
 
-def back_hooks(word):
+@cached_query(exact)
+def back_hooks(word, lexicon=None):
     """
     Returns a list of every word created by adding a letter after
     this one, e.g., "RATE" -> ["RATED", "RATEL", "RATER", "RATES"]
     """
+    if instrument.enabled:
+        instrument.count("wordtools.back_hooks")
     hooks = []
     if '?' in word:
         for letter in ALPHABET:
-            hooks += back_hooks(word.replace('?', letter, 1))
+            hooks += back_hooks(word.replace('?', letter, 1), lexicon)
     else:
-        for letter in ALPHABET:
-            if wordlist.check_validity(word + letter):
-                hooks.append(word + letter)
+        lexicon = lexicon_module.choose_lexicon(lexicon)
+        for letter in lexicon.back_hooks(word):
+            hooks.append(word + letter)
     return hooks
 
-def front_hooks(word):
+@cached_query(exact)
+def front_hooks(word, lexicon=None):
     """
     Returns a list of every word created by adding a letter in front of
     this one, e.g., "EARN" -> ["LEARN", "YEARN"]
     """
+    if instrument.enabled:
+        instrument.count("wordtools.front_hooks")
     hooks = []
     if '?' in word:
         for letter in ALPHABET:
-            hooks += front_hooks(word.replace('?', letter, 1))
+            hooks += front_hooks(word.replace('?', letter, 1), lexicon)
     else:
-        for letter in ALPHABET:
-            if wordlist.check_validity(letter + word):
-                hooks.append(letter + word)
+        lexicon = lexicon_module.choose_lexicon(lexicon)
+        for letter in lexicon.front_hooks(word):
+            hooks.append(letter + word)
     return hooks
 
-def subanagrams(word):
+@cached_query(sorted_letters)
+def subanagrams(word, lexicon=None):
     """
     Returns every word that can be made with the combination of any of the
     letters inside the word. Example:
     "MOCK" -> ["MOCK", "MOC", "MO", "OM"]
     """
+    if instrument.enabled:
+        instrument.count("wordtools.subanagrams")
     subs = []
     if '?' in word:
         for letter in ALPHABET:
-            subs += subanagrams(word.replace('?', letter, 1))
+            subs += subanagrams(word.replace('?', letter, 1), lexicon)
     else:
         for subset in powerset(word):  # gets every subset
-            subs += anagram(''.join(subset))
+            subs += anagram(''.join(subset), lexicon)
     return subs
 
-def anagram(word):
+@cached_query(sorted_letters)
+def anagram(word, lexicon=None):
     """
     Anagrams a word, including blanks represented by '?':
     Example:
     "AEIRSTX?" -> "MATRIXES", "SEXTARII"
     """
+    if instrument.enabled:
+        instrument.count("wordtools.anagram")
     if '?' in word:  # blank needs to be replaced
         anagrams = []  # to store all the anagrams
         for letter in ALPHABET:
-            anagrams += anagram(word.replace('?', letter, 1))
+            anagrams += anagram(word.replace('?', letter, 1), lexicon)
         return list(set(anagrams))  # remove repeats with the same set of blanks
     else:
-        return base_anagram.anagram_without_blanks(word)
+        return base_anagram.anagram_without_blanks(word, lexicon)
 
-def pattern_match(pattern):
+@cached_query(canonical_pattern)
+def pattern_match(pattern, lexicon=None):
     """
     Matches an exact pattern, with ? representing a single blank letter
     and * representing any number (even 0) of any tile. Examples:
     "C?RN" -> ["CARN", "CORN", "CURN"]
     "*NJUNCTION" -> ["CONJUNCTION", "INJUNCTION"]
     """
+    if instrument.enabled:
+        instrument.count("wordtools.pattern_match")
     q_mark_regex = "[A-Z]"  # matches exactly one letter
     
     asterisk_regex = "[A-Z]*"  # matches any number of letters
     
     search_regex = pattern.replace('?', q_mark_regex)
     search_regex = search_regex.replace('*', asterisk_regex)
-    return wordlist.regex_search(search_regex)
+    return wordlist.regex_search(search_regex, lexicon)
 
-def anagram_and_pattern_match(pattern, tileset):
+@cached_query(canonical_pattern, sorted_letters)
+def anagram_and_pattern_match(pattern, tileset, lexicon=None):
     """
     Finds all anagrams of the tileset that match the pattern.
     Examples:
@@ -106,8 +133,8 @@ def anagram_and_pattern_match(pattern, tileset):
     if '?' in tileset:  # need to do a recursive search with blanks
         sols = []  # to count solutions
         for letter in ALPHABET:
-            sols += anagram_and_pattern_match(pattern,
-                                                tileset.replace('?', letter, 1))
+            sols += anagram_and_pattern_match(
+                pattern, tileset.replace('?', letter, 1), lexicon)
         return sols
     
     
@@ -118,17 +145,18 @@ def anagram_and_pattern_match(pattern, tileset):
     search_regex = pattern.replace('?', letter_regex)
     search_regex = search_regex.replace('*', asterisk_regex)
     
-    return [x for x in wordlist.regex_search(search_regex) if x in
-                anagram(tileset)]
+    return [x for x in wordlist.regex_search(search_regex, lexicon) if x in
+                anagram(tileset, lexicon)]
 
-def subanagram_and_pattern_match(pattern, tileset):
+@cached_query(canonical_pattern, sorted_letters)
+def subanagram_and_pattern_match(pattern, tileset, lexicon=None):
     """Quickly f inds all subanagrams of the tileset that match the pattern.
     Can be slow with blanks in the tileset."""
     if '?' in tileset:  # need to do a recursive search with blanks
         sols = []  # to count solutions
         for letter in ALPHABET:
-            sols += subanagram_and_pattern_match(pattern,
-                                                tileset.replace('?', letter, 1))
+            sols += subanagram_and_pattern_match(
+                pattern, tileset.replace('?', letter, 1), lexicon)
         return sols
     
     
@@ -139,5 +167,5 @@ def subanagram_and_pattern_match(pattern, tileset):
     search_regex = pattern.replace('?', letter_regex)
     search_regex = search_regex.replace('*', asterisk_regex)
     
-    return [x for x in wordlist.regex_search(search_regex) if x in
-                subanagrams(tileset)]
+    return [x for x in wordlist.regex_search(search_regex, lexicon) if x in
+                subanagrams(tileset, lexicon)]